@@ -0,0 +1,507 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks of the CaMeL interpreter, with regression thresholds.
+
+Runs representative P-LLM programs on a fake workspace (see `workspace`) at
+several scales, in the `NORMAL` and `STRICT` modes, fully offline. Each
+benchmark is timed as the best of several runs, and its time is divided by the
+time of a calibration workload in pure Python, so that the results compare
+across machines. The results are compared with the baseline in
+`baseline.json`: the run fails (with exit status 1) if the geometric mean of
+the benchmarks (or, optionally, a single benchmark) is slower than the
+baseline by more than its threshold.
+
+Micro-benchmarks time specific parts of the interpreter the same way (e.g.,
+converting a 1,000-email inbox returned by a tool to CaMeL values), and the
+memory used per CaMeL value is compared with the baseline too.
+
+Usage, from the directory of the agent:
+
+  python -m benchmarks.run                      # Compare with the baseline.
+  python -m benchmarks.run --update-baseline    # Record a new baseline.
+  python -m benchmarks.run --filter comprehension --scales 100
+  python -m benchmarks.run --filter inbox       # Only the inbox benchmarks.
+"""
+
+import argparse
+import dataclasses
+import functools
+import gc
+import json
+import math
+import pathlib
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any
+
+from camel.camel_library import result
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+
+from . import workspace
+
+_BASELINE_PATH = pathlib.Path(__file__).parent / "baseline.json"
+
+PROGRAMS = {
+    "loop": """\
+emails = search_emails("Project")
+total = 0
+for email in emails:
+    total = total + len(email.body)
+print(total)
+""",
+    "comprehension": """\
+emails = search_emails("update")
+subjects = [e.subject for e in emails if e.sender == "user3@example.com"]
+recipients = {r for e in emails for r in e.recipients}
+print(len(subjects), len(recipients))
+""",
+    "string_formatting": """\
+events = get_events("")
+lines = [f"{e.title} in {e.location}: {e.start.isoformat()}" for e in events]
+report = "\\n".join(lines)
+print(len(report.upper()))
+""",
+    "dict_building": """\
+files = list_files()
+by_owner = {}
+for f in files:
+    by_owner[f.owner] = by_owner.get(f.owner, 0) + len(f.content.split(" "))
+names = {f.name: f.owner for f in files}
+print(sorted(by_owner.keys()), len(names))
+""",
+    "qllm_and_send": """\
+emails = search_emails("done")
+answers = [query_ai_assistant("Summarize: " + e.body, "str") for e in emails]
+summary = ", ".join(answers)
+send_email(to="me@example.com", subject="Summary", body=summary)
+""",
+}
+"""The programs, by name. They cover loops, comprehensions, string
+formatting, dict building, and calls to the Q-LLM and to tools with policies."""
+
+SCALES = (10, 30, 100)
+"""The number of emails, events and files of the workspaces."""
+
+MODES = (
+    interpreter.DependenciesPropagationMode.NORMAL,
+    interpreter.DependenciesPropagationMode.STRICT,
+)
+
+
+_MIN_TOTAL_TIME = 0.5
+"""The minimum time spent running each benchmark, in seconds, so that the
+fastest ones are run often enough for their best time to be stable."""
+_CALIBRATION_TIME = 0.2
+"""The minimum time spent running the calibration workload after each
+benchmark, in seconds."""
+
+
+def _best_time(
+    function: Callable[[], object],
+    repeats: int,
+    min_total_time: float = _MIN_TOTAL_TIME,
+) -> float:
+  """Returns the best time of at least `repeats` runs of `function`.
+
+  As with `timeit`, the garbage collector is disabled during the runs, so that
+  the time of its collections does not depend on earlier benchmarks.
+  """
+  best = float("inf")
+  runs = 0
+  total = 0.0
+  gc.collect()
+  gc.disable()
+  try:
+    while runs < repeats or total < min_total_time:
+      start = time.perf_counter()
+      function()
+      elapsed = time.perf_counter() - start
+      best = min(best, elapsed)
+      runs += 1
+      total += elapsed
+  finally:
+    gc.enable()
+  return best
+
+
+@dataclasses.dataclass(frozen=True)
+class _Value:
+  raw: Any
+  dependencies: tuple[Any, ...]
+
+
+class _Node:
+
+  def __init__(self, index: int) -> None:
+    self.index = index
+
+  def evaluate(self, value: Any) -> _Value:
+    if isinstance(value, _Value):
+      return _Value(value.raw, (*value.dependencies, self))
+    return _Value(value, ())
+
+
+def _calibration() -> None:
+  """A pure Python workload, evaluating values like the interpreter."""
+  namespace = {}
+  nodes = [_Node(i) for i in range(50)]
+  total = _Value(0, ())
+  for i in range(5_000):
+    node = nodes[i % len(nodes)]
+    value = node.evaluate(node.evaluate(i))
+    total = _Value(total.raw + value.raw, (*value.dependencies, node))
+    namespace[str(i % 97)] = total
+
+
+def _run_program(
+    program: str,
+    scale: int,
+    mode: interpreter.DependenciesPropagationMode,
+) -> Callable[[], object]:
+  """Returns a function running `program`, after checking that it succeeds."""
+  fake_workspace = workspace.Workspace(scale)
+  eval_args = interpreter.EvalArgs(workspace.SecurityPolicyEngine(), mode)
+  code = f"```python\n{program}\n```"
+
+  def run() -> interpreter.EvalResult:
+    return interpreter.parse_and_interpret_code(
+        code, fake_workspace.namespace(), [], (), eval_args
+    )
+
+  match run().result:
+    case result.Error(error):
+      raise RuntimeError(f"The benchmark failed: {error}")
+  return run
+
+
+INBOX_SIZE = 1_000
+"""The number of emails of the inbox of the micro-benchmarks."""
+
+
+def _inbox() -> tuple[list[workspace.Email], camel_value.Namespace]:
+  fake_workspace = workspace.Workspace(INBOX_SIZE)
+  return fake_workspace.emails, fake_workspace.namespace()
+
+
+def _inbox_values(inbox: camel_value.Value) -> list[camel_value.Value]:
+  """Returns the inbox, its emails, and the values of their fields."""
+  values = [inbox]
+  for email in inbox.iterate_python():
+    values.append(email)
+    values.extend(email.attr(name) for name in workspace.Email.model_fields)
+  return values
+
+
+def _convert_inbox(
+    emails: list[workspace.Email], namespace: camel_value.Namespace
+) -> list[camel_value.Value]:
+  """Converts `emails` as the output of a tool, with all their fields.
+
+  Args:
+    emails: The emails.
+    namespace: The namespace with the class of the emails.
+
+  Returns:
+    The values, as of `_inbox_values`. Reading the fields converts them, if
+    they are converted on first access.
+  """
+  return _inbox_values(
+      camel_value.value_from_raw(
+          emails, capabilities.Capabilities.camel(), namespace, ()
+      )
+  )
+
+
+def _value_from_raw() -> Callable[[], object]:
+  emails, namespace = _inbox()
+  return lambda: _convert_inbox(emails, namespace)
+
+
+def _clone() -> Callable[[], object]:
+  values = _convert_inbox(*_inbox())
+
+  def clone() -> None:
+    for value in values:
+      value.new_with_dependencies(())
+
+  return clone
+
+
+LOOP_PROGRAM = """\
+total = 0
+for i in range(2000):
+    a = i + 1
+    b = a * 2
+    c = b - i
+    total = total + c
+"""
+"""A loop assigning several variables at each iteration."""
+
+
+def _loop() -> Callable[[], object]:
+  """Returns a function running `LOOP_PROGRAM` in a large namespace."""
+  fake_workspace = workspace.Workspace(10)
+  namespace = fake_workspace.namespace()
+  # Variables left by the previous turns, which assignments must not copy.
+  namespace = namespace.add_variables({
+      f"variable_{i}": camel_value.value_from_raw(
+          i, capabilities.Capabilities.camel(), namespace, ()
+      )
+      for i in range(3_000)
+  })
+  eval_args = interpreter.EvalArgs(
+      workspace.SecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+  )
+  code = f"```python\n{LOOP_PROGRAM}\n```"
+
+  def run() -> interpreter.EvalResult:
+    return interpreter.parse_and_interpret_code(
+        code, namespace, [], (), eval_args
+    )
+
+  match run().result:
+    case result.Error(error):
+      raise RuntimeError(f"The benchmark failed: {error}")
+  return run
+
+
+MICRO_BENCHMARKS: dict[str, Callable[[], Callable[[], object]]] = {
+    "inbox/value_from_raw": _value_from_raw,
+    "inbox/clone": _clone,
+    # Reads one field of one email of a large tool output.
+    "inbox/first_subject": functools.partial(
+        _run_program,
+        'print(search_emails("Project")[0].subject)',
+        INBOX_SIZE,
+        interpreter.DependenciesPropagationMode.NORMAL,
+    ),
+    "namespace/loop": _loop,
+}
+"""Functions returning the function to time, by name."""
+
+
+def measure_memory() -> dict[str, float]:
+  """Measures the memory used by CaMeL values.
+
+  Returns:
+    The number of bytes allocated per CaMeL value for the converted inbox, by
+    `inbox/bytes_per_value`.
+  """
+  emails, namespace = _inbox()
+  gc.collect()
+  tracemalloc.start()
+  try:
+    values = _convert_inbox(emails, namespace)
+    allocated, _ = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  bytes_per_value = allocated / len(values)
+  print(f"{'inbox/bytes_per_value':<40} {bytes_per_value:>9.1f} B", flush=True)
+  return {"inbox/bytes_per_value": bytes_per_value}
+
+
+def _benchmarks(
+    names: Sequence[str], scales: Sequence[int]
+) -> Iterator[tuple[str, Callable[[], Callable[[], object]]]]:
+  for name in names:
+    if name in MICRO_BENCHMARKS:
+      yield name, MICRO_BENCHMARKS[name]
+      continue
+    for scale in scales:
+      for mode in MODES:
+        yield f"{name}/{scale}/{mode}", functools.partial(
+            _run_program, PROGRAMS[name], scale, mode
+        )
+
+
+def run_benchmarks(
+    names: Sequence[str], scales: Sequence[int], repeats: int
+) -> dict[str, float]:
+  """Runs the benchmarks.
+
+  Args:
+    names: The names of the programs and micro-benchmarks to run.
+    scales: The scales to run the programs at.
+    repeats: The number of runs of each benchmark, of which the best is kept.
+
+  Returns:
+    The time of each benchmark relative to the calibration workload, by
+    `<program>/<scale>/<mode>` for the programs, and by name for the
+    micro-benchmarks.
+  """
+  calibration = float("inf")
+  times = {}
+  for key, make_run in _benchmarks(names, scales):
+    times[key] = _best_time(make_run(), repeats)
+    print(
+        f"{key:<40} {times[key] * 1000:>9.2f} ms"
+        f" {1 / times[key]:>9.1f} runs/s",
+        flush=True,
+    )
+    # The calibration is sampled between the benchmarks, and its best time
+    # kept, like the ones of the benchmarks, so that both are the times of
+    # the machine at its least loaded.
+    calibration = min(
+        calibration, _best_time(_calibration, 1, _CALIBRATION_TIME)
+    )
+  print(f"Calibration: {calibration * 1000:.2f} ms.")
+  return {key: elapsed / calibration for key, elapsed in times.items()}
+
+
+def compare(
+    results: dict[str, float],
+    baseline: dict[str, float],
+    threshold: float,
+    benchmark_threshold: float | None = None,
+) -> list[str]:
+  """Compares the results with the baseline.
+
+  Single benchmarks are noisy, so the gate is on their geometric mean, with an
+  optional looser threshold on each of them to catch regressions of specific
+  programs.
+
+  Args:
+    results: The relative times of the benchmarks, as of `run_benchmarks`.
+    baseline: The relative times of the baseline.
+    threshold: The allowed slowdown of the geometric mean of the benchmarks.
+    benchmark_threshold: The allowed slowdown of each benchmark, if any.
+
+  Returns:
+    The descriptions of the regressions, if any.
+  """
+  ratios = {
+      key: relative_time / baseline[key]
+      for key, relative_time in results.items()
+      if key in baseline
+  }
+  if not ratios:
+    return []
+  regressions = [
+      f"{key}: {ratio - 1:+.0%} time vs baseline"
+      for key, ratio in ratios.items()
+      if benchmark_threshold is not None and ratio - 1 > benchmark_threshold
+  ]
+  mean = math.exp(sum(math.log(r) for r in ratios.values()) / len(ratios))
+  print(f"Geometric mean: {mean - 1:+.0%} time vs baseline.")
+  if mean - 1 > threshold:
+    regressions.append(f"geometric mean: {mean - 1:+.0%} time vs baseline")
+  return regressions
+
+
+def compare_memory(
+    memory: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[str]:
+  """Compares the memory measurements with the baseline.
+
+  Memory doesn't depend on the load of the machine, so each measurement is
+  checked.
+
+  Args:
+    memory: The measurements, as of `measure_memory`.
+    baseline: The measurements of the baseline.
+    threshold: The allowed increase of each measurement.
+
+  Returns:
+    The descriptions of the regressions, if any.
+  """
+  regressions = []
+  for key, value in memory.items():
+    if key not in baseline:
+      continue
+    ratio = value / baseline[key]
+    print(f"{key}: {ratio - 1:+.0%} memory vs baseline.")
+    if ratio - 1 > threshold:
+      regressions.append(f"{key}: {ratio - 1:+.0%} memory vs baseline")
+  return regressions
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument(
+      "--filter", default="", help="Only run the programs containing this."
+  )
+  parser.add_argument(
+      "--scales", type=int, nargs="+", default=SCALES, help="The scales."
+  )
+  parser.add_argument(
+      "--repeats", type=int, default=3, help="The runs of each benchmark."
+  )
+  parser.add_argument(
+      "--threshold",
+      type=float,
+      default=0.2,
+      help=(
+          "The allowed slowdown of the geometric mean of the benchmarks, and"
+          " increase of the memory per value, relative to the baseline (0.2"
+          " is 20%%)."
+      ),
+  )
+  parser.add_argument(
+      "--benchmark-threshold",
+      type=float,
+      default=None,
+      help=(
+          "The allowed slowdown of each benchmark relative to the baseline"
+          " (1.0 is twice as slow). Not checked by default, as single"
+          " benchmarks are noisy on shared machines."
+      ),
+  )
+  parser.add_argument(
+      "--update-baseline",
+      action="store_true",
+      help=f"Write the results to {_BASELINE_PATH.name}.",
+  )
+  args = parser.parse_args(argv)
+
+  names = [
+      name for name in (*PROGRAMS, *MICRO_BENCHMARKS) if args.filter in name
+  ]
+  results = run_benchmarks(names, args.scales, args.repeats)
+  memory = {}
+  if args.filter in "inbox/bytes_per_value":
+    memory = measure_memory()
+
+  if args.update_baseline:
+    baseline = {}
+    if _BASELINE_PATH.exists():
+      baseline = json.loads(_BASELINE_PATH.read_text())
+    baseline.update(
+        {key: round(value, 3) for key, value in (results | memory).items()}
+    )
+    _BASELINE_PATH.write_text(
+        json.dumps(dict(sorted(baseline.items())), indent=2) + "\n"
+    )
+    print(f"Updated {_BASELINE_PATH}.")
+    return 0
+
+  baseline = json.loads(_BASELINE_PATH.read_text())
+  regressions = compare(
+      results, baseline, args.threshold, args.benchmark_threshold
+  )
+  regressions += compare_memory(memory, baseline, args.threshold)
+  for regression in regressions:
+    print(f"REGRESSION {regression}")
+  if not regressions:
+    print("No regression.")
+  return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
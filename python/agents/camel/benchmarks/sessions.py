@@ -0,0 +1,194 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Load test of an interpreter service serving concurrent sessions.
+
+Runs the turns of several sessions concurrently on one
+`CaMelInterpreterService`, with tools waiting like remote services do, and
+reports the throughput for each number of sessions. Each turn mutates a dict
+of its session and sends an email whose security policy resolves the readers
+of the dict, so the test also checks that the sessions don't see each other's
+values or decisions. Fully offline.
+
+Usage, from the directory of the agent:
+
+  python -m benchmarks.sessions
+  python -m benchmarks.sessions --sessions 1 8 64 --turns 10 --latency 0.05
+"""
+
+import argparse
+import asyncio
+from collections.abc import Mapping, Sequence
+import sys
+import time
+from typing import Any
+
+from camel.camel_agent import camel_agent
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.capabilities import utils as capabilities_utils
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+
+_OWNER = "me@example.com"
+
+PROGRAM = """\
+notes = read_notes("{session}")
+counts["{session}"] = counts.get("{session}", 0) + 1
+counts["last"] = notes[-1]
+send_email(to="{to}", body=str(counts))
+print(f"{{counts['{session}']}} {{len(counts)}}")
+"""
+"""The program of a turn. `counts` is created by the first turn of the session
+and kept in its namespace. On the last turn, the email is sent to someone who
+can't read the notes, which the policy must deny."""
+
+
+class _Tools:
+  """Tools waiting `latency` seconds on the event loop, like remote ones."""
+
+  def __init__(self, latency: float) -> None:
+    self.latency = latency
+
+  async def read_notes(self, session: str) -> list[str]:
+    """Returns the notes of a session."""
+    await asyncio.sleep(self.latency)
+    return [f"{session}-note-{i}" for i in range(20)]
+
+  async def send_email(self, to: str, body: str) -> str:
+    """Sends an email (the email is not sent anywhere)."""
+    await asyncio.sleep(self.latency)
+    return f"Sent {body!r} to {to}."
+
+
+class _SecurityPolicyEngine(security_policy.SecurityPolicyEngine):
+  """Denies sending emails to whoever can't read their body."""
+
+  def __init__(self) -> None:
+    self.policies = [("send_email", self.send_email_policy)]
+    self.no_side_effect_tools = ["read_notes"]
+
+  def send_email_policy(
+      self, tool_name: str, kwargs: Mapping[str, camel_value.Value[Any]]
+  ) -> security_policy.SecurityPolicyResult:
+    del tool_name  # Unused.
+    to = kwargs["to"]
+    if not capabilities_utils.can_readers_read_value({to.raw}, kwargs["body"]):
+      return security_policy.Denied(f"{to.raw} can't read the body.")
+    return security_policy.Allowed()
+
+
+def _service(
+    latency: float, sessions: int
+) -> camel_agent.CaMelInterpreterService:
+  tools = _Tools(latency)
+  private = capabilities.Capabilities(frozenset(), frozenset({_OWNER}))
+  return camel_agent.CaMelInterpreterService(
+      model="gemini-2.5-pro",  # The Q-LLM is not called.
+      tools=[
+          (tools.read_notes, private, ()),
+          (tools.send_email, capabilities.Capabilities.camel(), ()),
+      ],
+      eval_args=interpreter.EvalArgs(
+          _SecurityPolicyEngine(),
+          interpreter.DependenciesPropagationMode.NORMAL,
+      ),
+      max_live_sessions=sessions,
+      max_concurrent_executions=sessions,
+  )
+
+
+async def _run_session(
+    service: camel_agent.CaMelInterpreterService, session: str, turns: int
+) -> None:
+  """Runs the turns of a session, checking their outputs."""
+  for turn in range(1, turns + 1):
+    to = _OWNER if turn < turns else "someone@example.com"
+    program = PROGRAM.format(session=session, to=to)
+    if turn == 1:
+      program = "counts = {}\n" + program
+    code = f"```python\n{program}\n```"
+    try:
+      output, _, error, _, _ = await service.execute_code_async(
+          code, [], (), session_id=session
+      )
+    except security_policy.SecurityPolicyDeniedError:
+      if turn == turns:
+        continue
+      raise
+    if turn == turns:
+      raise AssertionError(f"{session}: the last email was not denied.")
+    if error is not None:
+      raise AssertionError(f"{session}, turn {turn}: {error}")
+    expected = f"{turn} 2"
+    if output != expected:
+      raise AssertionError(
+          f"{session}, turn {turn}: printed {output!r} instead of {expected!r}"
+          " (values of other sessions are visible)."
+      )
+
+
+async def run_load(sessions: int, turns: int, latency: float) -> float:
+  """Runs `sessions` concurrent sessions of `turns` turns.
+
+  Args:
+    sessions: The number of concurrent sessions.
+    turns: The number of turns of each session.
+    latency: The time each tool call takes, in seconds.
+
+  Returns:
+    The throughput, in turns per second.
+  """
+  service = _service(latency, sessions)
+  start = time.perf_counter()
+  await asyncio.gather(
+      *(_run_session(service, f"session{i}", turns) for i in range(sessions))
+  )
+  return sessions * turns / (time.perf_counter() - start)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument(
+      "--sessions",
+      type=int,
+      nargs="+",
+      default=(1, 4, 16, 64),
+      help="The numbers of concurrent sessions.",
+  )
+  parser.add_argument(
+      "--turns", type=int, default=5, help="The turns of each session."
+  )
+  parser.add_argument(
+      "--latency",
+      type=float,
+      default=0.02,
+      help="The time each tool call takes, in seconds.",
+  )
+  args = parser.parse_args(argv)
+
+  single = None
+  for sessions in args.sessions:
+    throughput = asyncio.run(run_load(sessions, args.turns, args.latency))
+    single = single or throughput
+    print(
+        f"{sessions:>4} sessions {throughput:>9.1f} turns/s"
+        f" {throughput / single:>6.1f}x",
+        flush=True,
+    )
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,183 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A fake workspace (inbox, calendar and files) for the benchmarks.
+
+The data is generated deterministically from the scale, and the Q-LLM is
+replaced by a stub answering from the output schema, so the benchmarks run
+offline and always evaluate the same values.
+"""
+
+import datetime
+from collections.abc import Mapping
+from typing import Any
+
+import pydantic
+
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.capabilities import utils as capabilities_utils
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import library
+
+_USERS = tuple(f"user{i}@example.com" for i in range(7))
+_OWNER = "me@example.com"
+_START = datetime.datetime(2025, 1, 6, 9)
+
+
+class Email(pydantic.BaseModel):
+  sender: str
+  recipients: list[str]
+  subject: str
+  body: str
+  date: datetime.datetime
+
+
+class CalendarEvent(pydantic.BaseModel):
+  title: str
+  participants: list[str]
+  start: datetime.datetime
+  end: datetime.datetime
+  location: str
+
+
+class File(pydantic.BaseModel):
+  name: str
+  owner: str
+  content: str
+
+
+class Workspace:
+  """The data and tools of a workspace with `scale` items of each kind."""
+
+  def __init__(self, scale: int) -> None:
+    self.emails = [
+        Email(
+            sender=_USERS[i % len(_USERS)],
+            recipients=[_OWNER, _USERS[(i + 1) % len(_USERS)]],
+            subject=f"Project {i % 5} update {i}",
+            body=f"Status of task {i}: done. " * 4,
+            date=_START + datetime.timedelta(hours=i),
+        )
+        for i in range(scale)
+    ]
+    self.events = [
+        CalendarEvent(
+            title=f"Meeting {i}",
+            participants=[_OWNER, _USERS[i % len(_USERS)]],
+            start=_START + datetime.timedelta(hours=2 * i),
+            end=_START + datetime.timedelta(hours=2 * i + 1),
+            location=f"Room {i % 3}",
+        )
+        for i in range(scale)
+    ]
+    self.files = [
+        File(
+            name=f"notes_{i}.txt",
+            owner=_USERS[i % len(_USERS)],
+            content=f"Notes {i} about project {i % 5}. " * 3,
+        )
+        for i in range(scale)
+    ]
+
+  def search_emails(self, query: str) -> list[Email]:
+    """Returns the emails whose subject or body contains `query`."""
+    return [e for e in self.emails if query in e.subject or query in e.body]
+
+  def get_events(self, day: str) -> list[CalendarEvent]:
+    """Returns the events starting on `day` (YYYY-MM-DD), or all if empty."""
+    return [e for e in self.events if e.start.isoformat().startswith(day)]
+
+  def list_files(self) -> list[File]:
+    """Returns the files of the workspace."""
+    return list(self.files)
+
+  def send_email(self, to: str, subject: str, body: str) -> str:
+    """Sends an email (the email is not sent anywhere)."""
+    return f"Sent {subject!r} to {to}."
+
+  def namespace(self) -> camel_value.Namespace:
+    """Returns the namespace with the tools and the classes of their outputs."""
+    private = capabilities.Capabilities(frozenset(), frozenset({_OWNER}))
+    tools = [
+        (self.search_emails, private),
+        (self.get_events, private),
+        (self.list_files, private),
+        (self.send_email, capabilities.Capabilities.camel()),
+        (query_ai_assistant, capabilities.Capabilities.camel()),
+    ]
+    variables: dict[str, camel_value.Value[Any]] = {
+        f.__name__: camel_value.CaMeLFunction(
+            name=f.__name__,
+            py_callable=f,
+            capabilities=caps,
+            dependencies=(),
+        )
+        for f, caps in tools
+    }
+    # The classes of the outputs of the tools.
+    for cls in (Email, CalendarEvent, File):
+      variables[cls.__name__] = camel_value.CaMeLClass(
+          cls.__name__, cls, capabilities.Capabilities.camel(), (), {}
+      )
+    return library.make_builtins_namespace(variables)
+
+
+_QLLM_ANSWERS = {
+    "str": "answer",
+    "int": 42,
+    "float": 0.5,
+    "bool": True,
+    "EmailStr": _OWNER,
+}
+
+
+def query_ai_assistant(query: str, output_schema: str) -> Any:
+  """Stub of the Q-LLM, answering from the output schema only."""
+  del query  # Unused.
+  return _QLLM_ANSWERS.get(output_schema, "answer")
+
+
+class SecurityPolicyEngine(security_policy.SecurityPolicyEngine):
+  """The policies of the benchmarks, checking who emails are sent to."""
+
+  def __init__(self) -> None:
+    self.policies = [
+        ("send_email", self.send_email_policy),
+        ("*", self.allow),
+    ]
+    self.no_side_effect_tools = [
+        "search_emails",
+        "get_events",
+        "list_files",
+        "query_ai_assistant",
+    ]
+
+  @security_policy.pure_policy
+  def allow(
+      self, tool_name: str, kwargs: Mapping[str, camel_value.Value[Any]]
+  ) -> security_policy.SecurityPolicyResult:
+    del tool_name, kwargs  # Unused.
+    return security_policy.Allowed()
+
+  @security_policy.pure_policy
+  def send_email_policy(
+      self, tool_name: str, kwargs: Mapping[str, camel_value.Value[Any]]
+  ) -> security_policy.SecurityPolicyResult:
+    del tool_name  # Unused.
+    to = kwargs["to"]
+    for name in ("subject", "body"):
+      if not capabilities_utils.can_readers_read_value({to.raw}, kwargs[name]):
+        return security_policy.Denied(f"{to.raw} can't read the {name}.")
+    return security_policy.Allowed()
@@ -31,6 +31,7 @@ Allowed = security_policy.Allowed
 Denied = security_policy.Denied
 SecurityPolicyEngine = security_policy.SecurityPolicyEngine
 SecurityPolicyResult = security_policy.SecurityPolicyResult
+pure_policy = security_policy.pure_policy
 
 CaMeLAgent = camel_agent.CaMeLAgent
 
@@ -95,6 +96,7 @@ class TestSecurityPolicyEngine(SecurityPolicyEngine):
     # Below we list tools that don't have side effects.
     self.no_side_effect_tools = []
 
+  @pure_policy
   def search_document_policy(
       self, tool_name: str, kwargs: Mapping[str, camel_agent.CaMeLValue]
   ) -> SecurityPolicyResult:
@@ -102,6 +104,7 @@ class TestSecurityPolicyEngine(SecurityPolicyEngine):
     # Allow any arguments to search_document
     return Allowed()
 
+  @pure_policy
   def send_email_policy(
       self, tool_name: str, kwargs: Mapping[str, camel_agent.CaMeLValue]
   ) -> SecurityPolicyResult:
@@ -128,6 +131,7 @@ class TestSecurityPolicyEngine(SecurityPolicyEngine):
         f" {capabilities_utils.get_all_readers(body)[0]}"
     )
 
+  @pure_policy
   def query_ai_assistant_policy(
       self, tool_name: str, kwargs: Mapping[str, camel_agent.CaMeLValue]
   ) -> SecurityPolicyResult:
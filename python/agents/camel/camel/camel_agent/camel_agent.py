@@ -14,11 +14,13 @@
 
 """CaMeL agent implementation."""
 
-import asyncio
-from collections.abc import Iterator
-import queue
+import collections
+from collections.abc import Awaitable, Sequence
+import concurrent.futures
+import dataclasses
 import re
-import threading
+import secrets
+import time
 from typing import Any, AsyncGenerator, Callable, Optional
 
 from google.adk import runners
@@ -38,10 +40,18 @@ from ..camel_library import function_types
 from ..camel_library import result
 from ..camel_library import security_policy
 from ..camel_library.capabilities import capabilities
+from ..camel_library.interpreter import budget as budget_lib
 from ..camel_library.interpreter import camel_value
 from ..camel_library.interpreter import interpreter
 from ..camel_library.interpreter import library
+from ..camel_library.interpreter import program_cache as program_cache_lib
+from ..camel_library.interpreter import snapshot as snapshot_lib
+from ..camel_library.interpreter import tool_memo as tool_memo_lib
+from . import interpreter_history as interpreter_history_lib
 from . import prompts
+from . import qllm_cache as qllm_cache_lib
+from . import session_namespaces as session_namespaces_lib
+from . import session_pool as session_pool_lib
 from . import utils
 
 BaseModel = pydantic.BaseModel
@@ -57,6 +67,8 @@ BaseAgent = base_agent.BaseAgent
 BaseLlm = base_llm.BaseLlm
 
 DependenciesPropagationMode = interpreter.DependenciesPropagationMode
+EvalBackend = interpreter.EvalBackend
+ExecutionBudget = budget_lib.ExecutionBudget
 
 FunctionCall = function_types.FunctionCall
 CaMeLFunction = camel_value.CaMeLFunction
@@ -78,7 +90,7 @@ bool_validator = validators.bool_validator
 
 
 class QuarantinedLlmService(BaseModel):
-  """Manages synchronous interactions with the Quarantined LLM (Q-LLM)."""
+  """Manages interactions with the Quarantined LLM (Q-LLM)."""
 
   model: str | BaseLlm
   name: str
@@ -87,6 +99,8 @@ class QuarantinedLlmService(BaseModel):
   agent: LlmAgent
   runner: runners.InMemoryRunner
   pattern: re.Pattern
+  cache: qllm_cache_lib.QllmCache
+  session_pool: session_pool_lib.SessionPool
 
   model_config = {"arbitrary_types_allowed": True}
 
@@ -95,6 +109,9 @@ class QuarantinedLlmService(BaseModel):
       model: str | BaseLlm,
       name: str = "QLLM_Service",
       user_id: str = "test_user_id",
+      cache_size: int = 128,
+      cache_path: str | None = None,
+      pool_size: int = 8,
   ):
     agent = LlmAgent(
         model=model,
@@ -116,92 +133,55 @@ class QuarantinedLlmService(BaseModel):
         agent=agent,
         runner=runner,
         pattern=pattern,
+        cache=qllm_cache_lib.QllmCache(cache_size, cache_path),
+        session_pool=session_pool_lib.SessionPool(
+            runner.session_service, name, user_id, pool_size
+        ),
     )
 
+  @property
+  def model_name(self) -> str:
+    return self.model if isinstance(self.model, str) else self.model.model
+
+  def pool_metrics(self) -> session_pool_lib.PoolMetrics:
+    """Returns the wait and model times of the Q-LLM sessions so far."""
+    return self.session_pool.metrics()
+
   async def _run_async(
       self, query: str, output_schema: str
   ) -> AsyncGenerator[Event, None]:
-    """Runs a query on the Q-LLM session."""
-
-    qllm_session = await self.runner.session_service.create_session(
-        app_name=self.name, user_id=self.user_id
-    )
+    """Runs a query on a Q-LLM session from the pool."""
 
     qllm_query = f"{query} \n\n output_schema: {output_schema}"
     content = types.Content(role="user", parts=[types.Part(text=qllm_query)])
 
-    async for e in self.runner.run_async(
-        user_id=qllm_session.user_id,  # Session object contains user_id
-        session_id=qllm_session.id,
-        new_message=content,
-    ):
-      yield e
-
-    await self.runner.session_service.delete_session(
-        app_name=self.name, user_id=self.user_id, session_id=qllm_session.id
-    )
-
-  def run(self, query: str, output_schema: str) -> Iterator[Event]:
-    """Runs the QLLM agent synchronously in a new thread.
-
-    NOTE: This sync interface is solely because the CaMeL interpreter is
-    synchronous and does not suuport the `await` keyword. The
-    `query_ai_assistant` function is a wrapper around this synchronous run
-    method.
-
-    NOTE: This method is similar to the `run` method in the `runners.Runner`
-    class.
-
-    TODO: Later versions of CaMeL should support asynchronous execution and
-    this method will be removed.
-
-    Args:
-      query: The query to run.
-      output_schema: The output schema of the query.
-
-    Yields:
-      The events generated by the QLLM.
-    """
-    event_queue = queue.Queue()
-
-    async def _invoke_run_async():
-      try:
-        async for e in self._run_async(query, output_schema):
-          event_queue.put(e)
-      finally:
-        event_queue.put(None)
-
-    def _asyncio_thread_main():
+    async with self.session_pool.session() as session_id:
+      start = time.perf_counter()
       try:
-        asyncio.run(_invoke_run_async())
+        async for e in self.runner.run_async(
+            user_id=self.user_id,
+            session_id=session_id,
+            new_message=content,
+        ):
+          yield e
       finally:
-        event_queue.put(None)
-
-    thread = threading.Thread(target=_asyncio_thread_main)
-    thread.start()
-
-    # consumes and re-yield the events from background thread.
-    while True:
-      e = event_queue.get()
-      if e is None:
-        break
-      else:
-        yield e
-
-    thread.join()
+        self.session_pool.record_model_time(time.perf_counter() - start)
 
   def get_query_ai_assistant_function(
       self,
-  ) -> Callable[[str, str], str | int | float | bool]:
+  ) -> Callable[[str, str], Awaitable[str | int | float | bool]]:
     """Returns a function that queries a Large Language Model with `query` and returns the language model's output.
 
-    The `query_ai_assistant` function is a wrapper around the `run` method of
-    the `QuarantinedLlmService` class. `query_ai_assistant` needs the `self`
-    object but it can't be passed as a parameter because it needs to be added to
-    the namespace of the CaMeL interpreter as a standalone built-in function.
+    The `query_ai_assistant` function is a wrapper around the `_run_async`
+    method of the `QuarantinedLlmService` class. `query_ai_assistant` needs the
+    `self` object but it can't be passed as a parameter because it needs to be
+    added to the namespace of the CaMeL interpreter as a standalone built-in
+    function. It is a coroutine function, which the interpreter awaits on the
+    event loop running the program (see
+    `CaMelInterpreterService.execute_code_async`).
     """
 
-    def query_ai_assistant(
+    async def query_ai_assistant(
         query: str, output_schema: str
     ) -> str | int | float | bool:
       """Queries a Large Language Model with `query` and returns the language model's output.
@@ -248,12 +228,21 @@ class QuarantinedLlmService(BaseModel):
         The parsed output of the model.
       """
 
-      if output_schema not in ["int", "str", "float", "bool"]:
+      if output_schema not in qllm_cache_lib.OUTPUT_TYPES:
         raise ValueError(f"Unsupported output schema: `{output_schema}`")
 
+      # The interpreter gives cached results the same capabilities as results
+      # from the model.
+      cache_key = qllm_cache_lib.cache_key(
+          self.model_name, query, output_schema
+      )
+      cached = self.cache.get(cache_key)
+      if cached is not None:
+        return cached
+
       response_parts = []
 
-      for e in self.run(
+      async for e in self._run_async(
           query=query,
           output_schema=output_schema,
       ):
@@ -269,28 +258,47 @@ class QuarantinedLlmService(BaseModel):
       )
 
       if output_schema == "int":
-        return int_validator(response_text)
+        output = int_validator(response_text)
       elif output_schema == "str":
-        return str(response_text)
+        output = str(response_text)
       elif output_schema == "float":
-        return float_validator(response_text)
+        output = float_validator(response_text)
       elif output_schema == "bool":
-        return bool_validator(response_text)
+        output = bool_validator(response_text)
       else:
         raise ValueError(f"Unsupported output schema: `{output_schema}`")
+      self.cache.put(cache_key, output)
+      return output
 
     return query_ai_assistant
 
 
 class CaMelInterpreterService(BaseModel):
-  """Manages CaMeL interpreter state, functions, and execution."""
+  """Manages CaMeL interpreter state, functions, and execution.
+
+  Code executed for a session (see `execute_code_async`) runs in the namespace
+  of that session, so one service can serve concurrent sessions. Code executed
+  without a session runs in `namespace`.
+
+  The calls to tools without side effects are memoized for the duration of a
+  turn (see `tool_memo`), so that the retries of the P-LLM don't call them
+  again.
+  """
 
   model: str | BaseLlm
   tools: list[Tool]
   classes_to_exclude: frozenset[str]
   eval_args: interpreter.EvalArgs
   namespace: Namespace
+  base_namespace: Namespace
   quarantined_llm_service: QuarantinedLlmService
+  program_cache: program_cache_lib.ProgramCache
+  session_namespaces: session_namespaces_lib.SessionNamespaces
+  snapshot_key: bytes
+  executor: concurrent.futures.ThreadPoolExecutor
+  tool_memo_size: int
+  max_live_turns: int
+  tool_memos: collections.OrderedDict[str, tool_memo_lib.ToolMemo]
 
   model_config = {"arbitrary_types_allowed": True}
 
@@ -299,10 +307,24 @@ class CaMelInterpreterService(BaseModel):
       model: str | BaseLlm,
       tools: list[Tool],
       eval_args: interpreter.EvalArgs,
+      program_cache_size: int = 128,
+      qllm_cache_size: int = 128,
+      qllm_cache_path: str | None = None,
+      qllm_pool_size: int = 8,
+      max_live_sessions: int = 64,
+      snapshot_store: session_namespaces_lib.SnapshotStore | None = None,
+      snapshot_key: bytes | None = None,
+      max_concurrent_executions: int = 64,
+      tool_memo_size: int = 256,
   ):
+    if snapshot_key is None:
+      snapshot_key = secrets.token_bytes(32)
     quarantined_llm_service = QuarantinedLlmService(
         model=model,
         name="QLLM_Service",
+        cache_size=qllm_cache_size,
+        cache_path=qllm_cache_path,
+        pool_size=qllm_pool_size,
     )  # Manages interactions with the QLLM.
 
     classes_to_exclude: frozenset[str] = frozenset(
@@ -336,7 +358,22 @@ class CaMelInterpreterService(BaseModel):
         classes_to_exclude=classes_to_exclude,
         eval_args=eval_args,
         namespace=namespace,
+        base_namespace=namespace,
         quarantined_llm_service=quarantined_llm_service,
+        program_cache=program_cache_lib.ProgramCache(program_cache_size),
+        session_namespaces=session_namespaces_lib.SessionNamespaces(
+            namespace, max_live_sessions, snapshot_store, snapshot_key
+        ),
+        snapshot_key=snapshot_key,
+        # The worker threads mostly wait for tools, so there can be more of
+        # them than CPUs.
+        executor=concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_executions,
+            thread_name_prefix="camel_interpreter",
+        ),
+        tool_memo_size=tool_memo_size,
+        max_live_turns=max_live_sessions,
+        tool_memos=collections.OrderedDict(),
     )
 
   def get_funcs_for_pllm_prompt(self) -> list[Callable[..., Any]]:
@@ -345,15 +382,86 @@ class CaMelInterpreterService(BaseModel):
   def get_classes_to_exclude(self) -> frozenset[str]:
     return self.classes_to_exclude
 
+  @property
+  def program_cache_hits(self) -> int:
+    """How many times the parsed code was found in the program cache."""
+    return self.program_cache.cache_info().hits
+
+  @property
+  def program_cache_misses(self) -> int:
+    """How many times the code had to be parsed."""
+    return self.program_cache.cache_info().misses
+
+  def tool_memo(self, turn_id: str) -> tool_memo_lib.ToolMemo | None:
+    """Returns the memo of the calls to tools without side effects of a turn.
+
+    The memos of the turns which are not ended with `end_turn` are dropped,
+    oldest first, when there are more than `max_live_turns` of them.
+
+    Args:
+      turn_id: The ID of the turn (e.g., of the ADK invocation).
+
+    Returns:
+      The memo, or `None` if `tool_memo_size` is 0.
+    """
+    if not self.tool_memo_size:
+      return None
+    memo = self.tool_memos.pop(turn_id, None)
+    if memo is None:
+      memo = tool_memo_lib.ToolMemo(self.tool_memo_size)
+    self.tool_memos[turn_id] = memo
+    while len(self.tool_memos) > self.max_live_turns:
+      self.tool_memos.popitem(last=False)
+    return memo
+
+  def end_turn(self, turn_id: str) -> None:
+    """Drops the memo of a turn, as the outputs of the tools may change."""
+    self.tool_memos.pop(turn_id, None)
+
+  def snapshot(self, session_id: str | None = None) -> bytes:
+    """Returns a snapshot of the variables defined by the executed code.
+
+    It can be restored with `restore` by any service created with the same
+    model, tools and `snapshot_key` (e.g., in another process).
+
+    Args:
+      session_id: The session whose namespace is saved. Defaults to
+        `namespace`.
+    """
+    if session_id is None:
+      namespace = self.namespace
+    else:
+      namespace = self.session_namespaces.get(session_id)
+    return snapshot_lib.dumps(
+        namespace, self.base_namespace, self.snapshot_key
+    )
+
+  def restore(self, snapshot: bytes, session_id: str | None = None) -> None:
+    """Replaces the namespace with the one saved in `snapshot`.
+
+    Args:
+      snapshot: The snapshot returned by `snapshot`.
+      session_id: The session whose namespace is replaced. Defaults to
+        `namespace`.
+    """
+    namespace = snapshot_lib.loads(
+        snapshot, self.base_namespace, self.snapshot_key
+    )
+    if session_id is None:
+      self.namespace = namespace
+    else:
+      self.session_namespaces.put(session_id, namespace)
+
   def execute_code(
       self,
       code: str,
-      tool_calls_chain: list[function_types.FunctionCall],
+      tool_calls_chain: Sequence[function_types.FunctionCall],
       current_dependencies: tuple[Any, ...],
       verbose: bool = False,
+      tool_memo: tool_memo_lib.ToolMemo | None = None,
   ) -> tuple[
       str,
-      list[function_types.FunctionCall],
+      Sequence[function_types.FunctionCall],
       CaMeLException | None,
       camel_value.Namespace,
       tuple[Any, ...],
@@ -363,18 +471,111 @@ class CaMelInterpreterService(BaseModel):
       print(code)
 
     # The namespace passed here is self.namespace, which is managed internally
+    eval_result = interpreter.parse_and_interpret_code(
+        code,
+        self.namespace,
+        tool_calls_chain,
+        current_dependencies,
+        self._eval_args(tool_memo),
+        self.program_cache,
+    )
+    self.namespace = eval_result.namespace
+    return self._process_eval_result(eval_result, tool_calls_chain)
+
+  async def execute_code_async(
+      self,
+      code: str,
+      tool_calls_chain: Sequence[function_types.FunctionCall],
+      current_dependencies: tuple[Any, ...],
+      verbose: bool = False,
+      session_id: str | None = None,
+      tool_memo: tool_memo_lib.ToolMemo | None = None,
+  ) -> tuple[
+      str,
+      Sequence[function_types.FunctionCall],
+      CaMeLException | None,
+      camel_value.Namespace,
+      tuple[Any, ...],
+  ]:
+    """Interprets the CaMeL code without blocking the event loop.
+
+    Asynchronous tools (e.g., `query_ai_assistant`) are awaited on the running
+    event loop, so executions for different sessions overlap while they wait,
+    up to `max_concurrent_executions` at once.
+
+    Args:
+      code: The code to execute.
+      tool_calls_chain: The calls made by the previous executions.
+      current_dependencies: The dependencies after the previous executions.
+      verbose: Whether to print the code.
+      session_id: The session to run the code in. Executions for the same
+        session run one at a time, in its own namespace. Defaults to
+        `namespace`, shared by the callers without a session.
+      tool_memo: The memo of the calls to tools without side effects to
+        share with the other executions of the turn (see `tool_memo`), if any.
+
+    Returns:
+      The output, the calls, the error if any, the updated namespace and the
+      dependencies.
+    """
+    if verbose:
+      print(code)
+
+    eval_args = self._eval_args(tool_memo)
+    if session_id is None:
+      eval_result = await interpreter.parse_and_interpret_code_async(
+          code,
+          self.namespace,
+          tool_calls_chain,
+          current_dependencies,
+          eval_args,
+          self.program_cache,
+          executor=self.executor,
+      )
+      self.namespace = eval_result.namespace
+      return self._process_eval_result(eval_result, tool_calls_chain)
+
+    async with self.session_namespaces.lock(session_id):
+      eval_result = await interpreter.parse_and_interpret_code_async(
+          code,
+          self.session_namespaces.get(session_id),
+          tool_calls_chain,
+          current_dependencies,
+          eval_args,
+          self.program_cache,
+          executor=self.executor,
+      )
+      self.session_namespaces.put(session_id, eval_result.namespace)
+    return self._process_eval_result(eval_result, tool_calls_chain)
+
+  def _eval_args(
+      self, tool_memo: tool_memo_lib.ToolMemo | None
+  ) -> interpreter.EvalArgs:
+    if tool_memo is None:
+      return self.eval_args
+    return dataclasses.replace(self.eval_args, tool_memo=tool_memo)
+
+  def _process_eval_result(
+      self,
+      eval_result: interpreter.EvalResult,
+      tool_calls_chain: Sequence[function_types.FunctionCall],
+  ) -> tuple[
+      str,
+      Sequence[function_types.FunctionCall],
+      CaMeLException | None,
+      camel_value.Namespace,
+      tuple[Any, ...],
+  ]:
     interpreter_res, updated_namespace, new_tool_calls, new_dependencies = (
-        interpreter.parse_and_interpret_code(
-            code,
-            self.namespace,
-            tool_calls_chain,
-            current_dependencies,
-            self.eval_args,
-        )
+        eval_result
     )
-    self.namespace = updated_namespace  # Update internal namespace state
 
-    printed_output = utils.extract_print_output(new_tool_calls)
+    # Only print the output of this execution, not of the previous ones.
+    printed_output = utils.extract_print_output(
+        function_types.FunctionCallLog.of(new_tool_calls).since(
+            len(tool_calls_chain)
+        )
+    )
     ad_tool_calls = new_tool_calls
 
     final_eval_output_str = ""
@@ -396,9 +597,15 @@ class CaMelInterpreterService(BaseModel):
 
 
 class CaMeLInterpreter(BaseAgent):
-  """Manages the CaMeL interpreter agent."""
+  """Manages the CaMeL interpreter agent.
+
+  The executions are recorded in the `interpreter_history` key of the session
+  state (see `interpreter_history.InterpreterHistory`). Only the last
+  `history_retention` executions are kept in full.
+  """
 
   camel_interpreter_service: CaMelInterpreterService
+  history_retention: int
 
   model_config = {"arbitrary_types_allowed": True}
 
@@ -406,9 +613,12 @@ class CaMeLInterpreter(BaseAgent):
       self,
       name: str,
       camel_interpreter_service: CaMelInterpreterService,
+      history_retention: int = 10,
   ):
     super().__init__(
-        name=name, camel_interpreter_service=camel_interpreter_service
+        name=name,
+        camel_interpreter_service=camel_interpreter_service,
+        history_retention=history_retention,
     )
 
   @override
@@ -438,24 +648,44 @@ class CaMeLInterpreter(BaseAgent):
     p_llm_code = ctx.session.state.get("p_llm_code")
 
     # 2. Run the code using the CaMel interpreter.
-    function_calls = ctx.session.state.get("function_calls") or []
-    dependencies = ctx.session.state.get("dependencies") or ()
+    history = ctx.session.state.get(
+        "interpreter_history"
+    ) or interpreter_history_lib.InterpreterHistory(self.history_retention)
+    function_calls = history.function_calls()
 
     printed_output, ad_tool_calls, error, _, dependencies = (
-        self.camel_interpreter_service.execute_code(
-            p_llm_code, function_calls, dependencies
+        await self.camel_interpreter_service.execute_code_async(
+            p_llm_code,
+            function_calls,
+            history.dependencies,
+            session_id=ctx.session.id,
+            tool_memo=self.camel_interpreter_service.tool_memo(
+                ctx.invocation_id
+            ),
         )
     )  # printed_output, ad_tool_calls, error, namespace, dependencies
 
-    ctx.session.state.update(dict(function_calls=ad_tool_calls))
-    ctx.session.state.update(dict(dependencies=dependencies))
-
-    # 3. Add additional messages to the conversation based on the eval result.
+    error_reason = None
     if error is not None:
       if isinstance(error, CaMeLException):
         error_reason = str(error.exception)
       else:
         error_reason = str(error)
+    ctx.session.state.update(
+        dict(
+            interpreter_history=history.record(
+                p_llm_code,
+                function_types.FunctionCallLog.of(ad_tool_calls).since(
+                    len(function_calls)
+                ),
+                dependencies,
+                error_reason,
+            )
+        )
+    )
+
+    # 3. Add additional messages to the conversation based on the eval result.
+    if error_reason is not None:
       ctx.session.state.update(dict(eval_result=f"CODE ERROR: {error_reason}"))
       yield Event(
           author=self.name,
@@ -508,6 +738,18 @@ class CaMeLAgent(BaseAgent):
       tools: Optional[list[Tool]] = None,
       security_policy_engine: SecurityPolicyEngine = security_policy.NoSecurityPolicyEngine(),
       eval_mode: DependenciesPropagationMode = DependenciesPropagationMode.NORMAL,
+      eval_backend: EvalBackend = EvalBackend.TREE_WALKING,
+      parallel_tool_calls: bool = False,
+      execution_budget: ExecutionBudget | None = None,
+      preflight: bool = False,
+      qllm_cache_path: str | None = None,
+      qllm_pool_size: int = 8,
+      history_retention: int = 10,
+      max_live_sessions: int = 64,
+      snapshot_store: session_namespaces_lib.SnapshotStore | None = None,
+      snapshot_key: bytes | None = None,
+      max_concurrent_executions: int = 64,
+      tool_memo_size: int = 256,
   ):
 
     camel_interpreter_service = CaMelInterpreterService(
@@ -516,11 +758,23 @@ class CaMeLAgent(BaseAgent):
         eval_args=interpreter.EvalArgs(
             eval_mode=eval_mode,
             security_policy_engine=security_policy_engine,
+            backend=eval_backend,
+            parallel_tool_calls=parallel_tool_calls,
+            budget=execution_budget,
+            preflight=preflight,
         ),
+        qllm_cache_path=qllm_cache_path,
+        qllm_pool_size=qllm_pool_size,
+        max_live_sessions=max_live_sessions,
+        snapshot_store=snapshot_store,
+        snapshot_key=snapshot_key,
+        max_concurrent_executions=max_concurrent_executions,
+        tool_memo_size=tool_memo_size,
     )
     camel_interpreter_agent = CaMeLInterpreter(
         name="CaMeLInterpreter",
         camel_interpreter_service=camel_interpreter_service,
+        history_retention=history_retention,
     )
 
     pllm_agent = LlmAgent(
@@ -585,3 +839,7 @@ class CaMeLAgent(BaseAgent):
     except Exception as e:
       print(f"CaMeL agent failed: {e}", end="\n")
       raise e
+    finally:
+      self.camel_interpreter_agent.camel_interpreter_service.end_turn(
+          ctx.invocation_id
+      )
@@ -0,0 +1,168 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""History of the executions of the CaMeL interpreter in a session.
+
+The history is kept in the session state, and every execution of the P-LLM
+code (including retries after errors) adds to it. To keep its size constant on
+long-lived sessions, only the last executions are kept in full (with their code
+and function calls, e.g., to replay them), and the older ones are folded into a
+summary. The dependencies carried from one execution to the next are
+compacted, without changing the readers and sources they contribute.
+"""
+
+from collections.abc import Iterable, Mapping, Sequence
+import dataclasses
+from typing import Any
+
+from ..camel_library import function_types
+from ..camel_library.capabilities import utils as capabilities_utils
+from ..camel_library.interpreter import camel_value
+
+
+@dataclasses.dataclass(frozen=True)
+class Execution:
+  """An execution of P-LLM code."""
+
+  code: str
+  """The code that was executed."""
+  function_calls: tuple[function_types.FunctionCall[Any], ...]
+  """The calls made by the execution, in order."""
+  error: str | None
+  """The error the execution stopped with, if any."""
+
+
+@dataclasses.dataclass(frozen=True)
+class HistorySummary:
+  """Summary of the executions that are no longer kept in full."""
+
+  executions: int = 0
+  """The number of executions."""
+  errors: int = 0
+  """The number of executions that stopped with an error."""
+  function_calls: int = 0
+  """The number of calls, including calls to built-ins."""
+  tool_calls: Mapping[str, int] = dataclasses.field(default_factory=dict)
+  """The number of calls to each tool (i.e., excluding built-ins), by name."""
+
+  def add(self, execution: Execution) -> "HistorySummary":
+    """Returns the summary with `execution` folded in."""
+    tool_calls = dict(self.tool_calls)
+    for call in execution.function_calls:
+      if not call.is_builtin:
+        tool_calls[call.function] = tool_calls.get(call.function, 0) + 1
+    return HistorySummary(
+        executions=self.executions + 1,
+        errors=self.errors + (execution.error is not None),
+        function_calls=self.function_calls + len(execution.function_calls),
+        tool_calls=tool_calls,
+    )
+
+
+def compact_dependencies(
+    dependencies: Iterable[camel_value.Value[Any]],
+) -> tuple[camel_value.Value[Any], ...]:
+  """Removes the dependencies that are redundant for security checks.
+
+  Repeated values are kept once. Among the values that can't change (see
+  `capabilities_utils.can_change`), only the first one with given readers and
+  sources is kept, as the others contribute the same readers and sources.
+  Values that can change are all kept, since their readers and sources may
+  change later.
+
+  Args:
+    dependencies: The dependencies, in order.
+
+  Returns:
+    The compacted dependencies, in the same order.
+  """
+  seen_ids: set[int] = set()
+  seen_capabilities: set[tuple[Any, frozenset[Any]]] = set()
+  compacted = []
+  for dependency in dependencies:
+    if id(dependency) in seen_ids:
+      continue
+    seen_ids.add(id(dependency))
+    if not capabilities_utils.can_change(dependency):
+      key = (
+          capabilities_utils.get_all_readers(dependency)[0],
+          capabilities_utils.get_all_sources(dependency)[0],
+      )
+      if key in seen_capabilities:
+        continue
+      seen_capabilities.add(key)
+    compacted.append(dependency)
+  return tuple(compacted)
+
+
+@dataclasses.dataclass(frozen=True)
+class InterpreterHistory:
+  """Bounded history of the executions of a session."""
+
+  retention: int = 10
+  """The number of executions kept in full."""
+  executions: tuple[Execution, ...] = ()
+  """The last `retention` executions, in order."""
+  summary: HistorySummary = HistorySummary()
+  """Summary of the executions before `executions`."""
+  dependencies: tuple[camel_value.Value[Any], ...] = ()
+  """The dependencies to pass to the next execution."""
+
+  def __post_init__(self) -> None:
+    if self.retention < 0:
+      raise ValueError(
+          f"The retention must not be negative, got {self.retention}."
+      )
+
+  def function_calls(self) -> function_types.FunctionCallLog:
+    """Returns the calls of the executions kept in full, in order."""
+    return function_types.FunctionCallLog(
+        call
+        for execution in self.executions
+        for call in execution.function_calls
+    )
+
+  def record(
+      self,
+      code: str,
+      function_calls: Sequence[function_types.FunctionCall[Any]],
+      dependencies: Iterable[camel_value.Value[Any]],
+      error: str | None,
+  ) -> "InterpreterHistory":
+    """Returns the history with a new execution.
+
+    Args:
+      code: The code that was executed.
+      function_calls: The calls made by the execution only.
+      dependencies: The dependencies after the execution.
+      error: The error the execution stopped with, if any.
+
+    Returns:
+      The new history, where the oldest executions beyond `retention` are
+      folded into the summary.
+    """
+    executions = (
+        *self.executions,
+        Execution(code, tuple(function_calls), error),
+    )
+    summary = self.summary
+    dropped = max(len(executions) - self.retention, 0)
+    for execution in executions[:dropped]:
+      summary = summary.add(execution)
+    return InterpreterHistory(
+        retention=self.retention,
+        executions=executions[dropped:],
+        summary=summary,
+        dependencies=compact_dependencies(dependencies),
+    )
@@ -0,0 +1,160 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cache of the results of the Quarantined LLM (Q-LLM).
+
+The same `query_ai_assistant` queries are often sent again, e.g., when the
+P-LLM code is retried or when a plan is executed again in a later turn. The
+results are cached by a hash of the query (which contains the data to process),
+of the JSON schema of the output, and of the name of the model.
+
+The cache has an in-memory LRU tier and, optionally, an on-disk SQLite tier
+shared across processes and runs. Only the raw results are cached: the
+interpreter wraps them with the capabilities of `query_ai_assistant` outputs,
+as for results coming from the model.
+"""
+
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any
+
+import pydantic
+
+from ..camel_library.interpreter import program_cache
+
+CacheInfo = program_cache.CacheInfo
+
+OUTPUT_TYPES: dict[str, type[Any]] = {
+    "int": int,
+    "str": str,
+    "float": float,
+    "bool": bool,
+}
+"""The types of the outputs `query_ai_assistant` supports, by name."""
+
+Result = str | int | float | bool
+
+
+def cache_key(model: str, query: str, output_schema: str) -> bytes:
+  """Returns the key of the result of `query` with `model`.
+
+  Args:
+      model: The name of the Q-LLM.
+      query: The query, as sent to the Q-LLM.
+      output_schema: The name of the output type (e.g., `"int"`).
+
+  Returns:
+      The SHA-256 hash of the model, query, and JSON schema of the output.
+  """
+  json_schema = pydantic.TypeAdapter(OUTPUT_TYPES[output_schema]).json_schema()
+  return hashlib.sha256(
+      json.dumps([model, query, json_schema], sort_keys=True).encode()
+  ).digest()
+
+
+class QllmCache:
+  """Two-tier cache of Q-LLM results.
+
+  The cache can be used from several threads (e.g., by concurrent
+  `query_ai_assistant` calls).
+  """
+
+  def __init__(self, maxsize: int = 128, path: str | None = None) -> None:
+    """Initializes the cache.
+
+    Args:
+        maxsize: The maximum number of results in memory. `0` disables the
+          in-memory tier.
+        path: The path of the SQLite database of the on-disk tier, created if
+          needed. If `None`, there is no on-disk tier.
+    """
+    self._maxsize = maxsize
+    self._results: collections.OrderedDict[bytes, Result] = (
+        collections.OrderedDict()
+    )
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+    self._db = None
+    if path is not None:
+      self._db = sqlite3.connect(path, check_same_thread=False)
+      with self._db:
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS qllm_results"
+            " (key BLOB PRIMARY KEY, result TEXT NOT NULL)"
+        )
+
+  def get(self, key: bytes) -> Result | None:
+    """Returns the result cached for `key`, or `None` if there is none."""
+    with self._lock:
+      cached = self._results.get(key)
+      if cached is not None:
+        self._results.move_to_end(key)
+      elif self._db is not None:
+        row = self._db.execute(
+            "SELECT result FROM qllm_results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+          cached = json.loads(row[0])
+          self._put_in_memory(key, cached)
+      if cached is None:
+        self._misses += 1
+      else:
+        self._hits += 1
+      return cached
+
+  def put(self, key: bytes, value: Result) -> None:
+    """Caches `value` as the result for `key`."""
+    with self._lock:
+      self._put_in_memory(key, value)
+      if self._db is not None:
+        with self._db:
+          self._db.execute(
+              "INSERT OR REPLACE INTO qllm_results VALUES (?, ?)",
+              (key, json.dumps(value)),
+          )
+
+  def _put_in_memory(self, key: bytes, value: Result) -> None:
+    if not self._maxsize:
+      return
+    self._results[key] = value
+    self._results.move_to_end(key)
+    if len(self._results) > self._maxsize:
+      self._results.popitem(last=False)
+
+  def cache_info(self) -> CacheInfo:
+    with self._lock:
+      return CacheInfo(
+          self._hits, self._misses, self._maxsize, len(self._results)
+      )
+
+  def clear(self) -> None:
+    """Empties both tiers and resets the statistics."""
+    with self._lock:
+      self._results.clear()
+      self._hits = 0
+      self._misses = 0
+      if self._db is not None:
+        with self._db:
+          self._db.execute("DELETE FROM qllm_results")
+
+  def close(self) -> None:
+    """Closes the on-disk tier. The in-memory tier can still be used."""
+    with self._lock:
+      if self._db is not None:
+        self._db.close()
+        self._db = None
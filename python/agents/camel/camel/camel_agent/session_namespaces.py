@@ -0,0 +1,196 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Interpreter namespaces of concurrent sessions.
+
+Each session (e.g., an ADK session) has its own namespace, so that the values
+of a conversation are never visible to another one, and its executions are
+serialized by a lock, while executions of different sessions run concurrently.
+
+The namespaces of the most recently used sessions are kept in memory. The
+least recently used ones are evicted to a `SnapshotStore` (see
+`interpreter.snapshot`), and restored from it when the session is used again.
+A store shared by several processes lets them serve the same sessions, if
+they are given the same key to sign the snapshots with.
+"""
+
+import asyncio
+import collections
+import secrets
+import threading
+from typing import NamedTuple, Protocol
+import weakref
+
+from ..camel_library.interpreter import camel_value
+from ..camel_library.interpreter import snapshot as snapshot_lib
+
+
+class SnapshotStore(Protocol):
+  """Storage of the snapshots of evicted namespaces, by session ID."""
+
+  def get(self, session_id: str) -> bytes | None:
+    ...
+
+  def put(self, session_id: str, snapshot: bytes) -> None:
+    ...
+
+  def delete(self, session_id: str) -> None:
+    ...
+
+
+class InMemorySnapshotStore(SnapshotStore):
+  """Stores the snapshots in memory, compressed."""
+
+  def __init__(self) -> None:
+    self._snapshots: dict[str, bytes] = {}
+    self._lock = threading.Lock()
+
+  def get(self, session_id: str) -> bytes | None:
+    with self._lock:
+      return self._snapshots.get(session_id)
+
+  def put(self, session_id: str, snapshot: bytes) -> None:
+    with self._lock:
+      self._snapshots[session_id] = snapshot
+
+  def delete(self, session_id: str) -> None:
+    with self._lock:
+      self._snapshots.pop(session_id, None)
+
+
+class SessionStats(NamedTuple):
+  """Statistics of a `SessionNamespaces`."""
+
+  live: int
+  """The number of namespaces in memory."""
+  evictions: int
+  """The number of namespaces evicted to the store."""
+  restores: int
+  """The number of namespaces restored from the store."""
+
+
+class SessionNamespaces:
+  """Namespaces of sessions, with LRU eviction to a snapshot store."""
+
+  def __init__(
+      self,
+      base: camel_value.Namespace,
+      max_live: int = 64,
+      store: SnapshotStore | None = None,
+      key: bytes | None = None,
+  ) -> None:
+    """Initializes the namespaces.
+
+    Args:
+        base: The namespace of new sessions, with the built-ins and the tools.
+        max_live: The maximum number of namespaces kept in memory. Namespaces
+          of sessions that are running code are never evicted, so there can
+          temporarily be more.
+        store: Where evicted namespaces are saved. Defaults to an
+          `InMemorySnapshotStore`.
+        key: The secret key the snapshots are signed with (see `snapshot`),
+          which must not be readable by whoever can write to `store`. Defaults
+          to a random key, so only this process can restore the snapshots.
+    """
+    if max_live < 1:
+      raise ValueError(
+          f"The number of live sessions must be positive, got {max_live}."
+      )
+    self._base = base
+    self._max_live = max_live
+    self._store = store if store is not None else InMemorySnapshotStore()
+    self._key = key if key is not None else secrets.token_bytes(32)
+    self._live: collections.OrderedDict[str, camel_value.Namespace] = (
+        collections.OrderedDict()
+    )
+    self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+        weakref.WeakValueDictionary()
+    )
+    self._lock = threading.Lock()
+    self._evictions = 0
+    self._restores = 0
+
+  def lock(self, session_id: str) -> asyncio.Lock:
+    """Returns the lock to hold while running code in the session."""
+    with self._lock:
+      session_lock = self._locks.get(session_id)
+      if session_lock is None:
+        session_lock = asyncio.Lock()
+        self._locks[session_id] = session_lock
+      return session_lock
+
+  def get(self, session_id: str) -> camel_value.Namespace:
+    """Returns the namespace of the session.
+
+    Args:
+        session_id: The ID of the session.
+
+    Returns:
+        The namespace in memory, else the one restored from the store, else
+        the base namespace for new sessions.
+    """
+    with self._lock:
+      namespace = self._live.get(session_id)
+      if namespace is not None:
+        self._live.move_to_end(session_id)
+        return namespace
+    snapshot = self._store.get(session_id)
+    if snapshot is None:
+      return self._base
+    namespace = snapshot_lib.loads(snapshot, self._base, self._key)
+    self._store.delete(session_id)
+    with self._lock:
+      self._restores += 1
+    self.put(session_id, namespace)
+    return namespace
+
+  def put(self, session_id: str, namespace: camel_value.Namespace) -> None:
+    """Sets the namespace of the session, and evicts the oldest ones."""
+    with self._lock:
+      self._live[session_id] = namespace
+      self._live.move_to_end(session_id)
+      evicted = []
+      for other_id in list(self._live):
+        if len(self._live) <= self._max_live:
+          break
+        other_lock = self._locks.get(other_id)
+        if other_id == session_id or (
+            other_lock is not None and other_lock.locked()
+        ):
+          continue
+        evicted.append((other_id, self._live.pop(other_id)))
+    for other_id, other_namespace in evicted:
+      try:
+        self._store.put(
+            other_id,
+            snapshot_lib.dumps(other_namespace, self._base, self._key),
+        )
+      except snapshot_lib.SnapshotError:
+        # Keep the namespaces that can't be saved in memory.
+        with self._lock:
+          self._live[other_id] = other_namespace
+          self._live.move_to_end(other_id, last=False)
+        continue
+      with self._lock:
+        self._evictions += 1
+
+  def discard(self, session_id: str) -> None:
+    """Forgets the namespace of the session (e.g., when it is deleted)."""
+    with self._lock:
+      self._live.pop(session_id, None)
+    self._store.delete(session_id)
+
+  def stats(self) -> SessionStats:
+    with self._lock:
+      return SessionStats(len(self._live), self._evictions, self._restores)
@@ -0,0 +1,178 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pool of the sessions used to run the Quarantined LLM (Q-LLM).
+
+Each Q-LLM query must run in a session without any history, so that data from
+a query never reaches another one. Instead of creating a session before each
+query and deleting it afterwards, the pool hands out sessions created ahead of
+time. When a session is returned, it is replaced by a new one in the
+background, off the path of the queries. The number of sessions, and hence of
+concurrent queries, is bounded by the size of the pool.
+
+The pool can be used from different event loops (e.g., the interpreter waits
+for tools with `asyncio.run` when it is not run from an event loop), so it
+only relies on thread-safe state, and waits for a session by polling. If a
+loop is closed before a returned session is replaced, the session is deleted
+when the next one is handed out instead.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+import contextlib
+import functools
+import threading
+import time
+from typing import NamedTuple
+
+from google.adk.sessions import base_session_service
+
+_POLL_INTERVAL = 0.005
+"""Seconds between checks for a free session when the pool is exhausted."""
+
+
+class PoolMetrics(NamedTuple):
+  """Metrics of a `SessionPool`, to size it.
+
+  If `wait_time` is large compared to `model_time`, the pool is too small for
+  the number of concurrent queries.
+  """
+
+  size: int
+  """The maximum number of sessions."""
+  in_use: int
+  """The number of sessions running a query."""
+  idle: int
+  """The number of sessions ready to be used."""
+  acquisitions: int
+  """The number of sessions handed out."""
+  wait_time: float
+  """Total seconds spent waiting for a session (including creating it)."""
+  max_wait_time: float
+  """Longest wait for a session, in seconds."""
+  model_time: float
+  """Total seconds spent running queries in the sessions."""
+
+
+class SessionPool:
+  """Bounded pool of sessions, reset when they are returned."""
+
+  def __init__(
+      self,
+      session_service: base_session_service.BaseSessionService,
+      app_name: str,
+      user_id: str,
+      size: int = 8,
+  ) -> None:
+    if size < 1:
+      raise ValueError(f"The pool size must be positive, got {size}.")
+    self._session_service = session_service
+    self._app_name = app_name
+    self._user_id = user_id
+    self._size = size
+    self._lock = threading.Lock()
+    self._idle: list[str] = []
+    self._stale: list[str] = []  # Used, but not deleted.
+    self._sessions = 0  # Idle, in use, or being created or reset.
+    self._in_use = 0
+    self._acquisitions = 0
+    self._wait_time = 0.0
+    self._max_wait_time = 0.0
+    self._model_time = 0.0
+    self._resets: set[asyncio.Task[None]] = set()
+
+  async def _acquire(self) -> str:
+    with self._lock:
+      stale, self._stale = self._stale, []
+    for session_id in stale:
+      await self._session_service.delete_session(
+          app_name=self._app_name, user_id=self._user_id, session_id=session_id
+      )
+    while True:
+      with self._lock:
+        if self._idle:
+          return self._idle.pop()
+        if self._sessions < self._size:
+          self._sessions += 1
+          break
+      await asyncio.sleep(_POLL_INTERVAL)
+    try:
+      session = await self._session_service.create_session(
+          app_name=self._app_name, user_id=self._user_id
+      )
+    except BaseException:
+      with self._lock:
+        self._sessions -= 1
+      raise
+    return session.id
+
+  async def _reset(self, session_id: str) -> None:
+    await self._session_service.delete_session(
+        app_name=self._app_name, user_id=self._user_id, session_id=session_id
+    )
+    session = await self._session_service.create_session(
+        app_name=self._app_name, user_id=self._user_id
+    )
+    with self._lock:
+      self._idle.append(session.id)
+
+  def _reset_done(self, session_id: str, reset: asyncio.Task[None]) -> None:
+    self._resets.discard(reset)
+    if reset.cancelled() or reset.exception() is not None:
+      # E.g., the loop was closed. A new session is created when needed.
+      with self._lock:
+        self._sessions -= 1
+        self._stale.append(session_id)
+
+  @contextlib.asynccontextmanager
+  async def session(self) -> AsyncIterator[str]:
+    """Waits for a session without history and yields its ID.
+
+    The session is replaced by a new one after use.
+
+    Yields:
+        The ID of the session.
+    """
+    start = time.perf_counter()
+    session_id = await self._acquire()
+    wait_time = time.perf_counter() - start
+    with self._lock:
+      self._in_use += 1
+      self._acquisitions += 1
+      self._wait_time += wait_time
+      self._max_wait_time = max(self._max_wait_time, wait_time)
+    try:
+      yield session_id
+    finally:
+      with self._lock:
+        self._in_use -= 1
+      reset = asyncio.get_running_loop().create_task(self._reset(session_id))
+      self._resets.add(reset)
+      reset.add_done_callback(functools.partial(self._reset_done, session_id))
+
+  def record_model_time(self, seconds: float) -> None:
+    with self._lock:
+      self._model_time += seconds
+
+  def metrics(self) -> PoolMetrics:
+    with self._lock:
+      return PoolMetrics(
+          size=self._size,
+          in_use=self._in_use,
+          idle=len(self._idle),
+          acquisitions=self._acquisitions,
+          wait_time=self._wait_time,
+          max_wait_time=self._max_wait_time,
+          model_time=self._model_time,
+      )
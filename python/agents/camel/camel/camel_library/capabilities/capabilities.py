@@ -15,31 +15,105 @@
 """Module containing definitions for the capabilities in CaMeL."""
 
 import dataclasses
+import functools
 from typing import Any, Self
+import weakref
 
 from . import readers
 from . import sources
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, eq=False)
 class Capabilities:
-  """Capabilities for a value."""
+  """Capabilities for a value.
+
+  Capabilities are immutable and are shared by many values, so
+  `other_metadata` must not be mutated. Use `Capabilities.canonical` to get a
+  shared instance instead of allocating a new one.
+  """
 
   sources_set: frozenset[sources.Source]
   readers_set: readers.Readers[Any]
   other_metadata: dict[str, Any] = dataclasses.field(default_factory=dict)
 
-  def __hash__(self) -> int:
+  def __eq__(self, other: object) -> bool:
+    if self is other:
+      return True
+    if not isinstance(other, Capabilities):
+      return NotImplemented
     return (
+        self.sources_set == other.sources_set
+        and self.readers_set == other.readers_set
+        and self.other_metadata == other.other_metadata
+    )
+
+  def __hash__(self) -> int:
+    try:
+      return self._hash
+    except AttributeError:
+      pass
+    # Hash the metadata as a set so that the hash is consistent with `__eq__`.
+    value_hash = (
         hash(self.sources_set)
         ^ hash(self.readers_set)
-        ^ hash(tuple(self.other_metadata.items()))
+        ^ hash(frozenset(self.other_metadata.items()))
+    )
+    object.__setattr__(self, "_hash", value_hash)
+    return value_hash
+
+  def __reduce__(self):
+    # Don't pickle the cached hash, as hashes of strings differ across
+    # processes.
+    return type(self).canonical, (
+        self.sources_set,
+        self.readers_set,
+        self.other_metadata,
     )
 
   @classmethod
+  def canonical(
+      cls,
+      sources_set: frozenset[sources.Source],
+      readers_set: readers.Readers[Any],
+      other_metadata: dict[str, Any] | None = None,
+  ) -> Self:
+    """Returns the shared instance with the given fields, creating it if needed.
+
+    Args:
+      sources_set: The sources of the value.
+      readers_set: The readers of the value.
+      other_metadata: Other metadata. It must have hashable values to be
+        shared.
+
+    Returns:
+      The capabilities.
+    """
+    other_metadata = other_metadata or {}
+    try:
+      key = (cls, sources_set, readers_set, frozenset(other_metadata.items()))
+      capabilities = _CANONICAL_CAPABILITIES.get(key)
+    except TypeError:
+      return cls(sources_set, readers_set, other_metadata)
+    if capabilities is None:
+      capabilities = cls(sources_set, readers_set, other_metadata)
+      _CANONICAL_CAPABILITIES[key] = capabilities
+    return capabilities
+
+  @classmethod
+  @functools.cache
   def default(cls) -> Self:
-    return cls(frozenset({sources.SourceEnum.USER}), readers.Public())
+    return cls.canonical(
+        frozenset({sources.SourceEnum.USER}), readers.Public()
+    )
 
   @classmethod
+  @functools.cache
   def camel(cls) -> Self:
-    return cls(frozenset({sources.SourceEnum.CAMEL}), readers.Public())
+    return cls.canonical(
+        frozenset({sources.SourceEnum.CAMEL}), readers.Public()
+    )
+
+
+_CANONICAL_CAPABILITIES: weakref.WeakValueDictionary[Any, Capabilities] = (
+    weakref.WeakValueDictionary()
+)
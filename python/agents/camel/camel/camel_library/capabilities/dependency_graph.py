@@ -0,0 +1,295 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Resolution of readers and sources through the graph of dependencies."""
+
+import dataclasses
+import threading
+from typing import Any
+import weakref
+
+from . import readers
+from . import sources
+from ..interpreter import camel_value
+
+
+@dataclasses.dataclass(frozen=True)
+class Resolved:
+  """The readers and sources of a value, including its dependencies'."""
+
+  readers: readers.Readers[Any]
+  """Intersection of the readers of the value and of its dependencies."""
+  sources: frozenset[sources.Source]
+  """Union of the sources of the value and of its dependencies."""
+  epoch: int | None
+  """The mutation epoch the value was resolved at, or `None` if it depends on
+  no value that can be mutated, in which case it never becomes stale."""
+
+
+_EMPTY = Resolved(frozenset(), frozenset(), None)
+"""What is resolved for values without capabilities."""
+
+_IN_PROGRESS = object()
+
+
+class _Entry:
+  """The cached resolution of a value, and what it was computed from."""
+
+  __slots__ = ("ref", "resolved", "visited", "children", "checked_epoch")
+
+  def __init__(
+      self,
+      ref: weakref.ref[Any],
+      resolved: Resolved,
+      visited: frozenset[int],
+      children: tuple[tuple[int, Resolved], ...],
+  ) -> None:
+    self.ref = ref
+    self.resolved = resolved
+    self.visited = visited
+    """The `id`s visited by the value's `get_dependencies` (e.g., of the value
+    and of the elements of a list), including the ones of the Python objects
+    that mutations are recorded on."""
+    self.children = children
+    """The `id`s of the dependencies of the value, with their resolutions."""
+    self.checked_epoch = resolved.epoch
+    """The last mutation epoch the resolution is known to be current at."""
+
+
+class DependencyGraph:
+  """Resolves the readers and sources of values, caching the results.
+
+  The readers (resp. sources) of a value are the intersection (resp. union) of
+  the readers (resp. sources) of all the values it transitively depends on. The
+  graph is walked iteratively (so that deep chains of dependencies can't exceed
+  the recursion limit), and the result for each value visited is stored in a
+  side table keyed by identity. Hence, resolving a value created late in a
+  program only visits the dependencies that were not resolved before.
+
+  Results that involve values which can be mutated in place (e.g., lists) are
+  checked again after mutations (as recorded by `camel_value.record_mutation`):
+  they are reused unless one of the values they were computed from was mutated
+  since. The check doesn't call `get_dependencies`, so mutating a value (e.g.,
+  a dict filled in a loop) doesn't make resolving unrelated values (e.g., a
+  large list of tool outputs the loop iterates on) walk them again.
+
+  A graph can be shared by programs running in several threads (e.g., for
+  different sessions): the resolutions are serialized by a lock.
+  """
+
+  def __init__(self) -> None:
+    self._cache: dict[int, _Entry] = {}
+    self._lock = threading.RLock()
+
+  def _lookup(self, value: Any, epoch: int) -> Resolved | None:
+    entry = self._cache.get(id(value))
+    if entry is None or entry.ref() is not value:
+      return None
+    if entry.checked_epoch in (None, epoch) or self._is_current(entry, epoch):
+      return entry.resolved
+    return None
+
+  def _is_current(self, entry: _Entry, epoch: int) -> bool:
+    """Returns whether a cached resolution is current at mutation `epoch`.
+
+    It is current if none of the values it was computed from was mutated
+    since it was last checked, and the resolutions of its dependencies are
+    current and the same as the ones it was computed from.
+
+    Args:
+      entry: The cached resolution, which may be stale.
+      epoch: The current mutation epoch.
+
+    Returns:
+      Whether the resolution is current. If so, it and the resolutions of its
+      dependencies are marked as checked at `epoch`.
+    """
+    cache = self._cache
+    mutated_since = camel_value.mutated_since
+    checked: list[_Entry] = []
+    seen: set[int] = set()
+    stack = [entry]
+    while stack:
+      e = stack.pop()
+      checked.append(e)
+      if mutated_since(e.visited, e.checked_epoch):
+        return False
+      for child_id, child_resolved in e.children:
+        child = cache.get(child_id)
+        if child is None or child.resolved is not child_resolved:
+          return False
+        if child.checked_epoch not in (None, epoch) and child_id not in seen:
+          seen.add(child_id)
+          stack.append(child)
+    for e in checked:
+      e.checked_epoch = epoch
+    return True
+
+  def _store(
+      self,
+      value: Any,
+      resolved: Resolved,
+      visited: frozenset[int],
+      children: tuple[tuple[int, Resolved], ...],
+  ) -> None:
+    key = id(value)
+    cache = self._cache
+    try:
+      ref = weakref.ref(value, lambda _: cache.pop(key, None))
+    except TypeError:
+      return  # Values that can't be weakly referenced are not cached.
+    cache[key] = _Entry(ref, resolved, visited, children)
+
+  def resolve(self, value: Any) -> Resolved:
+    """Returns the readers and sources of `value` and of its dependencies.
+
+    Args:
+      value: The value to resolve.
+
+    Returns:
+      The resolved readers and sources.
+    """
+    with self._lock:
+      return self._resolve(value)
+
+  def can_change(self, value: Any) -> bool:
+    """Returns whether `value` depends on a value that can be mutated in place.
+
+    Unlike `resolve`, the walk stops at the first such value, so it doesn't
+    visit (or, for tool outputs converted on access, convert) the rest of the
+    dependencies.
+
+    Args:
+      value: The value to check.
+
+    Returns:
+      Whether the readers and sources of `value` can change.
+    """
+    with self._lock:
+      epoch = camel_value.mutation_epoch()
+      seen = {id(value)}
+      stack = [value]
+      while stack:
+        v = stack.pop()
+        resolved = self._lookup(v, epoch)
+        if resolved is not None:
+          if resolved.epoch is not None:
+            return True
+          continue
+        if v.capabilities is None:
+          continue
+        if getattr(v, "has_mutable_dependencies", True):
+          return True
+        dependencies, _ = v.get_dependencies()
+        for dependency in dependencies:
+          if not isinstance(dependency, readers.Public) and (
+              id(dependency) not in seen
+          ):
+            seen.add(id(dependency))
+            stack.append(dependency)
+      return False
+
+  def _resolve(self, value: Any) -> Resolved:
+    epoch = camel_value.mutation_epoch()
+    resolved = self._lookup(value, epoch)
+    if resolved is not None:
+      return resolved
+
+    # Results of the values visited in this walk, or `_IN_PROGRESS` for those
+    # which are still on the stack.
+    visited: dict[int, Any] = {}
+    # Values whose results are complete, to be cached at the end, with what
+    # they were computed from.
+    done: list[
+        tuple[Any, Resolved, frozenset[int], tuple[tuple[int, Resolved], ...]]
+    ] = []
+    has_cycle = False
+    # The dependencies resolved from the cache, with their results.
+    cached_children: list[tuple[int, Resolved]] = []
+    # Each frame holds the value, the iterator on its dependencies, the
+    # readers, sources, and mutability accumulated so far, the ids visited by
+    # its `get_dependencies`, and its dependencies with their results.
+    stack: list[list[Any]] = []
+
+    def push(v: Any) -> Resolved | None:
+      capabilities = v.capabilities
+      if capabilities is None:
+        return _EMPTY
+      visited[id(v)] = _IN_PROGRESS
+      dependencies, dependencies_visited = v.get_dependencies()
+      if id(v) not in dependencies_visited:
+        dependencies_visited |= {id(v)}
+      stack.append([
+          v,
+          # `Public` can be used as a dependency of tools' outputs.
+          (d for d in dependencies if not isinstance(d, readers.Public)),
+          capabilities.readers_set,
+          capabilities.sources_set,
+          getattr(v, "has_mutable_dependencies", True),
+          dependencies_visited,
+          [],
+      ])
+      return None
+
+    if (empty := push(value)) is not None:
+      return empty
+    while True:
+      frame = stack[-1]
+      for dependency in frame[1]:
+        dependency_resolved = visited.get(id(dependency))
+        if dependency_resolved is _IN_PROGRESS:
+          # The dependency is being resolved further up the stack, and its
+          # readers and sources will be accumulated there.
+          has_cycle = True
+          continue
+        if dependency_resolved is None:
+          dependency_resolved = self._lookup(dependency, epoch)
+          if dependency_resolved is not None:
+            cached_children.append((id(dependency), dependency_resolved))
+        if dependency_resolved is None:
+          dependency_resolved = push(dependency)
+          if dependency_resolved is None:
+            break  # Resolve the dependency first.
+        frame[2] &= dependency_resolved.readers
+        frame[3] |= dependency_resolved.sources
+        frame[4] |= dependency_resolved.epoch is not None
+        frame[6].append((id(dependency), dependency_resolved))
+      else:
+        stack.pop()
+        v, _, v_readers, v_sources, is_mutable, v_visited, v_children = frame
+        resolved = Resolved(v_readers, v_sources, epoch if is_mutable else None)
+        visited[id(v)] = resolved
+        done.append((v, resolved, v_visited, tuple(v_children)))
+        if not stack:
+          break
+        parent = stack[-1]
+        parent[2] &= v_readers
+        parent[3] |= v_sources
+        parent[4] |= is_mutable
+        parent[6].append((id(v), resolved))
+
+    if has_cycle:
+      # Only the value the walk started from is guaranteed to have accumulated
+      # the readers and sources of all the values in the cycle. It is cached
+      # as computed from everything the walk visited.
+      self._store(
+          value,
+          resolved,
+          frozenset().union(*(v_visited for _, _, v_visited, _ in done)),
+          tuple(cached_children),
+      )
+    else:
+      for v, *computed_from in done:
+        self._store(v, *computed_from)
+    return resolved
@@ -16,6 +16,7 @@
 
 from typing import Any, Protocol
 from . import capabilities
+from . import dependency_graph
 from . import readers
 from . import sources
 from ..interpreter import camel_value
@@ -33,6 +34,9 @@ class HasDependenciesAndCapabilities(Protocol):
     ...
 
 
+_DEPENDENCY_GRAPH = dependency_graph.DependencyGraph()
+
+
 def get_all_readers(
     value: HasDependenciesAndCapabilities,
     visited_objects: frozenset[int] = frozenset(),
@@ -41,7 +45,8 @@ def get_all_readers(
 
   Args:
     value: The value to get the readers for.
-    visited_objects: The set of visited objects to avoid circular dependencies.
+    visited_objects: The set of visited objects. If `value` is in it, only its
+      own readers are returned.
 
   Returns:
     A tuple containing the set of readers and the set of visited objects.
@@ -49,19 +54,13 @@ def get_all_readers(
   value_capabilities = value.capabilities
   if value_capabilities is None:
     return frozenset(), frozenset()
-  value_readers = value_capabilities.readers_set
   if id(value) in visited_objects:
     # Catch circular dependencies.
-    return value_readers, visited_objects
-  for dependency in value.get_dependencies()[0]:
-    if dependency == readers.Public():
-      continue
-    new_value_readers, visited_objects = get_all_readers(
-        dependency, visited_objects | {id(value)}
-    )
-    if new_value_readers is not None:
-      value_readers &= new_value_readers
-  return value_readers, visited_objects | {id(value)}
+    return value_capabilities.readers_set, visited_objects
+  return (
+      _DEPENDENCY_GRAPH.resolve(value).readers,
+      visited_objects | {id(value)},
+  )
 
 
 def is_public(value: HasDependenciesAndCapabilities):
@@ -72,6 +71,23 @@ def is_public(value: HasDependenciesAndCapabilities):
     return value_readers == readers.Public()
 
 
+def can_change(value: HasDependenciesAndCapabilities) -> bool:
+  """Returns whether the dependencies of `value` can change after creation.
+
+  This is the case if `value`, or a value it transitively depends on, can be
+  mutated in place (e.g., a list).
+
+  Args:
+    value: The value to check.
+
+  Returns:
+    True if the readers and sources of `value` can change, False otherwise.
+  """
+  return getattr(
+      value, "has_mutable_dependencies", True
+  ) or _DEPENDENCY_GRAPH.can_change(value)
+
+
 def can_readers_read_value(
     potential_readers: set[Any], value: camel_value.Value
 ) -> bool:
@@ -89,7 +105,8 @@ def get_all_sources(
 
   Args:
     value: The value to get the sources for.
-    visited_objects: The set of visited objects to avoid circular dependencies.
+    visited_objects: The set of visited objects. If `value` is in it, only its
+      own sources are returned.
 
   Returns:
     A tuple containing the set of sources and the set of visited objects.
@@ -97,16 +114,13 @@ def get_all_sources(
   value_capabilities = value.capabilities
   if value_capabilities is None:
     return frozenset(), frozenset()
-  value_sources = value_capabilities.sources_set
   # Catch circular dependencies.
   if id(value) in visited_objects:
-    return value_sources, visited_objects
-  for dependency in value.get_dependencies()[0]:
-    new_value_sources, visited_objects = get_all_sources(
-        dependency, visited_objects | {id(value)}
-    )
-    value_sources |= new_value_sources
-  return value_sources, visited_objects
+    return value_capabilities.sources_set, visited_objects
+  return (
+      _DEPENDENCY_GRAPH.resolve(value).sources,
+      visited_objects | {id(value)},
+  )
 
 
 _TRUSTED_SET = frozenset({
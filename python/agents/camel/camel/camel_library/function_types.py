@@ -14,8 +14,8 @@
 
 """Pydantic models used in CaMeL."""
 
-from collections.abc import Callable
-from typing import Any, Generic, Mapping, ParamSpec, TypeVar
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import Any, Generic, Mapping, ParamSpec, Self, TypeVar, overload
 
 import pydantic
 
@@ -52,3 +52,88 @@ class FunctionCall(pydantic.BaseModel, Generic[_T]):
   """The output of the function call."""
   is_builtin: bool
   """Whether it is a builtin function."""
+
+
+class FunctionCallLog(Sequence[FunctionCall[Any]]):
+  """A persistent, append-only log of function calls.
+
+  Appending a call returns a new log in O(1) that shares all the previous calls
+  with the original one, which is left untouched. Hence, a log can be kept as a
+  snapshot (e.g., to roll back after an error) at no cost.
+  """
+
+  __slots__ = ("_head", "_len")
+
+  def __init__(self, calls: Iterable[FunctionCall[Any]] = ()) -> None:
+    self._head: tuple[Any, FunctionCall[Any]] | None = None
+    """The last call, preceded by the node of the previous one."""
+    self._len = 0
+    for call in calls:
+      self._head = (self._head, call)
+      self._len += 1
+
+  @classmethod
+  def of(cls, calls: Iterable[FunctionCall[Any]]) -> Self:
+    """Returns `calls` if it already is a log, otherwise a log with them."""
+    if isinstance(calls, cls):
+      return calls
+    return cls(calls)
+
+  def append(self, call: FunctionCall[Any]) -> Self:
+    """Returns a new log with `call` appended."""
+    new_log = object.__new__(type(self))
+    new_log._head = (self._head, call)
+    new_log._len = self._len + 1
+    return new_log
+
+  def since(self, cursor: int) -> list[FunctionCall[Any]]:
+    """Returns the calls made after the first `cursor` ones, in order.
+
+    Only the new calls are visited, so it can be used to incrementally process
+    a log.
+
+    Args:
+        cursor: The number of calls to skip (e.g., the length of an earlier
+          snapshot of this log).
+
+    Returns:
+        The calls after the first `cursor` ones.
+    """
+    calls = []
+    node = self._head
+    for _ in range(self._len - max(cursor, 0)):
+      node, call = node  # type: ignore  # can't be None before the start
+      calls.append(call)
+    calls.reverse()
+    return calls
+
+  def __len__(self) -> int:
+    return self._len
+
+  def __iter__(self) -> Iterator[FunctionCall[Any]]:
+    return iter(self.since(0))
+
+  @overload
+  def __getitem__(self, index: int) -> FunctionCall[Any]:
+    ...
+
+  @overload
+  def __getitem__(self, index: slice) -> list[FunctionCall[Any]]:
+    ...
+
+  def __getitem__(
+      self, index: int | slice
+  ) -> FunctionCall[Any] | list[FunctionCall[Any]]:
+    if isinstance(index, slice):
+      return self.since(0)[index]
+    if not -self._len <= index < self._len:
+      raise IndexError("function call log index out of range")
+    # Only walk back from the end as far as needed.
+    return self.since(index % self._len)[0]
+
+  def __reduce__(self):
+    # Avoids recursing through all the nodes when pickling or deep-copying.
+    return type(self), (self.since(0),)
+
+  def __repr__(self) -> str:
+    return f"{type(self).__name__}({self.since(0)!r})"
@@ -0,0 +1,219 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bridge between the interpreter and asynchronous tools.
+
+The interpreter evaluates programs synchronously, but tools can be coroutine
+functions (e.g., `query_ai_assistant`, which runs the Q-LLM). When a program is
+evaluated with `run_in_thread` from an event loop, the evaluation runs in a
+worker thread, and the awaitables returned by tools are awaited on that event
+loop. Hence, tools share the caller's loop (and, e.g., its HTTP connections)
+instead of each call creating its own. Otherwise (e.g., when a program is
+evaluated from synchronous code), the awaitables are awaited on a helper event
+loop, which runs in a daemon thread started on first use and shared by all
+these evaluations.
+
+Cancelling `run_in_thread` (e.g., with `asyncio.wait_for`) can't interrupt the
+worker thread, so it cancels the evaluation instead: the awaitables of the
+tools being awaited are cancelled, and the interpreter calls `check_cancelled`
+between statements and before each tool call, which stops the evaluation with
+an `asyncio.CancelledError`. A tool which blocks the worker thread without
+returning an awaitable still runs to completion.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import threading
+from typing import Any, TypeVar
+
+_T = TypeVar("_T")
+
+_event_loop: contextvars.ContextVar[asyncio.AbstractEventLoop | None] = (
+    contextvars.ContextVar("_event_loop", default=None)
+)
+"""The event loop awaiting the evaluation running in the current context."""
+
+
+class _Cancellation:
+  """Whether an evaluation was cancelled, and how to cancel what it awaits."""
+
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self.cancelled = False
+    self._callbacks: set[Callable[[], Any]] = set()
+
+  def cancel(self) -> None:
+    with self._lock:
+      self.cancelled = True
+      callbacks = list(self._callbacks)
+    for callback in callbacks:
+      # The loop of the awaitable may have closed since it completed.
+      with contextlib.suppress(RuntimeError):
+        callback()
+
+  @contextlib.contextmanager
+  def on_cancel(self, callback: Callable[[], Any]) -> Iterator[None]:
+    """Calls `callback` if the evaluation is or gets cancelled in the context.
+
+    Args:
+        callback: The function cancelling what the evaluation awaits.
+
+    Yields:
+        Nothing.
+    """
+    with self._lock:
+      cancelled = self.cancelled
+      if not cancelled:
+        self._callbacks.add(callback)
+    if cancelled:
+      callback()
+    try:
+      yield
+    finally:
+      with self._lock:
+        self._callbacks.discard(callback)
+
+
+_cancellation: contextvars.ContextVar[_Cancellation | None] = (
+    contextvars.ContextVar("_cancellation", default=None)
+)
+"""The cancellation of the evaluation running in the current context."""
+
+
+def check_cancelled() -> None:
+  """Stops the evaluation running in the current context if it was cancelled.
+
+  Raises:
+      asyncio.CancelledError: If the `run_in_thread` running the evaluation
+        was cancelled.
+  """
+  cancellation = _cancellation.get()
+  if cancellation is not None and cancellation.cancelled:
+    raise asyncio.CancelledError()
+
+
+async def _await(
+    awaitable: Awaitable[_T], cancellation: _Cancellation | None
+) -> _T:
+  if cancellation is None:
+    return await awaitable
+  task = asyncio.ensure_future(awaitable)
+  cancel = functools.partial(
+      asyncio.get_running_loop().call_soon_threadsafe, task.cancel
+  )
+  with cancellation.on_cancel(cancel):
+    return await task
+
+
+_helper_loop: asyncio.AbstractEventLoop | None = None
+_helper_loop_lock = threading.Lock()
+
+
+def _get_helper_loop() -> asyncio.AbstractEventLoop:
+  """Returns the loop awaiting the tools of evaluations without a loop."""
+  global _helper_loop
+  with _helper_loop_lock:
+    if _helper_loop is None:
+      loop = asyncio.new_event_loop()
+      threading.Thread(
+          target=loop.run_forever, name="camel-async-bridge", daemon=True
+      ).start()
+      _helper_loop = loop
+    return _helper_loop
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+  try:
+    return asyncio.get_running_loop()
+  except RuntimeError:
+    return None
+
+
+def wait_for(awaitable: Awaitable[_T]) -> _T:
+  """Waits for `awaitable` to complete from synchronous code.
+
+  Args:
+      awaitable: The awaitable to wait for, e.g., the output of a tool.
+
+  Returns:
+      The result of the awaitable.
+
+  Raises:
+      asyncio.CancelledError: If the evaluation running in the current context
+        is cancelled while waiting.
+      RuntimeError: If called from the helper loop, which can't wait for
+        itself.
+  """
+  cancellation = _cancellation.get()
+  loop = _event_loop.get()
+  running_loop = _running_loop()
+  if loop is None or loop.is_closed() or loop is running_loop:
+    # Waiting for the loop running in this thread would block it.
+    loop = _get_helper_loop()
+  if loop is running_loop:
+    raise RuntimeError(
+        "Can't wait for an awaitable from the loop it would be awaited on."
+    )
+  try:
+    return asyncio.run_coroutine_threadsafe(
+        _await(awaitable, cancellation), loop
+    ).result()
+  except concurrent.futures.CancelledError:
+    check_cancelled()
+    raise
+
+
+async def run_in_thread(
+    function: Callable[..., _T],
+    *args: Any,
+    executor: concurrent.futures.Executor | None = None,
+) -> _T:
+  """Calls `function` in a worker thread, awaiting tools on the running loop.
+
+  Args:
+      function: The function to call.
+      *args: The arguments to pass to `function`.
+      executor: The executor to run `function` in. Defaults to the default
+        executor of the loop. While tools are awaited, the worker thread is
+        blocked, so the number of workers bounds the number of concurrent
+        evaluations.
+
+  Returns:
+      The result of `function`.
+
+  Raises:
+      asyncio.CancelledError: If the call is cancelled. The evaluation running
+        in the worker thread stops at its next check (see `check_cancelled`).
+  """
+  loop = asyncio.get_running_loop()
+  cancellation = _Cancellation()
+  token = _event_loop.set(loop)
+  cancellation_token = _cancellation.set(cancellation)
+  try:
+    # The current context is copied (as `asyncio.to_thread` does), so
+    # `wait_for` finds the loop in the worker thread.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, function, *args)
+    )
+  except asyncio.CancelledError:
+    cancellation.cancel()
+    raise
+  finally:
+    _cancellation.reset(cancellation_token)
+    _event_loop.reset(token)
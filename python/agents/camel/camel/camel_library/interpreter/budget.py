@@ -0,0 +1,175 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Execution budgets of the interpreter.
+
+A budget bounds the resources an evaluation of P-LLM code can use: the number
+of AST nodes it evaluates, the size of the containers it creates, and its
+wall-clock time. When `EvalArgs.budget` is set, the outermost `camel_eval`
+starts a `Meter` for the evaluation, which the interpreter (and the built-ins
+which allocate, e.g., `range`) charge as they go. Exceeding the budget makes
+the evaluation fail with a `BudgetExceededError`, which is returned to the
+P-LLM like any other error, so that it can write cheaper code.
+
+The time budget is checked between the evaluations of nodes, so a tool call
+which blocks is not interrupted, but the evaluation stops when it returns.
+"""
+
+import contextlib
+import contextvars
+import dataclasses
+import math
+import time
+from collections.abc import Iterator
+
+
+@dataclasses.dataclass(frozen=True)
+class ExecutionBudget:
+  """The resources an evaluation can use. `None` means unlimited."""
+
+  max_steps: int | None = None
+  """The maximum number of AST nodes evaluated (counting repetitions, e.g., in
+  loops and comprehensions), plus the number of elements created by `range`."""
+  max_container_size: int | None = None
+  """The maximum number of elements of the lists, tuples, sets, dicts and
+  strings the code creates. Containers returned by tools are not limited."""
+  timeout: float | None = None
+  """The maximum wall-clock time of the evaluation, in seconds. It is checked
+  between steps, so the work of a single step (e.g., a call to `range`) is
+  not interrupted: set `max_container_size` too to bound it."""
+
+
+class BudgetExceededError(Exception):
+  """The evaluation exceeded its execution budget."""
+
+
+class Meter:
+  """The resources used so far by an evaluation."""
+
+  __slots__ = ("budget", "steps", "_max_steps", "_deadline")
+
+  def __init__(self, budget: ExecutionBudget) -> None:
+    self.budget = budget
+    self.steps = 0
+    # Unlimited resources are infinite, so that `step` only compares.
+    self._max_steps = (
+        budget.max_steps if budget.max_steps is not None else math.inf
+    )
+    self._deadline = (
+        time.monotonic() + budget.timeout
+        if budget.timeout is not None
+        else math.inf
+    )
+
+  def step(self, count: int = 1) -> None:
+    """Charges the evaluation of nodes.
+
+    Args:
+        count: The number of steps to charge.
+
+    Raises:
+        BudgetExceededError: If the evaluation exceeded its number of steps or
+          its time.
+    """
+    self.steps += count
+    if self.steps > self._max_steps:
+      raise BudgetExceededError(
+          f"The code exceeded its budget of {self.budget.max_steps} evaluation"
+          " steps. Write code which does less work, e.g., with fewer"
+          " iterations."
+      )
+    if self._deadline is not math.inf and time.monotonic() > self._deadline:
+      raise BudgetExceededError(
+          f"The code exceeded its time budget of {self.budget.timeout}"
+          " seconds. Write code which does less work."
+      )
+
+  def check_container_size(self, size: int) -> None:
+    """Checks the size of a container before or after creating it.
+
+    Raises:
+        BudgetExceededError: If the container is too large.
+    """
+    max_size = self.budget.max_container_size
+    if max_size is not None and size > max_size:
+      raise BudgetExceededError(
+          f"The code creates a container of {size} elements, more than its"
+          f" budget of {max_size} elements."
+      )
+
+
+_meter: contextvars.ContextVar[Meter | None] = contextvars.ContextVar(
+    "_meter", default=None
+)
+"""The meter of the evaluation running in the current context."""
+
+
+def current() -> Meter | None:
+  """Returns the meter of the running evaluation, if it has a budget."""
+  return _meter.get()
+
+
+@contextlib.contextmanager
+def metered(budget: ExecutionBudget) -> Iterator[Meter]:
+  """Runs an evaluation with `budget`, unless one is already running.
+
+  Args:
+      budget: The budget of the evaluation.
+
+  Yields:
+      The meter of the evaluation (the one of the outer evaluation, if any).
+  """
+  meter = _meter.get()
+  if meter is not None:
+    yield meter
+    return
+  meter = Meter(budget)
+  token = _meter.set(meter)
+  try:
+    yield meter
+  finally:
+    _meter.reset(token)
+
+
+def check_allocation(size: int) -> None:
+  """Charges the creation of a container by a built-in, before creating it.
+
+  The container is checked against the maximum size, and each element is
+  charged as a step, as creating it costs about as much as evaluating a node.
+
+  Args:
+      size: The number of elements of the container.
+
+  Raises:
+      BudgetExceededError: If the container is too large, or the evaluation
+        exceeded its number of steps or its time.
+  """
+  meter = _meter.get()
+  if meter is not None:
+    meter.check_container_size(size)
+    meter.step(size)
+
+
+def check_container_size(size: int) -> None:
+  """Checks the size of a container against the budget of the evaluation.
+
+  Args:
+      size: The number of elements of the container.
+
+  Raises:
+      BudgetExceededError: If the container is too large.
+  """
+  meter = _meter.get()
+  if meter is not None:
+    meter.check_container_size(size)
@@ -0,0 +1,539 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Scheduling of side-effect-free tool calls ahead of program order.
+
+When `EvalArgs.parallel_tool_calls` is set, the interpreter looks for calls to
+tools without side effects (i.e., in the `no_side_effect_tools` of the
+security policy engine) in the statement it is about to evaluate, and starts
+them in a thread pool. Calls in the elements of a comprehension are started
+for all the iterations at once. Looking ahead stops at the first call which may
+have side effects, so that calls are never moved before a side effect. The
+arguments of the calls are evaluated ahead of time too, so they can only call
+built-ins and methods which don't mutate their receiver. Calls are only
+started if the security policy engine allows all the calls to the tool (see
+`security_policy.always_allows`), since the policies are checked when
+evaluation reaches the call, with the dependencies at that point.
+
+When evaluation reaches a call started ahead of time, the call is checked
+against the security policies and recorded in the tool calls chain as usual,
+but its output is taken from the call started ahead of time, provided it was
+made with the same function and equal arguments (otherwise, the function is
+called again). Hence, independent calls run concurrently, while the values,
+the dependencies, and the tool calls chain are the same as when evaluating
+sequentially.
+
+Calls are never started before the previous statements were evaluated, but
+they may be made in vain: if the statement (or an iteration of the
+comprehension) fails before reaching them, they are not recorded, and the
+calls which already started run to completion. Hence, the extra calls made
+when a statement fails are bounded by the calls to tools without side effects
+in that statement (for a comprehension, in all of its iterations).
+
+This module contains the analysis of the AST and the bookkeeping of the calls
+started ahead of time. Evaluating their arguments is up to the interpreter.
+"""
+
+import ast
+import collections
+from collections.abc import Collection, Iterable, Sequence, Set
+import concurrent.futures
+import contextvars
+import dataclasses
+import functools
+from typing import Any, NamedTuple
+
+from . import camel_value
+
+_MAX_WORKERS = 32
+"""Tool calls are I/O-bound (e.g., calls to the Q-LLM), so use many threads."""
+
+_INFO_ATTR = "_camel_schedule"
+_OPERANDS_ATTR = "_camel_operands"
+
+_IMPURE_NODES = (ast.NamedExpr, ast.Lambda)
+"""Nodes which can't be evaluated ahead of time."""
+
+_CONDITIONAL_NODES = (
+    ast.stmt,
+    ast.Lambda,
+    ast.ListComp,
+    ast.SetComp,
+    ast.DictComp,
+    ast.GeneratorExp,
+)
+"""Nodes whose children are not all evaluated exactly once."""
+
+_SIMPLE_STMTS = (ast.Expr, ast.Assign, ast.AnnAssign, ast.AugAssign)
+
+_MUTATING_METHODS = frozenset({
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+    "update",
+    "add",
+    "discard",
+    "setdefault",
+    "popitem",
+})
+
+
+class _CallSite(NamedTuple):
+  node: ast.Call
+  prefetchable: bool
+  """Whether the call is always evaluated, and its arguments can be evaluated
+  ahead of time if `arg_calls` are pure."""
+  arg_calls: tuple[ast.Call, ...]
+  free_names: frozenset[str]
+
+
+class _ComprehensionInfo(NamedTuple):
+  call_sites: tuple[_CallSite, ...]
+  """The calls in the elements, in evaluation order."""
+  generator_calls: tuple[ast.Call, ...]
+  targets: frozenset[str]
+
+
+class _StmtInfo(NamedTuple):
+  call_sites: tuple[_CallSite, ...]
+  """The calls in the statement, in evaluation order."""
+  stored_names: frozenset[str]
+  """The variables assigned, deleted, or mutated by the statement."""
+
+
+def _base_name(node: ast.expr) -> str | None:
+  while isinstance(node, ast.Attribute | ast.Subscript):
+    node = node.value
+  return node.id if isinstance(node, ast.Name) else None
+
+
+def _is_prefetchable(node: ast.Call) -> bool:
+  if not isinstance(node.func, ast.Name):
+    return False
+  if any(isinstance(arg, ast.Starred) for arg in node.args) or any(
+      keyword.arg is None for keyword in node.keywords
+  ):
+    return False
+  return not any(
+      isinstance(child, _IMPURE_NODES)
+      for arg in (*node.args, *(keyword.value for keyword in node.keywords))
+      for child in ast.walk(arg)
+  )
+
+
+def _calls_in(nodes: Iterable[ast.AST]) -> tuple[ast.Call, ...]:
+  return tuple(
+      child
+      for node in nodes
+      for child in ast.walk(node)
+      if isinstance(child, ast.Call)
+  )
+
+
+def _free_names(node: ast.AST) -> frozenset[str]:
+  return frozenset(
+      child.id
+      for child in ast.walk(node)
+      if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)
+  )
+
+
+def _collect_call_sites(
+    node: ast.AST, unconditional: bool, call_sites: list[_CallSite]
+) -> None:
+  """Collects the calls in `node` in evaluation order."""
+  match node:
+    case ast.IfExp(test=test) | ast.If(test=test):
+      _collect_call_sites(test, unconditional, call_sites)
+      for child in (*_as_list(node.body), *_as_list(node.orelse)):
+        _collect_call_sites(child, False, call_sites)
+      return
+    case ast.BoolOp(values=[first, *others]):
+      _collect_call_sites(first, unconditional, call_sites)
+      for child in others:
+        _collect_call_sites(child, False, call_sites)
+      return
+    case ast.For(iter=iterable):
+      _collect_call_sites(iterable, unconditional, call_sites)
+      for child in (node.target, *node.body, *node.orelse):
+        _collect_call_sites(child, False, call_sites)
+      return
+  children_unconditional = unconditional and (
+      isinstance(node, _SIMPLE_STMTS)
+      or not isinstance(node, _CONDITIONAL_NODES)
+  )
+  for child in ast.iter_child_nodes(node):
+    _collect_call_sites(child, children_unconditional, call_sites)
+  if isinstance(node, ast.Call):
+    if unconditional and _is_prefetchable(node):
+      call_sites.append(
+          _CallSite(
+              node,
+              True,
+              _calls_in(
+                  (*node.args, *(keyword.value for keyword in node.keywords))
+              ),
+              _free_names(node),
+          )
+      )
+    else:
+      call_sites.append(_CallSite(node, False, (), frozenset()))
+
+
+def _as_list(nodes: ast.AST | list[ast.AST]) -> list[ast.AST]:
+  return nodes if isinstance(nodes, list) else [nodes]
+
+
+def _stored_names(node: ast.AST) -> frozenset[str]:
+  names = set()
+  for child in ast.walk(node):
+    match child:
+      case ast.Name(ctx=ast.Store() | ast.Del()):
+        names.add(child.id)
+      case ast.Attribute(ctx=ast.Store() | ast.Del()) | ast.Subscript(
+          ctx=ast.Store() | ast.Del()
+      ):
+        names.add(_base_name(child))
+      case ast.Call(func=ast.Attribute(value=receiver, attr=method)) if (
+          method in _MUTATING_METHODS
+      ):
+        names.add(_base_name(receiver))
+      case ast.FunctionDef() | ast.ClassDef():
+        names.add(child.name)
+      case ast.Import() | ast.ImportFrom():
+        for alias in child.names:
+          names.add(alias.asname or alias.name.partition(".")[0])
+      case ast.Global() | ast.Nonlocal():
+        names.update(child.names)
+  names.discard(None)
+  return frozenset(names)
+
+
+def _stmt_info(stmt: ast.stmt) -> _StmtInfo:
+  info = getattr(stmt, _INFO_ATTR, None)
+  if info is None:
+    call_sites = []
+    _collect_call_sites(stmt, True, call_sites)
+    if any(isinstance(child, ast.NamedExpr) for child in ast.walk(stmt)):
+      # The variables assigned by the statement could be arguments of its
+      # calls.
+      call_sites = [
+          call_site._replace(prefetchable=False) for call_site in call_sites
+      ]
+    info = _StmtInfo(tuple(call_sites), _stored_names(stmt))
+    setattr(stmt, _INFO_ATTR, info)
+  return info
+
+
+def _may_have_side_effects(
+    node: ast.Call,
+    namespace: camel_value.Namespace,
+    stored_names: Set[str],
+    no_side_effect_tools: Collection[str],
+) -> bool:
+  """Returns whether the call may be a call to a tool with side effects."""
+  match node.func:
+    case ast.Attribute():
+      # Methods of values. These can't be tools.
+      return False
+    case ast.Name(id=name) if name not in stored_names:
+      match namespace.get(name):
+        case camel_value.CaMeLBuiltin() | camel_value.CaMeLClass():
+          return False
+        case camel_value.CaMeLFunction() as function:
+          return function.name().raw not in no_side_effect_tools
+  return True
+
+
+def _is_pure(
+    node: ast.Call, namespace: camel_value.Namespace, stored_names: Set[str]
+) -> bool:
+  """Returns whether the call can be evaluated ahead of time."""
+  match node.func:
+    case ast.Attribute(attr=method):
+      return method not in _MUTATING_METHODS
+    case ast.Name(id=name) if name not in stored_names:
+      match namespace.get(name):
+        case camel_value.CaMeLClass():
+          return True
+        case camel_value.CaMeLBuiltin() as builtin:
+          return builtin.name().raw != "print"
+  return False
+
+
+def _is_tool(
+    node: ast.Call, namespace: camel_value.Namespace, stored_names: Set[str]
+) -> bool:
+  match node.func:
+    case ast.Name(id=name) if name not in stored_names:
+      return isinstance(namespace.get(name), camel_value.CaMeLFunction)
+  return False
+
+
+def plan_statement(
+    stmt: ast.stmt,
+    namespace: camel_value.Namespace,
+    no_side_effect_tools: Collection[str],
+) -> list[ast.Call]:
+  """Returns the calls in `stmt` which can be started now.
+
+  Args:
+      stmt: The statement about to be evaluated.
+      namespace: The namespace before evaluating `stmt`.
+      no_side_effect_tools: The names of the tools without side effects.
+
+  Returns:
+      The calls which are always evaluated, whose arguments depend only on
+      `namespace`, and which come before any call that may have side effects.
+  """
+  calls = []
+  info = _stmt_info(stmt)
+  for call_site in info.call_sites:
+    if _may_have_side_effects(
+        call_site.node, namespace, info.stored_names, no_side_effect_tools
+    ):
+      return calls
+    if (
+        call_site.prefetchable
+        and _is_tool(call_site.node, namespace, frozenset())
+        and all(
+            _is_pure(arg_call, namespace, frozenset())
+            for arg_call in call_site.arg_calls
+        )
+    ):
+      calls.append(call_site.node)
+  return calls
+
+
+def plan_comprehension(
+    node: ast.ListComp | ast.SetComp | ast.DictComp,
+    namespace: camel_value.Namespace,
+    no_side_effect_tools: Collection[str],
+) -> tuple[ast.Call, ...]:
+  """Returns the calls in the elements of `node` to start for all iterations.
+
+  Args:
+      node: The comprehension about to be evaluated.
+      namespace: The namespace before evaluating `node`.
+      no_side_effect_tools: The names of the tools without side effects.
+
+  Returns:
+      The calls, or no calls if the generators of `node` can't be evaluated
+      ahead of time or if its elements may call tools with side effects.
+  """
+  info = getattr(node, _INFO_ATTR, None)
+  if info is None:
+    call_sites = []
+    if not any(
+        isinstance(child, _IMPURE_NODES)
+        for generator in node.generators
+        for child in ast.walk(generator)
+    ):
+      elts = (node.key, node.value) if isinstance(node, ast.DictComp) else (
+          node.elt,
+      )
+      for elt in elts:
+        _collect_call_sites(elt, True, call_sites)
+    info = _ComprehensionInfo(
+        tuple(call_sites),
+        _calls_in(node.generators),
+        frozenset().union(
+            *(_stored_names(generator.target) for generator in node.generators)
+        ),
+    )
+    setattr(node, _INFO_ATTR, info)
+  if not info.call_sites or not all(
+      _is_pure(call, namespace, info.targets) for call in info.generator_calls
+  ):
+    return ()
+  calls = []
+  for call_site in info.call_sites:
+    if _may_have_side_effects(
+        call_site.node, namespace, info.targets, no_side_effect_tools
+    ):
+      return ()
+    if (
+        call_site.prefetchable
+        and _is_tool(call_site.node, namespace, info.targets)
+        and all(
+            _is_pure(arg_call, namespace, info.targets)
+            for arg_call in call_site.arg_calls
+        )
+    ):
+      calls.append(call_site.node)
+  return tuple(calls)
+
+
+def operands(nodes: Sequence[ast.Call]) -> ast.Tuple:
+  """Returns an expression evaluating the function and arguments of calls.
+
+  Args:
+      nodes: The calls.
+
+  Returns:
+      A tuple with a `(function, args, kwargs)` tuple for each call.
+  """
+  key = tuple(map(id, nodes))
+  cached = getattr(nodes[0], _OPERANDS_ATTR, None)
+  if cached is not None and cached[0] == key:
+    return cached[1]
+  operands_node = ast.Tuple(
+      elts=[
+          ast.Tuple(
+              elts=[
+                  node.func,
+                  ast.Tuple(elts=node.args, ctx=ast.Load()),
+                  ast.Dict(
+                      keys=[
+                          ast.Constant(keyword.arg) for keyword in node.keywords
+                      ],
+                      values=[keyword.value for keyword in node.keywords],
+                  ),
+              ],
+              ctx=ast.Load(),
+          )
+          for node in nodes
+      ],
+      ctx=ast.Load(),
+  )
+  ast.fix_missing_locations(ast.copy_location(operands_node, nodes[0]))
+  setattr(nodes[0], _OPERANDS_ATTR, (key, operands_node))
+  return operands_node
+
+
+@dataclasses.dataclass(frozen=True)
+class _PrefetchedCall:
+  function: camel_value.CaMeLCallable[Any]
+  raw_args: tuple[Any, ...]
+  raw_kwargs: dict[str, Any]
+  output: concurrent.futures.Future[Any]
+
+
+_prefetched_calls: contextvars.ContextVar[
+    dict[ast.Call, collections.deque[_PrefetchedCall | None]] | None
+] = contextvars.ContextVar("_prefetched_calls", default=None)
+"""The calls started ahead of time, by node, in evaluation order."""
+
+
+@functools.cache
+def _executor() -> concurrent.futures.ThreadPoolExecutor:
+  return concurrent.futures.ThreadPoolExecutor(
+      max_workers=_MAX_WORKERS, thread_name_prefix="camel-prefetch"
+  )
+
+
+class PrefetchScope:
+  """The calls started ahead of time for a statement list or comprehension.
+
+  Calls which were not used by the time the scope is closed (e.g., because
+  evaluation failed before reaching them) are discarded: those which didn't
+  start yet are cancelled, the others run to completion.
+  """
+
+  def __init__(self) -> None:
+    calls = _prefetched_calls.get()
+    self._token = None
+    if calls is None:
+      calls = {}
+      self._token = _prefetched_calls.set(calls)
+    self._calls = calls
+    self._nodes: set[ast.Call] = set()
+
+  def prefetch(
+      self,
+      node: ast.Call,
+      call: (
+          tuple[
+              camel_value.CaMeLCallable[Any],
+              camel_value.CaMeLTuple,
+              camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value],
+          ]
+          | None
+      ),
+  ) -> None:
+    """Starts a call for the next evaluation of `node`.
+
+    Args:
+        node: The call.
+        call: The function to call with its positional and keyword arguments,
+          or `None` if the next evaluation of `node` should not use a call
+          started ahead of time.
+    """
+    self._nodes.add(node)
+    queue = self._calls.setdefault(node, collections.deque())
+    if call is None:
+      queue.append(None)
+      return
+    function, args, kwargs = call
+    raw_args = args.raw
+    raw_kwargs = kwargs.raw
+    # The tool gets its own copy of the arguments, while the values can still
+    # be mutated by the program.
+    output = _executor().submit(
+        contextvars.copy_context().run,
+        function.call_detached,
+        args.raw,
+        kwargs.raw,
+        raw_args,
+        raw_kwargs,
+    )
+    queue.append(_PrefetchedCall(function, raw_args, raw_kwargs, output))
+
+  def close(self) -> None:
+    for node in self._nodes:
+      for call in self._calls.pop(node, ()):
+        if call is not None:
+          call.output.cancel()
+    if self._token is not None:
+      _prefetched_calls.reset(self._token)
+
+
+def take(
+    node: ast.Call,
+    function: camel_value.Value[Any],
+    args: camel_value.CaMeLTuple,
+    kwargs: camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value],
+) -> concurrent.futures.Future[Any] | None:
+  """Returns the output of the call started for this evaluation of `node`.
+
+  Args:
+      node: The call being evaluated.
+      function: The function being called.
+      args: The positional arguments of the call.
+      kwargs: The keyword arguments of the call.
+
+  Returns:
+      The future output of the call started ahead of time, or `None` if there
+      is none, or if it was made with another function or other arguments.
+  """
+  calls = _prefetched_calls.get()
+  if not calls:
+    return None
+  queue = calls.get(node)
+  if not queue:
+    return None
+  call = queue.popleft()
+  if (
+      call is None
+      or call.function is not function
+      or call.raw_args != args.raw
+      or call.raw_kwargs != kwargs.raw
+  ):
+    return None
+  return call.output
@@ -15,11 +15,16 @@
 """CaMeL values."""
 
 import ast
-from collections.abc import Callable, Iterable, Iterator, Mapping, MutableMapping, MutableSequence, Sequence
+import bisect
+from collections.abc import Callable, Hashable, Iterable, Iterator, Mapping, MutableMapping, MutableSequence, Sequence
 import copy
 import dataclasses
 import enum
+import functools
+import inspect
+import threading
 import types
+import weakref
 from typing import Any, Generic, Protocol, Self, TypeVar, runtime_checkable
 
 import pydantic
@@ -27,36 +32,168 @@ import pydantic
 from ..capabilities import capabilities as camel_capabilities
 from ..capabilities import readers
 from ..capabilities import sources
+from . import async_bridge
+from . import persistent_map
+from . import profiler
 
 
 @dataclasses.dataclass(frozen=True)
 class Namespace:
-  """A namespace for variables in CaMeL."""
+  """A namespace for variables in CaMeL.
 
-  variables: dict[str, "Value"] = dataclasses.field(default_factory=dict)
+  The variables are stored in a `PersistentMap`, so that the copies of the
+  namespace created at every assignment share most of their structure instead
+  of copying all the variables (built-ins included).
+  """
+
+  variables: persistent_map.PersistentMap[str, "Value"] = dataclasses.field(
+      default_factory=persistent_map.PersistentMap
+  )
+
+  def __post_init__(self) -> None:
+    if not isinstance(self.variables, persistent_map.PersistentMap):
+      object.__setattr__(
+          self, "variables", persistent_map.PersistentMap(self.variables)
+      )
 
-  def add_variables(self, variables: dict[str, "Value"]) -> Self:
+  def add_variables(self, variables: Mapping[str, "Value"]) -> Self:
     """Creates a copy of this adding the variables passed as argument."""
-    return dataclasses.replace(self, variables=self.variables | variables)
+    return dataclasses.replace(
+        self, variables=self.variables.update(variables)
+    )
+
+  def remove_variables(self, names: Iterable[str]) -> Self:
+    """Creates a copy of this without the variables passed as argument."""
+    variables = self.variables
+    for name in names:
+      variables = variables.delete(name)
+    return dataclasses.replace(self, variables=variables)
 
   def set_variable(self, name: str, value: "Value") -> None:
-    self.variables[name] = value
+    object.__setattr__(self, "variables", self.variables.set(name, value))
 
   def get(self, name: str) -> "Value | None":
     return self.variables.get(name)
 
 
+_mutations_lock = threading.Lock()
+"""Guards `_mutation_epoch`, `_last_mutations` and `_forgotten_mutations_epoch`,
+which are shared by the programs running concurrently (e.g., for different
+sessions), so that the epoch never goes backwards."""
+
+_mutation_epoch = 0
+
+_last_mutations: dict[int, int] = {}
+"""The epoch of the last mutation of each Python object mutated in place (the
+`python_value` of lists, dicts and class instances), by `id`.
+
+Values copied with `new_with_dependencies` share their `python_value`, so the
+mutations are recorded on it rather than on the value that was mutated. Lists
+and dicts can't be weakly referenced, so the entries can't be removed when they
+are garbage collected: the table is cleared when it grows too large instead,
+and the `id`s it forgets are then considered as mutated when it was cleared."""
+
+_MAX_TRACKED_MUTATIONS = 10_000
+
+_forgotten_mutations_epoch = 0
+"""The epoch at which `_last_mutations` was last cleared."""
+
+
+def record_mutation(value: "Value") -> None:
+  """Records that `value` has been mutated in place.
+
+  Args:
+      value: The mutated value (e.g., a list whose item was set).
+  """
+  global _mutation_epoch, _forgotten_mutations_epoch
+  with _mutations_lock:
+    _mutation_epoch += 1
+    if len(_last_mutations) >= _MAX_TRACKED_MUTATIONS:
+      _last_mutations.clear()
+      _forgotten_mutations_epoch = _mutation_epoch
+    _last_mutations[id(value.python_value)] = _mutation_epoch
+
+
+def mutation_epoch() -> int:
+  """Returns a counter increased every time a value is mutated in place."""
+  return _mutation_epoch
+
+
+def last_mutation(object_id: int) -> int:
+  """Returns the epoch of the last mutation of a Python object.
+
+  Args:
+      object_id: The `id` of the `python_value` of a live value.
+
+  Returns:
+      The value of `mutation_epoch` right after the last mutation of the
+      object, or 0 if it was never mutated in place. Objects whose mutations
+      were forgotten are considered as mutated when they were.
+  """
+  with _mutations_lock:
+    return _last_mutations.get(object_id, _forgotten_mutations_epoch)
+
+
+def mutated_since(object_ids: Iterable[int], epoch: int) -> bool:
+  """Returns whether any of the Python objects was mutated after `epoch`.
+
+  The same as checking `last_mutation` for each of them, but atomically.
+
+  Args:
+      object_ids: The `id`s of the `python_value` of live values.
+      epoch: A value of `mutation_epoch`.
+  """
+  with _mutations_lock:
+    return any(
+        _last_mutations.get(i, _forgotten_mutations_epoch) > epoch
+        for i in object_ids
+    )
+
+
 _T = TypeVar("_T", bound=Any)
 
 
+@functools.cache
+def _instance_slots(cls: type[Any]) -> tuple[str, ...]:
+  """Returns the names of the slots holding the state of `cls`' instances.
+
+  Slots shadowed by a class attribute (e.g., `CaMeLNone.python_value`) are
+  skipped, as they can't be set.
+
+  Args:
+    cls: The class whose instances' slots to return.
+
+  Returns:
+    The names of the slots.
+  """
+  names = []
+  for klass in cls.__mro__:
+    for name in klass.__dict__.get("__slots__", ()):
+      if name != "__weakref__" and isinstance(
+          inspect.getattr_static(cls, name), types.MemberDescriptorType
+      ):
+        names.append(name)
+  return tuple(names)
+
+
 @runtime_checkable
 class Value(Generic[_T], Protocol):
   """A value in CaMeL."""
 
+  __slots__ = (
+      "python_value",
+      "_capabilities",
+      "outer_dependencies",
+      "__weakref__",
+  )
+
   python_value: _T
   _capabilities: camel_capabilities.Capabilities
   outer_dependencies: tuple["Value", ...]
   is_builtin: bool = False
+  has_mutable_dependencies: bool = False
+  """Whether `get_dependencies` can change after creation (e.g., because the
+  value is a container that can be mutated in place)."""
 
   def __repr__(self) -> str:
     return self._repr_helper(indent_level=0)
@@ -76,7 +213,7 @@ class Value(Generic[_T], Protocol):
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
-    return self.outer_dependencies, frozenset({id(self)})
+    return self.outer_dependencies, visited_objects | {id(self)}
 
   @property
   def capabilities(self) -> camel_capabilities.Capabilities:
@@ -92,20 +229,46 @@ class Value(Generic[_T], Protocol):
         and self.outer_dependencies == other.outer_dependencies
     )
 
+  def _clone(self) -> Self:
+    """Returns a shallow copy of this value.
+
+    This is faster than `copy.copy`, which goes through the generic
+    `__reduce_ex__` protocol, as the slots to copy are known for each class.
+    """
+    cls = type(self)
+    new_self = object.__new__(cls)
+    for name in _instance_slots(cls):
+      try:
+        setattr(new_self, name, getattr(self, name))
+      except AttributeError:
+        pass  # The slot is not set in this value.
+    return new_self
+
+  def __getstate__(self) -> tuple[None, dict[str, Any]]:
+    # Used by `copy` and `pickle`. The default state would include the slots
+    # shadowed by class attributes, which can't be restored.
+    state = {}
+    for name in _instance_slots(type(self)):
+      try:
+        state[name] = getattr(self, name)
+      except AttributeError:
+        pass  # The slot is not set in this value.
+    return None, state
+
   def new_with_python_value(self, value: _T) -> Self:
-    new_self = copy.copy(self)
+    new_self = self._clone()
     new_self.python_value = value
     return new_self
 
   def new_with_dependencies(self, dependencies: tuple["Value", ...]) -> Self:
-    new_self = copy.copy(self)
+    new_self = self._clone()
     new_self.outer_dependencies = self.outer_dependencies + dependencies
     return new_self
 
   def new_with_capabilities(
       self, capabilities: camel_capabilities.Capabilities
   ) -> Self:
-    new_self = copy.copy(self)
+    new_self = self._clone()
     new_self._capabilities = capabilities
     return new_self
 
@@ -188,6 +351,7 @@ _RT = TypeVar("_RT", bound=Value)
 
 @runtime_checkable
 class SupportsAdd(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def add(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -195,6 +359,7 @@ class SupportsAdd(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsSub(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def sub(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -202,6 +367,7 @@ class SupportsSub(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsMult(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def mult(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -209,6 +375,7 @@ class SupportsMult(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsTrueDiv(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def truediv(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -216,6 +383,7 @@ class SupportsTrueDiv(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsFloorDiv(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def floor_div(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -223,6 +391,7 @@ class SupportsFloorDiv(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsMod(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def mod(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -230,6 +399,7 @@ class SupportsMod(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsPow(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def pow(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -237,6 +407,7 @@ class SupportsPow(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsLShift(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def l_shift(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -244,6 +415,7 @@ class SupportsLShift(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRShift(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_shift(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -251,6 +423,7 @@ class SupportsRShift(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsBitOr(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def bit_or(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -258,6 +431,7 @@ class SupportsBitOr(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsBitXor(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def bit_xor(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -265,6 +439,7 @@ class SupportsBitXor(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsBitAnd(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def bit_and(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -272,6 +447,7 @@ class SupportsBitAnd(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRAdd(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_add(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -279,6 +455,7 @@ class SupportsRAdd(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRSub(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_sub(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -286,6 +463,7 @@ class SupportsRSub(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRMult(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_mult(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -293,6 +471,7 @@ class SupportsRMult(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRTrueDiv(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_truediv(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -300,6 +479,7 @@ class SupportsRTrueDiv(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRFloorDiv(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_floor_div(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -307,6 +487,7 @@ class SupportsRFloorDiv(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRMod(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_mod(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -314,6 +495,7 @@ class SupportsRMod(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRPow(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_pow(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -321,6 +503,7 @@ class SupportsRPow(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRLShift(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_l_shift(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -328,6 +511,7 @@ class SupportsRLShift(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRRShift(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_r_shift(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -335,6 +519,7 @@ class SupportsRRShift(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRBitOr(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_bit_or(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -342,6 +527,7 @@ class SupportsRBitOr(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRBitXor(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_bit_xor(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -349,6 +535,7 @@ class SupportsRBitXor(Generic[_RT], Protocol):
 
 @runtime_checkable
 class SupportsRBitAnd(Generic[_RT], Protocol):
+  __slots__ = ()
 
   def r_bit_and(self, other: Value) -> _RT | types.NotImplementedType:
     ...
@@ -362,6 +549,7 @@ def is_value(obj: Any) -> bool:
 
 
 class PythonComparable(Protocol):
+  __slots__ = ()
 
   def __lt__(self, other: Self, /) -> bool:
     ...
@@ -374,6 +562,7 @@ _CT = TypeVar("_CT", bound=PythonComparable)
 
 
 class TotallyOrdered(Value[_CT]):
+  __slots__ = ()
 
   def cmp(self, y: Self) -> "CaMeLInt":
     if self.raw > y.raw:
@@ -385,6 +574,7 @@ class TotallyOrdered(Value[_CT]):
 
 @runtime_checkable
 class HasAttrs(Generic[_T], Value[_T], Protocol):
+  __slots__ = ()
 
   def attr(self, name: str) -> Value | None:
     ...
@@ -395,6 +585,7 @@ class HasAttrs(Generic[_T], Value[_T], Protocol):
 
 @runtime_checkable
 class HasSetField(Generic[_T], HasAttrs[_T], Protocol):
+  __slots__ = ()
 
   def set_field(self, name: str, value: Value) -> "CaMeLNone":
     ...
@@ -404,16 +595,27 @@ class FunctionCallWithSideEffectError(Exception):
   ...
 
 
+def _side_effect_error() -> FunctionCallWithSideEffectError:
+  return FunctionCallWithSideEffectError(
+      "Call to a function or method with side-effects detected. "
+      "Use functions and methods that have no side-effects. "
+      "For example, instead of `list.append`, use list comprehensions "
+      "or the [*l, new_element] syntax."
+  )
+
+
 @runtime_checkable
 class CaMeLCallable(Generic[_T], Value[Callable[..., _T]], Protocol):
   """Represents a callable value in CaMeL."""
 
+  __slots__ = ("_name", "_recv", "_bound_python_value", "is_class_method")
+
   python_value: Callable[..., _T]
   _capabilities: camel_capabilities.Capabilities
   _name: str
   _recv: Value | None
-  _bound_python_value: Callable[..., _T] | None = None
-  is_class_method: bool = False
+  _bound_python_value: Callable[..., _T] | None
+  is_class_method: bool
 
   def name(self) -> "CaMeLStr":
     return CaMeLStr.from_raw(
@@ -445,7 +647,7 @@ class CaMeLCallable(Generic[_T], Value[Callable[..., _T]], Protocol):
   ) -> Value[_T]:
     return value_from_raw(
         value,
-        camel_capabilities.Capabilities(
+        camel_capabilities.Capabilities.canonical(
             frozenset({sources.Tool(self.name().raw)}),
             readers.Public(),
         ),
@@ -474,17 +676,75 @@ class CaMeLCallable(Generic[_T], Value[Callable[..., _T]], Protocol):
     Raises:
         FunctionCallWithSideEffectError: If the call has side effects.
     """
-    raw_args = args.raw
-    raw_kwargs = kwargs.raw
+    with profiler.frame("raw"):
+      raw_args = args.raw
+      raw_kwargs = kwargs.raw
+    output = self._call_python(raw_args, raw_kwargs)
+    with profiler.frame("raw"):
+      mutated = args.raw != raw_args or kwargs.raw != raw_kwargs
+    if mutated:
+      raise _side_effect_error()
+    return self.complete_call(output, args, kwargs, namespace)
+
+  def call_detached(
+      self,
+      raw_args: tuple[Any, ...],
+      raw_kwargs: dict[str, Any],
+      expected_raw_args: tuple[Any, ...],
+      expected_raw_kwargs: dict[str, Any],
+  ) -> _T:
+    """Calls the callable with raw arguments, detached from their CaMeL values.
+
+    Used to call the callable ahead of time (e.g., from another thread), while
+    the CaMeL values of the arguments can still be mutated. The output can then
+    be wrapped with `complete_call`.
+
+    Args:
+        raw_args: The raw positional arguments to pass to the callable.
+        raw_kwargs: The raw keyword arguments to pass to the callable.
+        expected_raw_args: A copy of `raw_args`, to detect side effects.
+        expected_raw_kwargs: A copy of `raw_kwargs`, to detect side effects.
+
+    Returns:
+        The raw output of the callable.
+
+    Raises:
+        FunctionCallWithSideEffectError: If the call has side effects.
+    """
+    output = self._call_python(raw_args, raw_kwargs)
+    if raw_args != expected_raw_args or raw_kwargs != expected_raw_kwargs:
+      raise _side_effect_error()
+    return output
+
+  def _call_python(
+      self, raw_args: tuple[Any, ...], raw_kwargs: dict[str, Any]
+  ) -> _T:
     output = self.python_value(*raw_args, **raw_kwargs)
-    if args.raw != raw_args or kwargs.raw != raw_kwargs:
-      raise FunctionCallWithSideEffectError(
-          "Call to a function or method with side-effects detected. "
-          "Use functions and methods that have no side-effects. "
-          "For example, instead of `list.append`, use list comprehensions "
-          "or the [*l, new_element] syntax."
-      )
-    wrapped_output = self.wrap_output(output, args, kwargs, namespace)
+    if inspect.isawaitable(output):
+      output = async_bridge.wait_for(output)
+    return output
+
+  def complete_call(
+      self,
+      output: _T,
+      args: "CaMeLTuple",
+      kwargs: "CaMeLDict[CaMeLStr, Value]",
+      namespace: Namespace,
+  ) -> tuple[Value[_T], dict[str, Any]]:
+    """Wraps the raw `output` of a call with the given arguments.
+
+    Args:
+        output: The raw output of the callable called with arguments equal to
+          `args` and `kwargs`.
+        args: The positional arguments of the call.
+        kwargs: The keyword arguments of the call.
+        namespace: The current namespace.
+
+    Returns:
+        The same as `call`.
+    """
+    with profiler.frame("value_from_raw"):
+      wrapped_output = self.wrap_output(output, args, kwargs, namespace)
     args_by_keyword = self._make_args_by_keyword(args, kwargs)
     return wrapped_output, args_by_keyword
 
@@ -516,18 +776,25 @@ _IT = TypeVar("_IT", bound=Iterable)
 class CaMeLIterable(Generic[_IT, _V], Value[_IT]):
   """Represents an iterable value in CaMeL."""
 
+  __slots__ = ()
+
+  has_mutable_dependencies = True
+
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
     dependencies = self.outer_dependencies
     if id(self) in visited_objects:
       return dependencies, visited_objects
+    # The `id` of the Python object is visited too, as it is what mutations
+    # are recorded on (see `record_mutation`).
+    visited_objects |= {id(self), id(self.python_value)}
     for el in self.python_value:
       (new_dependencies, visited_objects) = el.get_dependencies(
-          visited_objects | {id(self)}
+          visited_objects
       )
       dependencies += new_dependencies
-    return dependencies, visited_objects | {id(self)}
+    return dependencies, visited_objects
 
   def iterate(self) -> "CaMeLIterator[_V]":
     return CaMeLIterator(
@@ -537,7 +804,9 @@ class CaMeLIterable(Generic[_IT, _V], Value[_IT]):
     )
 
   def eq(self, value: "Value") -> "CaMeLBool":
-    if not isinstance(value, type(self)):
+    if not isinstance(value, type(self)) or len(self.python_value) != len(
+        value.python_value
+    ):
       return CaMeLFalse(camel_capabilities.Capabilities.camel(), (self, value))
     for self_c, value_c in zip(self.python_value, value.python_value):
       if not self_c.eq(value_c).raw:
@@ -571,6 +840,8 @@ _ST = TypeVar("_ST", bound=Sequence[Value])
 class CaMeLSequence(Generic[_ST, _V], CaMeLIterable[_ST, _V]):
   """Represents a sequence value in CaMeL."""
 
+  __slots__ = ()
+
   python_value: _ST
 
   def index(self, index: "CaMeLInt") -> _V:
@@ -602,14 +873,19 @@ _MCT = TypeVar("_MCT", bound=MutableSequence[Value])
 class CaMeLMutableSequence(Generic[_MCT, _V], CaMeLSequence[_MCT, _V]):
   """Represents a mutable sequence value in CaMeL."""
 
+  __slots__ = ()
+
   def set_index(self, index: "CaMeLInt", value: _V) -> "CaMeLNone":
     self.python_value[index.raw] = value
+    record_mutation(self)
     return CaMeLNone(camel_capabilities.Capabilities.camel(), (self, index))
 
 
 class CaMeLIterator(Generic[_V], Value[Iterator[_V]]):
   """Represents an iterator value in CaMeL."""
 
+  __slots__ = ()
+
   def freeze(self) -> "CaMeLNone":
     return CaMeLNone(
         camel_capabilities.Capabilities.camel(), (self,)
@@ -629,6 +905,81 @@ class CaMeLIterator(Generic[_V], Value[Iterator[_V]]):
     return next(self.python_value)
 
 
+_UNHASHABLE = object()
+
+
+class _KeyIndex:
+  """Index from the raw value of the keys of a dict (or elements of a set).
+
+  It is used to look up a key in O(1) instead of comparing it with every key
+  of the container. Only keys whose raw value is hashable are indexed; lookups
+  of keys with an unhashable raw value fall back to a linear scan. The index is
+  built lazily, and is shared by all the values wrapping the same container
+  (e.g., the copies created by `new_with_dependencies`), so it must only be
+  updated in place.
+  """
+
+  def __init__(self) -> None:
+    self._by_raw: dict[Hashable, Value] | None = None
+    self._has_duplicates = False
+
+  @staticmethod
+  def _hashable_raw(key: Value) -> Hashable:
+    try:
+      raw = key.raw
+      hash(raw)
+    except TypeError:
+      return _UNHASHABLE
+    return raw
+
+  def _build(self, keys: Iterable[Value]) -> dict[Hashable, Value]:
+    by_raw: dict[Hashable, Value] = {}
+    for key in keys:
+      raw = self._hashable_raw(key)
+      if raw is _UNHASHABLE:
+        continue
+      # Keep the first key with a given raw value, as a linear scan would.
+      if by_raw.setdefault(raw, key) is not key:
+        self._has_duplicates = True
+    self._by_raw = by_raw
+    return by_raw
+
+  def find(self, keys: Iterable[Value], key: Value) -> Value | None:
+    """Returns the first key in `keys` that is equal to `key`, if any.
+
+    Args:
+        keys: The keys of the indexed container.
+        key: The key to look up.
+
+    Returns:
+        The key in `keys` equal to `key`, or `None` if there is none.
+    """
+    raw = self._hashable_raw(key)
+    if raw is _UNHASHABLE:
+      return next((el for el in keys if el.eq(key)), None)
+    by_raw = self._by_raw if self._by_raw is not None else self._build(keys)
+    return by_raw.get(raw)
+
+  def record_set(self, old_key: Value | None, new_key: Value) -> None:
+    """Updates the index after `old_key` has been replaced by `new_key`.
+
+    Args:
+        old_key: The key removed from the container, if any.
+        new_key: The key added to the container.
+    """
+    if self._by_raw is None:
+      return
+    if self._has_duplicates:
+      # Which key comes first is not known anymore, rebuild on the next lookup.
+      self._by_raw = None
+      self._has_duplicates = False
+      return
+    if old_key is not None:
+      self._by_raw.pop(self._hashable_raw(old_key), None)
+    if (new_raw := self._hashable_raw(new_key)) is not _UNHASHABLE:
+      self._by_raw[new_raw] = new_key
+
+
 _MT = TypeVar("_MT", bound=Mapping)
 _KV = TypeVar("_KV", bound=Value)
 _VV = TypeVar("_VV", bound=Value)
@@ -637,13 +988,24 @@ _VV = TypeVar("_VV", bound=Value)
 class CaMeLMapping(Generic[_MT, _KV, _VV], Value[_MT]):
   """Represents a mapping value in CaMeL."""
 
+  __slots__ = ("_key_index",)
+
+  has_mutable_dependencies = True
+
+  _key_index: _KeyIndex
+
+  def new_with_python_value(self, value: _MT) -> Self:
+    new_self = super().new_with_python_value(value)
+    new_self._key_index = _KeyIndex()
+    return new_self
+
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
     dependencies = self.outer_dependencies
     if id(self) in visited_objects:
       return dependencies, visited_objects
-    visited_objects |= {id(self)}
+    visited_objects |= {id(self), id(self.python_value)}
     for k, v in self.python_value.items():
       k_dependencies, k_visited_objects = k.get_dependencies(visited_objects)
       v_dependencies, v_visited_objects = v.get_dependencies(k_visited_objects)
@@ -652,7 +1014,7 @@ class CaMeLMapping(Generic[_MT, _KV, _VV], Value[_MT]):
     return dependencies, visited_objects
 
   def get(self, key: _KV) -> _VV:
-    dict_key = next((el for el in self.iterate_python() if el.eq(key)), None)
+    dict_key = self._key_index.find(self.iterate_python(), key)
     if dict_key is None:
       raise KeyError(key)
     return self.python_value[dict_key].new_with_dependencies((self, key))
@@ -701,9 +1063,7 @@ class CaMeLMapping(Generic[_MT, _KV, _VV], Value[_MT]):
         A CaMeLBool indicating whether the mapping contains the value.
     """
     dependencies = [self, other]
-    inner_element = next(
-        (el for el in self.iterate_python() if el.eq(other)), None
-    )
+    inner_element = self._key_index.find(self.iterate_python(), other)
     if inner_element is not None:
       return CaMeLTrue(
           camel_capabilities.Capabilities.camel(),
@@ -726,6 +1086,8 @@ class CaMeLMutableMapping(
 ):
   """Represents a mutable mapping value in CaMeL."""
 
+  __slots__ = ()
+
   python_value: _MMT
 
   def set_key(self, key: _KV, value: _VV) -> "CaMeLNone":
@@ -738,24 +1100,27 @@ class CaMeLMutableMapping(
     Returns:
         A CaMeLNone indicating the operation completed.
     """
-    dict_key = next(
-        (el for el in self.iterate_python() if el.eq(key).raw), None
-    )
+    dict_key = self._key_index.find(self.iterate_python(), key)
     if dict_key is None:
       dict_key = key
     if key is not dict_key:
       new_dict_key = dict_key.new_with_dependencies((key,))
       # Remove key value pair with key with old dependencies
       del self.python_value[dict_key]
+      self._key_index.record_set(dict_key, new_dict_key)
     else:
       new_dict_key = dict_key
+      self._key_index.record_set(None, new_dict_key)
     self.python_value[new_dict_key] = value
+    record_mutation(self)
     return CaMeLNone(camel_capabilities.Capabilities.camel(), (self,))
 
 
 class CaMeLNone(Value[None]):
   """Represents the None value in CaMeL."""
 
+  __slots__ = ()
+
   python_value = None
 
   def __init__(
@@ -773,6 +1138,8 @@ class CaMeLNone(Value[None]):
 class _Bool(TotallyOrdered[bool]):
   """Base class for CaMeL boolean values."""
 
+  __slots__ = ()
+
   python_value: bool
 
   def __bool__(self):
@@ -791,10 +1158,14 @@ class _Bool(TotallyOrdered[bool]):
 
 
 class CaMeLTrue(_Bool):  # noqa: N801
+  __slots__ = ()
+
   python_value = True
 
 
 class CaMeLFalse(_Bool):  # noqa: N801
+  __slots__ = ()
+
   python_value = False
 
 
@@ -803,6 +1174,7 @@ CaMeLBool = CaMeLTrue | CaMeLFalse
 
 @runtime_checkable
 class HasUnary(Protocol):
+  __slots__ = ()
 
   def unary(self, op: ast.unaryop) -> Self | types.NotImplementedType:
     ...
@@ -828,6 +1200,8 @@ class CaMeLFloat(
 ):
   """Represents a floating point number in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       val: float,
@@ -1000,6 +1374,8 @@ class CaMeLInt(
 ):
   """Represents an integer value in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       val: int,
@@ -1137,6 +1513,8 @@ class CaMeLInt(
 class _Char(TotallyOrdered[str]):
   """Represents a single character in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       val: str,
@@ -1163,26 +1541,119 @@ class _Char(TotallyOrdered[str]):
     )  # already immutable
 
 
+@dataclasses.dataclass(frozen=True)
+class _StrSpan:
+  """A run of characters of a `CaMeLStr` that share the same provenance."""
+
+  start: int
+  """Index of the first character of the run."""
+  end: int
+  """Index one past the last character of the run."""
+  capabilities: camel_capabilities.Capabilities
+  """Capabilities of each character in the run."""
+  dependencies: tuple[Value, ...]
+  """Dependencies of each character in the run."""
+
+  def shifted(self, offset: int) -> "_StrSpan":
+    return dataclasses.replace(
+        self, start=self.start + offset, end=self.end + offset
+    )
+
+  def has_same_provenance(self, other: "_StrSpan") -> bool:
+    return (
+        self.capabilities == other.capabilities
+        and self.dependencies == other.dependencies
+    )
+
+
+def _append_span(spans: list[_StrSpan], span: _StrSpan) -> None:
+  """Appends `span` to `spans`, merging it with the last run if possible."""
+  if span.start >= span.end:
+    return
+  if (
+      spans
+      and spans[-1].end == span.start
+      and spans[-1].has_same_provenance(span)
+  ):
+    spans[-1] = dataclasses.replace(spans[-1], end=span.end)
+  else:
+    spans.append(span)
+
+
 class CaMeLStr(
-    TotallyOrdered[tuple[_Char, ...]],
+    TotallyOrdered[str],
     HasAttrs,
-    CaMeLSequence[tuple[_Char, ...], _Char],
+    CaMeLSequence[str, _Char],
     SupportsAdd["CaMeLStr"],
     SupportsMult["CaMeLStr"],
     SupportsRMult["CaMeLStr"],
 ):
-  """Represents a string in CaMeL."""
+  """Represents a string in CaMeL.
+
+  The string is stored as a native Python `str`, and the provenance of its
+  characters as a run-length encoded tuple of `_StrSpan`s covering it. Adjacent
+  characters with the same capabilities and dependencies share the same span,
+  so the memory used is proportional to the number of distinct provenance runs
+  rather than to the length of the string. `_Char` values are only created
+  when single characters are accessed.
+  """
+
+  __slots__ = ("_spans",)
+
+  python_value: str
+  has_mutable_dependencies = False
 
   def __init__(
       self,
-      string: Sequence[_Char],
+      string: str,
+      spans: Iterable[_StrSpan],
       capabilities: camel_capabilities.Capabilities,
       dependencies: tuple[Value, ...],
   ) -> None:
-    self.python_value = tuple(string)
+    self.python_value = string
+    self._spans = tuple(spans)
     self._capabilities = capabilities
     self.outer_dependencies = dependencies
 
+  def __eq__(self, other) -> bool:
+    return (
+        isinstance(other, CaMeLStr)
+        and super().__eq__(other)
+        and self._spans == other._spans
+    )
+
+  def __hash__(self) -> int:
+    return super().__hash__()
+
+  def get_dependencies(
+      self, visited_objects: frozenset[int] = frozenset()
+  ) -> tuple[tuple["Value", ...], frozenset[int]]:
+    dependencies = self.outer_dependencies
+    if id(self) in visited_objects:
+      return dependencies, visited_objects
+    for span in self._spans:
+      dependencies += span.dependencies
+    return dependencies, visited_objects | {id(self)}
+
+  def _span_at(self, index: int) -> _StrSpan:
+    """Returns the span containing the (non-negative) `index`."""
+    span_index = bisect.bisect_right(self._spans, index, key=lambda s: s.start)
+    return self._spans[span_index - 1]
+
+  def _char_at(self, index: int) -> _Char:
+    span = self._span_at(index)
+    return _Char(self.python_value[index], span.capabilities, span.dependencies)
+
+  def iterate_python(self) -> Iterator[_Char]:
+    for span in self._spans:
+      for c in self.python_value[span.start : span.end]:
+        yield _Char(c, span.capabilities, span.dependencies)
+
+  def eq(self, value: "Value") -> "CaMeLBool":
+    if isinstance(value, CaMeLStr) and self.python_value == value.python_value:
+      return CaMeLTrue(camel_capabilities.Capabilities.camel(), (self, value))
+    return CaMeLFalse(camel_capabilities.Capabilities.camel(), (self, value))
+
   def contains(self, other: Value) -> "CaMeLBool":
     if not isinstance(other, CaMeLStr | _Char):
       raise TypeError(
@@ -1207,10 +1678,178 @@ class CaMeLStr(
       capabilities: camel_capabilities.Capabilities,
       dependencies: tuple[Value, ...],
   ) -> Self:
-    return cls(
-        tuple(_Char(c, capabilities, dependencies) for c in string),
-        capabilities,
-        dependencies,
+    spans = (
+        (_StrSpan(0, len(string), capabilities, dependencies),)
+        if string
+        else ()
+    )
+    return cls(string, spans, capabilities, dependencies)
+
+  @classmethod
+  def concat(
+      cls,
+      strings: Iterable["CaMeLStr"],
+      capabilities: camel_capabilities.Capabilities,
+      dependencies: tuple[Value, ...],
+  ) -> Self:
+    """Concatenates `strings`, preserving the provenance of each character."""
+    parts: list[str] = []
+    spans: list[_StrSpan] = []
+    offset = 0
+    for string in strings:
+      for span in string._spans:  # pylint: disable=protected-access
+        _append_span(spans, span.shifted(offset))
+      parts.append(string.python_value)
+      offset += len(string.python_value)
+    return cls("".join(parts), spans, capabilities, dependencies)
+
+  def _spans_between(self, start: int, end: int) -> list[_StrSpan]:
+    """Returns the spans of `self.python_value[start:end]`, for start <= end."""
+    spans: list[_StrSpan] = []
+    for span in self._spans:
+      if span.end <= start:
+        continue
+      if span.start >= end:
+        break
+      _append_span(
+          spans,
+          dataclasses.replace(
+              span, start=max(span.start, start), end=min(span.end, end)
+          ).shifted(-start),
+      )
+    return spans
+
+  def _substring(self, start: int, end: int) -> "CaMeLStr":
+    return CaMeLStr(
+        self.python_value[start:end],
+        self._spans_between(start, end),
+        self._capabilities,
+        self.outer_dependencies,
+    )
+
+  def join(
+      self,
+      strings: Value,
+      capabilities: camel_capabilities.Capabilities,
+      dependencies: tuple[Value, ...],
+  ) -> "CaMeLStr | None":
+    """Joins `strings` with `self`, as `str.join`.
+
+    Args:
+        strings: The strings to join.
+        capabilities: The capabilities of the joined string.
+        dependencies: The dependencies of the joined string.
+
+    Returns:
+        The joined string, whose characters keep the provenance of the
+        characters of `self` and `strings`, or `None` if `strings` is not a
+        container of strings.
+    """
+    if not isinstance(strings, CaMeLIterable):
+      # E.g., an iterator, which can only be iterated once.
+      return None
+    parts: list[CaMeLStr] = []
+    for string in strings.iterate_python():
+      match string:
+        case CaMeLStr():
+          pass
+        case _Char():
+          string = CaMeLStr.from_raw(
+              string.python_value,
+              string.capabilities,
+              string.outer_dependencies,
+          )
+        case _:
+          return None
+      if parts:
+        parts.append(self)
+      parts.append(string)
+    return CaMeLStr.concat(parts, capabilities, dependencies)
+
+  def replace(
+      self,
+      old: "CaMeLStr",
+      new: "CaMeLStr",
+      count: int,
+      capabilities: camel_capabilities.Capabilities,
+      dependencies: tuple[Value, ...],
+  ) -> "CaMeLStr":
+    """Replaces the occurrences of `old` with `new`, as `str.replace`.
+
+    Args:
+        old: The substring to replace.
+        new: The replacement.
+        count: The maximum number of occurrences to replace, or -1 for all.
+        capabilities: The capabilities of the new string.
+        dependencies: The dependencies of the new string.
+
+    Returns:
+        The new string, whose characters keep the provenance of the
+        characters of `self` and `new` they come from.
+    """
+    string = self.python_value
+    old_string = old.python_value
+    parts: list[CaMeLStr] = []
+    start = 0
+    if old_string:
+      while count < 0 or len(parts) < 2 * count:
+        found = string.find(old_string, start)
+        if found < 0:
+          break
+        parts += (self._substring(start, found), new)
+        start = found + len(old_string)
+    else:
+      # The empty string occurs before each character and at the end.
+      for index in range(len(string) + 1):
+        if 0 <= count <= len(parts) // 2:
+          break
+        parts += (self._substring(start, index), new)
+        start = index
+    parts.append(self._substring(start, len(string)))
+    return CaMeLStr.concat(parts, capabilities, dependencies)
+
+  def index(self, index: "CaMeLInt") -> _Char:
+    # Raises the appropriate `IndexError` if out of range.
+    char = self.python_value[index.raw]
+    span = self._span_at(index.raw % len(self.python_value))
+    return _Char(
+        char, span.capabilities, (*span.dependencies, self, index)
+    )
+
+  def slice(
+      self,
+      start: "CaMeLInt | CaMeLNone",
+      end: "CaMeLInt | CaMeLNone",
+      step: "CaMeLInt | CaMeLNone",
+  ) -> Self:
+    indices = range(len(self.python_value))[
+        slice(start.raw, end.raw, step.raw)
+    ]
+    if indices.step == 1:
+      spans = self._spans_between(indices.start, indices.stop)
+    else:
+      spans: list[_StrSpan] = []
+      for new_index, old_index in enumerate(indices):
+        _append_span(
+            spans,
+            dataclasses.replace(
+                self._span_at(old_index), start=new_index, end=new_index + 1
+            ),
+        )
+    return CaMeLStr(
+        self.python_value[slice(start.raw, end.raw, step.raw)],
+        spans,
+        self._capabilities,
+        (*self.outer_dependencies, self, start, end, step),
+    )
+
+  def len(self) -> "CaMeLInt":
+    # One character per run is enough to carry the provenance of all the
+    # characters in it.
+    return CaMeLInt(
+        len(self.python_value),
+        camel_capabilities.Capabilities.camel(),
+        (self, *(self._char_at(span.start) for span in self._spans)),
     )
 
   def attr(self, name) -> Value | None:
@@ -1232,15 +1871,17 @@ class CaMeLStr(
 
   @property
   def raw(self) -> str:
-    s = ""
-    for c in self.python_value:
-      s += c.python_value
-    return s
+    return self.python_value
 
   def iterate(self) -> CaMeLIterator["CaMeLStr"]:
     strings_iterator = iter(
-        CaMeLStr([c], camel_capabilities.Capabilities.camel(), (self,))
-        for c in self.python_value
+        CaMeLStr(
+            self.python_value[i],
+            (dataclasses.replace(self._span_at(i), start=0, end=1),),
+            camel_capabilities.Capabilities.camel(),
+            (self,),
+        )
+        for i in range(len(self.python_value))
     )
     return CaMeLIterator(
         strings_iterator, camel_capabilities.Capabilities.camel(), (self,)
@@ -1253,8 +1894,8 @@ class CaMeLStr(
   def add(self, other: Value) -> "CaMeLStr | types.NotImplementedType":
     if not isinstance(other, CaMeLStr):
       return NotImplemented
-    return CaMeLStr(
-        self.python_value + other.python_value,
+    return CaMeLStr.concat(
+        (self, other),
         camel_capabilities.Capabilities.camel(),
         (self, other),
     )
@@ -1262,8 +1903,8 @@ class CaMeLStr(
   def mult(self, other: Value) -> "CaMeLStr | types.NotImplementedType":
     if not isinstance(other, CaMeLInt):
       return NotImplemented
-    return CaMeLStr(
-        self.python_value * other.python_value,
+    return CaMeLStr.concat(
+        (self,) * max(other.python_value, 0),
         camel_capabilities.Capabilities.camel(),
         (self, other),
     )
@@ -1281,6 +1922,8 @@ class CaMeLTuple(
 ):
   """Represents a tuple in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       it: Iterable[_V],
@@ -1293,7 +1936,7 @@ class CaMeLTuple(
 
   @property
   def raw(self) -> tuple[Any, ...]:
-    return tuple(v.raw for v in self.python_value)
+    return tuple([v.raw for v in self.python_value])
 
   def freeze(self) -> "CaMeLNone":
     # already immutable
@@ -1330,6 +1973,8 @@ class CaMeLList(
 ):
   """Represents a list in CaMeL."""
 
+  __slots__ = ("_frozen",)
+
   def __init__(
       self,
       it: Iterable[_V],
@@ -1343,7 +1988,7 @@ class CaMeLList(
 
   @property
   def raw(self) -> list[Any]:
-    return list(v.raw for v in self.python_value)
+    return [v.raw for v in self.python_value]
 
   def attr(self, name) -> Value | None:
     attr = SUPPORTED_BUILT_IN_METHODS[self.raw_type].get(name)
@@ -1393,6 +2038,8 @@ class CaMeLSet(
 ):
   """Represents a set in CaMeL."""
 
+  __slots__ = ("_key_index", "_frozen")
+
   def __init__(
       self,
       it: Iterable[_V],
@@ -1400,12 +2047,32 @@ class CaMeLSet(
       dependencies: tuple[Value, ...],
   ) -> None:
     self.python_value = set(it)
+    self._key_index = _KeyIndex()
+    self._frozen = False
     self._capabilities = capabilities
     self.outer_dependencies = dependencies
 
+  def new_with_python_value(self, value: set[_V]) -> Self:
+    new_self = super().new_with_python_value(value)
+    new_self._key_index = _KeyIndex()
+    return new_self
+
   @property
   def raw(self) -> set[Any]:
-    return set(v.raw for v in self.python_value)
+    return {v.raw for v in self.python_value}
+
+  def contains(self, other: Value) -> "CaMeLBool":
+    inner_element = self._key_index.find(self.iterate_python(), other)
+    if inner_element is not None:
+      return CaMeLTrue(
+          camel_capabilities.Capabilities.camel(), (self, other, inner_element)
+      )
+    # Add capabilities from elements as well as False reveal something about all
+    # of them (i.e., that none of them is `other`).
+    return CaMeLFalse(
+        camel_capabilities.Capabilities.camel(),
+        (*self.get_dependencies()[0], other),
+    )
 
   def freeze(self) -> "CaMeLNone":
     _ = [el.freeze() for el in self.python_value]
@@ -1459,6 +2126,8 @@ class CaMeLDict(
 ):
   """Represents a dictionary in CaMeL."""
 
+  __slots__ = ("_frozen",)
+
   def __init__(
       self,
       it: Mapping[_KV, _VV],
@@ -1466,6 +2135,7 @@ class CaMeLDict(
       dependencies: tuple[Value, ...],
   ) -> None:
     self.python_value = dict(it)
+    self._key_index = _KeyIndex()
     self._frozen = False
     self._capabilities = capabilities
     self.outer_dependencies = dependencies
@@ -1504,7 +2174,34 @@ class CaMeLDict(
     )
 
 
+_TYPE_ATTR_NAMES: "weakref.WeakKeyDictionary[type[Any], frozenset[str]]" = (
+    weakref.WeakKeyDictionary()
+)
+"""The attribute names of classes, which are looked up for every instance
+converted by `value_from_raw`."""
+
+
 def _get_class_attr_names(instance: Any | type[Any]) -> set[str]:
+  if isinstance(instance, pydantic.BaseModel) or (
+      dataclasses.is_dataclass(instance) and not isinstance(instance, type)
+  ):
+    # The fields of models and dataclasses are the ones of their class.
+    instance = type(instance)
+  if isinstance(instance, type):
+    try:
+      return set(_TYPE_ATTR_NAMES[instance])
+    except (KeyError, TypeError):
+      pass
+    attr_names = _get_attr_names(instance)
+    try:
+      _TYPE_ATTR_NAMES[instance] = frozenset(attr_names)
+    except TypeError:
+      pass  # Classes that can't be weakly referenced are not cached.
+    return attr_names
+  return _get_attr_names(instance)
+
+
+def _get_attr_names(instance: Any | type[Any]) -> set[str]:
   if dataclasses.is_dataclass(instance):
     return {f.name for f in dataclasses.fields(instance)}
 
@@ -1524,6 +2221,8 @@ def _get_class_attr_names(instance: Any | type[Any]) -> set[str]:
 class CaMeLClass(Generic[_T], CaMeLCallable[_T], HasAttrs):
   """Represents a class in CaMeL."""
 
+  __slots__ = ("_base_classes", "methods", "_is_totally_ordered", "is_builtin")
+
   def __init__(
       self,
       name: str,
@@ -1540,6 +2239,8 @@ class CaMeLClass(Generic[_T], CaMeLCallable[_T], HasAttrs):
     self._name = name
     self._base_classes = base_classes
     self._recv: Value | None = None
+    self._bound_python_value = None
+    self.is_class_method = False
     inherited_methods = {}
     for base_class in base_classes:
       inherited_methods.update(base_class.methods)
@@ -1636,8 +2337,21 @@ class CaMeLClass(Generic[_T], CaMeLCallable[_T], HasAttrs):
     )
 
 
+_IMMUTABLE_RAW_TYPES = frozenset({bool, int, float, str, type(None)})
+"""Types of the raw values that are equal to the `raw` of their conversion."""
+
+
 class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
-  """Represents an instance of a class in CaMeL."""
+  """Represents an instance of a class in CaMeL.
+
+  The attributes of instances converted from tools' outputs (see
+  `value_from_raw`) are converted to CaMeL values on first access, so that
+  reading a field of a large output doesn't convert the rest of it.
+  """
+
+  __slots__ = ("_camel_class", "_namespace", "_frozen", "cmp", "_unconverted")
+
+  has_mutable_dependencies = True
 
   def __init__(
       self,
@@ -1646,6 +2360,7 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
       capabilities: camel_capabilities.Capabilities,
       namespace: Namespace,
       dependencies: tuple[Value, ...],
+      unconverted: Iterable[str] = (),
   ):
     self.python_value = value
     self._camel_class = camel_class
@@ -1653,6 +2368,8 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
     self._namespace = namespace
     self.outer_dependencies = dependencies
     self._frozen = False
+    # Names of the attributes of `value` that are still raw Python values.
+    self._unconverted = set(unconverted)
 
     if self._camel_class._is_totally_ordered:
       self.cmp = self._cmp
@@ -1666,11 +2383,12 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
     dependencies = self.outer_dependencies
     if id(self) in visited_objects:
       return dependencies, visited_objects
+    visited_objects |= {id(self), id(self.python_value)}
     for attr_name in self.attr_names():
       attr = self.attr(attr_name)
       if attr is not None and attr_name not in self._camel_class.methods:
         new_dependencies, visited_objects = attr.get_dependencies(
-            visited_objects | {id(self)}
+            visited_objects
         )
         dependencies += new_dependencies
     return dependencies, visited_objects
@@ -1682,9 +2400,27 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
       return CaMeLInt(-1, camel_capabilities.Capabilities.camel(), (self, y))
     return CaMeLInt(0, camel_capabilities.Capabilities.camel(), (self, y))
 
+  def _convert_attr(self, name: str) -> None:
+    if name not in self._unconverted:
+      return
+    converted = value_from_raw(
+        getattr(self.python_value, name),
+        camel_capabilities.Capabilities.camel(),
+        self._namespace,
+        (),
+    )
+    setattr(self.python_value, name, converted)
+    self._unconverted.discard(name)
+
+  def _convert_attrs(self) -> None:
+    for name in tuple(self._unconverted):
+      self._convert_attr(name)
+
   def __eq__(self, other) -> bool:
     if not isinstance(other, CaMeLClassInstance):
       return False
+    self._convert_attrs()
+    other._convert_attrs()  # pylint: disable=protected-access
     return (
         self.python_value == other.python_value
         and self._camel_class == other._camel_class
@@ -1698,6 +2434,13 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
     instance = copy.copy(self.python_value)
     # replace all `Value` attributes with their `raw` respective
     for attr_name in self.attr_names():
+      if (
+          attr_name in self._unconverted
+          and type(getattr(self.python_value, attr_name))
+          not in _IMMUTABLE_RAW_TYPES
+      ):
+        # Nested containers and instances must be copied, as when converted.
+        self._convert_attr(attr_name)
       attr_value = getattr(self.python_value, attr_name)
       if isinstance(attr_value, Value):
         setattr(instance, attr_name, attr_value.raw)
@@ -1713,6 +2456,8 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
     if self._frozen:
       raise ValueError("instance is frozen")
     setattr(self.python_value, name, value)
+    self._unconverted.discard(name)
+    record_mutation(self)
     return CaMeLNone(camel_capabilities.Capabilities.default(), ())
 
   def attr(self, name: str) -> Value | None:
@@ -1720,6 +2465,7 @@ class CaMeLClassInstance(Generic[_T], HasSetField[_T]):
       return None
     if name in self._camel_class.methods:
       return self._camel_class.methods[name]
+    self._convert_attr(name)
     attr = getattr(self.python_value, name)
     if not isinstance(attr, Value):
       return value_from_raw(
@@ -1740,6 +2486,8 @@ class ValueAsWrapper(Generic[_T], CaMeLClassInstance[_T]):
   and we need to wrap it as a CaMeL value.
   """
 
+  __slots__ = ()
+
   _camel_class: CaMeLClass[_T]
   _namespace: Namespace
   _frozen: bool
@@ -1765,7 +2513,10 @@ class ValueAsWrapper(Generic[_T], CaMeLClassInstance[_T]):
   def get_dependencies(
       self, visited_objects: frozenset[int] = frozenset()
   ) -> tuple[tuple["Value", ...], frozenset[int]]:
-    return self.outer_dependencies, visited_objects | {id(self)}
+    return self.outer_dependencies, visited_objects | {
+        id(self),
+        id(self.python_value),
+    }
 
   def attr(self, name: str) -> Value | None:
     if name not in self.attr_names():
@@ -1781,6 +2532,7 @@ class ValueAsWrapper(Generic[_T], CaMeLClassInstance[_T]):
     if self._frozen:
       raise ValueError("instance is frozen")
     setattr(self.python_value, name, value.raw)
+    record_mutation(self)
     return CaMeLNone(camel_capabilities.Capabilities.default(), ())
 
   def freeze(self) -> CaMeLNone:
@@ -1792,6 +2544,8 @@ class ValueAsWrapper(Generic[_T], CaMeLClassInstance[_T]):
 class CaMeLFunction(Generic[_T], CaMeLCallable[_T]):
   """Represents a function in CaMeL."""
 
+  __slots__ = ()
+
   def __init__(
       self,
       name: str,
@@ -1804,6 +2558,8 @@ class CaMeLFunction(Generic[_T], CaMeLCallable[_T]):
     self.outer_dependencies = dependencies
     self._name = name
     self._recv: Value | None = None
+    self._bound_python_value = None
+    self.is_class_method = False
 
   def make_args_by_keyword_preserve_values(
       self, args: "CaMeLTuple", kwargs: "CaMeLDict[CaMeLStr, Value]"
@@ -1817,12 +2573,67 @@ class UndefinedClassError(Exception):
   ...
 
 
+def _bool_from_raw(
+    raw_value: bool,
+    capabilities: camel_capabilities.Capabilities,
+    dependencies: tuple[Value, ...],
+) -> "CaMeLBool":
+  return (
+      CaMeLTrue(capabilities, dependencies)
+      if raw_value
+      else CaMeLFalse(capabilities, dependencies)
+  )
+
+
+def _none_from_raw(
+    raw_value: None,
+    capabilities: camel_capabilities.Capabilities,
+    dependencies: tuple[Value, ...],
+) -> CaMeLNone:
+  del raw_value  # Unused.
+  return CaMeLNone(capabilities, dependencies)
+
+
+_SCALAR_FROM_RAW: dict[
+    type,
+    Callable[[Any, camel_capabilities.Capabilities, tuple[Value, ...]], Value],
+] = {
+    bool: _bool_from_raw,
+    int: CaMeLInt,
+    str: CaMeLStr.from_raw,
+    float: CaMeLFloat,
+    type(None): _none_from_raw,
+}
+"""The conversions of the immutable raw values, by exact type.
+
+They are the same as in `value_from_raw`, but looking them up is faster than
+matching the type, which matters for large containers (e.g., the outputs of
+tools or of `sorted`)."""
+
+
+def _elements_from_raw(
+    raw_values: Iterable[Any], namespace: Namespace
+) -> list[Value]:
+  """Converts the elements of a raw list, tuple or set, as `value_from_raw`."""
+  capabilities = camel_capabilities.Capabilities.camel()
+  get_from_raw = _SCALAR_FROM_RAW.get
+  return [
+      from_raw(val, capabilities, ())
+      if (from_raw := get_from_raw(type(val))) is not None
+      else value_from_raw(val, capabilities, namespace, ())
+      for val in raw_values
+  ]
+
+
 def value_from_raw(
     raw_value: Any,
     capabilities: camel_capabilities.Capabilities,
     namespace: Namespace,
     dependencies: tuple[Value, ...],
 ) -> Value:
+  from_raw = _SCALAR_FROM_RAW.get(type(raw_value))
+  if from_raw is not None:
+    return from_raw(raw_value, capabilities, dependencies)
   match raw_value:
     # Extremely important to keep the order because in Python `bool` subclasses
     # `int`
@@ -1842,14 +2653,7 @@ def value_from_raw(
       return CaMeLNone(capabilities, dependencies)
     case list():
       return CaMeLList(
-          [
-              value_from_raw(
-                  val, camel_capabilities.Capabilities.camel(), namespace, ()
-              )
-              for val in raw_value
-          ],
-          capabilities,
-          dependencies,
+          _elements_from_raw(raw_value, namespace), capabilities, dependencies
       )
     case dict():
       return CaMeLDict(
@@ -1864,25 +2668,11 @@ def value_from_raw(
       )
     case set():
       return CaMeLSet(
-          {
-              value_from_raw(
-                  val, camel_capabilities.Capabilities.camel(), namespace, ()
-              )
-              for val in raw_value
-          },
-          capabilities,
-          dependencies,
+          _elements_from_raw(raw_value, namespace), capabilities, dependencies
       )
     case tuple():
       return CaMeLTuple(
-          tuple(
-              value_from_raw(
-                  val, camel_capabilities.Capabilities.camel(), namespace, ()
-              )
-              for val in raw_value
-          ),
-          capabilities,
-          dependencies,
+          _elements_from_raw(raw_value, namespace), capabilities, dependencies
       )
     case type():
       return CaMeLClass(
@@ -1896,26 +2686,34 @@ def value_from_raw(
         value_class := namespace.get(type(raw_value).__name__)
     ) is not None and isinstance(value_class, CaMeLClass):
       raw_value_copy = copy.copy(raw_value)
+      unconverted = []
       for attr in value_class.attr_names():
         if attr in value_class.methods:
           continue
         try:
-          converted_attr = value_from_raw(
-              getattr(raw_value, attr),
-              camel_capabilities.Capabilities.camel(),
-              namespace,
-              (),
-          )
-          setattr(raw_value_copy, attr, converted_attr)
-        except (AttributeError, RecursionError):
-          # Some built-in classes do not allow writing some attributes
-          # and/or have weird self references (which causes RecursionErrors)
-          # so we wrap the entire class for consistency
+          attr_value = getattr(raw_value, attr)
+          if type(attr_value) not in _IMMUTABLE_RAW_TYPES:
+            # The attributes are converted on first access, so the mutable
+            # ones are copied now: the tool may mutate its objects before.
+            attr_value = copy.deepcopy(attr_value)
+          # They must be writable to store the converted values.
+          setattr(raw_value_copy, attr, attr_value)
+        except (AttributeError, RecursionError, TypeError, copy.Error):
+          # Some built-in classes do not allow writing some attributes, have
+          # attributes that can't be copied, and/or have weird self
+          # references (which causes RecursionErrors) so we wrap the entire
+          # class for consistency
           return ValueAsWrapper(
               raw_value, capabilities, namespace, dependencies
           )
+        unconverted.append(attr)
       return CaMeLClassInstance(
-          raw_value_copy, value_class, capabilities, namespace, dependencies
+          raw_value_copy,
+          value_class,
+          capabilities,
+          namespace,
+          dependencies,
+          unconverted,
       )
     case _:
       # Value of unknown class, raise exception
@@ -1925,6 +2723,8 @@ def value_from_raw(
 class CaMeLBuiltin(Generic[_T], CaMeLCallable[_T]):
   """Represents a built-in function or method in CaMeL."""
 
+  __slots__ = ()
+
   is_builtin: bool = True
 
   def __init__(
@@ -1939,6 +2739,7 @@ class CaMeLBuiltin(Generic[_T], CaMeLCallable[_T]):
     self._capabilities = capabilities
     self._name = name
     self._recv: Value | None = None
+    self._bound_python_value = None
     self.is_class_method = is_class_method
     self.outer_dependencies = dependencies
 
@@ -1978,10 +2779,105 @@ class CaMeLBuiltin(Generic[_T], CaMeLCallable[_T]):
     }
 
 
+class CaMeLPureBuiltin(Generic[_T], CaMeLBuiltin[_T]):
+  """Represents a built-in function which doesn't mutate its arguments.
+
+  Calls to it (e.g., to `sorted` or `sum` on a large list) convert the
+  arguments to raw values once: they skip the check that the call didn't
+  mutate them, and reuse the raw arguments for the arguments by keyword. The
+  output is the same as with `CaMeLBuiltin.call`. Calls with callables other
+  than built-ins in their arguments (e.g., a tool as `key`), which could
+  mutate the other arguments, are checked like the calls to other built-ins.
+  """
+
+  __slots__ = ()
+
+  def call(
+      self,
+      args: "CaMeLTuple",
+      kwargs: "CaMeLDict[CaMeLStr, Value]",
+      namespace: Namespace,
+  ) -> tuple[Value[_T], dict[str, Any]]:
+    for arg in (*args.python_value, *kwargs.python_value.values()):
+      if isinstance(arg, CaMeLCallable) and not isinstance(arg, CaMeLBuiltin):
+        return super().call(args, kwargs, namespace)
+    with profiler.frame("raw"):
+      raw_args = args.raw
+      raw_kwargs = kwargs.raw
+    output = self._call_python(raw_args, raw_kwargs)
+    with profiler.frame("value_from_raw"):
+      wrapped_output = self.wrap_output(output, args, kwargs, namespace)
+    args_by_keyword = {
+        str(i): raw_arg for i, raw_arg in enumerate(raw_args)
+    } | raw_kwargs
+    return wrapped_output, args_by_keyword
+
+
+class _CaMeLStrMethod(CaMeLBuiltin[str]):
+  """Represents a method of strings which keeps the provenance of characters.
+
+  The raw output is computed by the Python method, as for other built-ins, and
+  its spans by the method of the same name of `CaMeLStr` (e.g.,
+  `CaMeLStr.join`), as `CaMeLStr.add` does for concatenations.
+  """
+
+  __slots__ = ()
+
+  def wrap_output(
+      self,
+      value: str,
+      args: "CaMeLTuple",
+      kwargs: "CaMeLDict[CaMeLStr, Value]",
+      namespace: Namespace,
+  ) -> Value[str]:
+    capabilities = camel_capabilities.Capabilities.canonical(
+        frozenset({sources.Tool(self._name)}), readers.Public()
+    )
+    dependencies = (self, args, kwargs)
+    # The receiver is the first argument.
+    match self._name, args.python_value, kwargs.raw:
+      case "join", (CaMeLStr() as separator, strings), {}:
+        wrapped_output = separator.join(strings, capabilities, dependencies)
+      case "replace", (
+          CaMeLStr() as string,
+          CaMeLStr() as old,
+          CaMeLStr() as new,
+          *count,
+      ), {}:
+        wrapped_output = string.replace(
+            old,
+            new,
+            count[0].raw if count else -1,
+            capabilities,
+            dependencies,
+        )
+      case _:
+        wrapped_output = None
+    if wrapped_output is None or wrapped_output.python_value != value:
+      # E.g., the strings were joined from an iterator.
+      return super().wrap_output(value, args, kwargs, namespace)
+    return wrapped_output
+
+
 def make_builtin(
-    name: str, fn: Callable[..., _T], is_class_method: bool = False
+    name: str,
+    fn: Callable[..., _T],
+    is_class_method: bool = False,
+    pure: bool = False,
 ) -> CaMeLBuiltin[_T]:
-  return CaMeLBuiltin[_T](
+  """Makes a built-in function or method.
+
+  Args:
+      name: The name of the built-in.
+      fn: The Python function implementing it, called with raw values.
+      is_class_method: Whether it is a class method.
+      pure: Whether `fn` never mutates its arguments (see `CaMeLPureBuiltin`).
+
+  Returns:
+      The built-in.
+  """
+  cls = CaMeLPureBuiltin if pure else CaMeLBuiltin
+  return cls[_T](
       name, fn, camel_capabilities.Capabilities.camel(), (), is_class_method
   )
 
@@ -2021,13 +2917,17 @@ SUPPORTED_BUILT_IN_METHODS: dict[str, dict[str, CaMeLBuiltin]] = {
         "isspace": make_builtin("isspace", str.isspace),
         "istitle": make_builtin("istitle", str.istitle),
         "isupper": make_builtin("isupper", str.isupper),
-        "join": make_builtin("join", str.join),
+        "join": _CaMeLStrMethod(
+            "join", str.join, camel_capabilities.Capabilities.camel(), ()
+        ),
         "lower": make_builtin("lower", str.lower),
         "lstrip": make_builtin("lstrip", str.lstrip),
         "partition": make_builtin("partition", str.partition),
         "removeprefix": make_builtin("removeprefix", str.removeprefix),
         "removesuffix": make_builtin("removesuffix", str.removesuffix),
-        "replace": make_builtin("replace", str.replace),
+        "replace": _CaMeLStrMethod(
+            "replace", str.replace, camel_capabilities.Capabilities.camel(), ()
+        ),
         "rfind": make_builtin("rfind", str.rfind),
         "rindex": make_builtin("rindex", str.rindex),
         "rpartition": make_builtin("rpartition", str.rpartition),
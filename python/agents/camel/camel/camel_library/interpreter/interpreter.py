@@ -22,8 +22,10 @@ calls would create circular imports.
 
 import ast
 from collections.abc import Callable, Iterable, Mapping, Sequence
+import concurrent.futures
 import dataclasses
 import enum
+import functools
 import re
 from typing import Any, Generic, NamedTuple, TypeAlias, TypeVar
 
@@ -36,8 +38,15 @@ from .. import security_policy
 from ..capabilities import capabilities as camel_capabilities
 from ..capabilities import readers
 from ..capabilities import sources
+from . import async_bridge
+from . import budget as budget_lib
+from . import call_scheduler
 from . import camel_value
 from . import library
+from . import preflight as preflight_lib
+from . import profiler as profiler_lib
+from . import program_cache as program_cache_lib
+from . import tool_memo as tool_memo_lib
 
 
 ExceptionASTNodes: TypeAlias = ast.expr | ast.stmt | ast.excepthandler
@@ -113,6 +122,23 @@ class EvalResult(NamedTuple):
   dependencies: Iterable[camel_value.Value[Any]]
 
 
+class ProfiledEvalResult(EvalResult):
+  """Result of an evaluation, with its profile.
+
+  It unpacks as an `EvalResult`.
+  """
+
+  profile: profiler_lib.Profile
+  """The profile of the evaluation."""
+
+  def __new__(
+      cls, eval_result: EvalResult, profile: profiler_lib.Profile
+  ) -> "ProfiledEvalResult":
+    self = super().__new__(cls, *eval_result)
+    self.profile = profile
+    return self
+
+
 class DependenciesPropagationMode(str, enum.Enum):
   """Mode of evaluation for the interpreter.
 
@@ -129,6 +155,26 @@ class DependenciesPropagationMode(str, enum.Enum):
     return self.value
 
 
+class EvalBackend(str, enum.Enum):
+  """How the interpreter executes the AST.
+
+  `TREE_WALKING` dispatches on the type of each node every time it is visited.
+  `COMPILED` turns each node into a closure the first time it is visited (or
+  ahead of time, with `compile_program`), which is then called directly on
+  subsequent visits, e.g., in loop bodies and comprehensions. Both backends
+  share the evaluation functions, so they give the same results.
+  """
+
+  TREE_WALKING = "TREE_WALKING"
+  COMPILED = "COMPILED"
+
+  def __str__(self) -> str:
+    return self.value
+
+  def __repr__(self) -> str:
+    return self.value
+
+
 @dataclasses.dataclass(frozen=True)
 class EvalArgs:
   """Evaluation arguments that remain fixed throughout execution."""
@@ -137,6 +183,23 @@ class EvalArgs:
   """The list of security policies to apply."""
   eval_mode: DependenciesPropagationMode
   """The evaluation mode, either `STRICT` or `NORMAL`."""
+  backend: EvalBackend = EvalBackend.TREE_WALKING
+  """The execution backend, either `TREE_WALKING` or `COMPILED`."""
+  parallel_tool_calls: bool = False
+  """Whether to run independent calls to tools without side effects ahead of
+  program order and concurrently. See `call_scheduler`."""
+  budget: budget_lib.ExecutionBudget | None = None
+  """The resources each evaluation can use, if limited. See `budget`."""
+  profile: bool = False
+  """Whether `parse_and_interpret_code` profiles the evaluation. See
+  `profiler`."""
+  preflight: bool = False
+  """Whether `parse_and_interpret_code` analyzes the code before evaluating
+  it, to report the issues it is certain to fail with at once. See
+  `preflight`."""
+  tool_memo: tool_memo_lib.ToolMemo | None = None
+  """The memo of the calls to tools without side effects shared with other
+  evaluations (e.g., the retries of a turn), if any. See `tool_memo`."""
 
 
 def _eval_formatted_value(
@@ -332,7 +395,7 @@ def _eval_iterable(
           # This is only the container capabilities of v as the elements'
           # capabilities are being preserved in the elements themselves
           iter_dependencies = (*iter_dependencies, v)
-          evaled_elts.extend(v.python_value)
+          evaled_elts.extend(v.iterate_python())
         case _:
           raise ValueError("Invalid eval result type")
     else:
@@ -402,14 +465,12 @@ def _eval_joined_str(
     case _:
       raise ValueError("Invalid eval result type")
 
-  string = camel_value.CaMeLStr.from_raw(
-      "", camel_capabilities.Capabilities.camel(), ()
+  string = camel_value.CaMeLStr.concat(
+      (d.string() for d in evaled_data.iterate_python()),
+      camel_capabilities.Capabilities.camel(),
+      (),
   )
 
-  for d in evaled_data.iterate_python():
-    string.python_value = (*string.python_value, *d.string().python_value)
-    # string = string.new_with_dependencies((d,))
-
   return EvalResult(
       result.Ok(string), namespace, tool_calls_chain, dependencies
   )
@@ -999,8 +1060,7 @@ def _assign_name(
         dependencies,
     )
 
-  updated_variables = namespace.variables | {name.id: v}
-  new_namespace = dataclasses.replace(namespace, variables=updated_variables)
+  new_namespace = namespace.add_variables({name.id: v})
   return EvalResult(
       result.Ok(
           camel_value.CaMeLNone(camel_capabilities.Capabilities.default(), ())
@@ -1060,7 +1120,9 @@ def _assign_tuple_list(
         tool_calls_chain,
         dependencies,
     )
-  data_to_assign: Sequence[camel_value.Value[Any]] = v.python_value
+  data_to_assign: Sequence[camel_value.Value[Any]] = tuple(
+      v.iterate_python()
+  )
   if len(names.elts) != len(data_to_assign):
     return EvalResult(
         result.Error(
@@ -1566,16 +1628,15 @@ def _restore_or_delete_variables(
       The updated namespace with variables restored or deleted.
   """
   restored_variables = {}
+  deleted_variables = []
   for var_name in comprehension_variables:
     if var_name in original_namespace.variables:
       restored_variables[var_name] = original_namespace.variables[var_name]
     else:
-      del updated_namespace.variables[var_name]
-  updated_namespace = dataclasses.replace(
-      updated_namespace,
-      variables=updated_namespace.variables | restored_variables,
+      deleted_variables.append(var_name)
+  return updated_namespace.remove_variables(deleted_variables).add_variables(
+      restored_variables
   )
-  return updated_namespace
 
 
 def _eval_comprehensions(
@@ -1747,6 +1808,104 @@ def _eval_comprehensions(
   ), (*evaled_iterators, iterable)
 
 
+def _eval_comprehension(
+    node: ast.ListComp | ast.SetComp | ast.DictComp,
+    elts: tuple[ast.expr] | tuple[ast.expr, ast.expr],  # pylint: disable=g-one-element-tuple
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> tuple[EvalResult, tuple[camel_value.Value[Any], ...]]:
+  """Evaluates the generators and elements of a comprehension.
+
+  With `eval_args.parallel_tool_calls`, the calls in the elements are first
+  started for all the iterations, when possible.
+
+  Args:
+      node: The AST node representing the comprehension.
+      elts: The AST nodes representing the comprehension elements.
+      namespace: The current namespace.
+      tool_calls_chain: The current chain of tool calls.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+
+  Returns:
+      The result of the evaluation and the evaluated iterators.
+  """
+  if not eval_args.parallel_tool_calls:
+    return _eval_comprehensions(
+        node.generators,
+        elts,
+        namespace,
+        tool_calls_chain,
+        dependencies,
+        eval_args,
+        (),
+    )
+  scope = call_scheduler.PrefetchScope()
+  try:
+    nodes = call_scheduler.plan_comprehension(
+        node, namespace, eval_args.security_policy_engine.no_side_effect_tools
+    )
+    if nodes:
+      _prefetch_comprehension_calls(
+          node, nodes, scope, namespace, dependencies, eval_args
+      )
+    return _eval_comprehensions(
+        node.generators,
+        elts,
+        namespace,
+        tool_calls_chain,
+        dependencies,
+        eval_args,
+        (),
+    )
+  finally:
+    scope.close()
+
+
+def _prefetch_comprehension_calls(
+    node: ast.ListComp | ast.SetComp | ast.DictComp,
+    nodes: Sequence[ast.Call],
+    scope: call_scheduler.PrefetchScope,
+    namespace: camel_value.Namespace,
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> None:
+  """Starts the calls in `nodes` for all the iterations of a comprehension.
+
+  The arguments of the calls are evaluated by evaluating the generators of the
+  comprehension, which don't call any function, with the operands of the calls
+  as element.
+
+  Args:
+      node: The AST node representing the comprehension.
+      nodes: The calls, as returned by `call_scheduler.plan_comprehension`.
+      scope: The scope of the calls.
+      namespace: The current namespace.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+  """
+  try:
+    (operands_res, *_), _ = _eval_comprehensions(
+        node.generators,
+        (call_scheduler.operands(nodes),),
+        namespace,
+        (),
+        dependencies,
+        eval_args,
+        (),
+    )
+  except Exception:  # pylint: disable=broad-except. # evaluated again in program order
+    return
+  if not isinstance(operands_res, result.Ok):
+    return
+  (iterations,) = operands_res.value.python_value
+  for iteration in iterations.iterate_python():
+    for call_node, operands in zip(nodes, iteration.iterate_python()):
+      scope.prefetch(call_node, _prefetchable_call(operands, eval_args))
+
+
 def _eval_list_comp(
     node: ast.ListComp,
     namespace: camel_value.Namespace,
@@ -1771,14 +1930,13 @@ def _eval_list_comp(
       namespace,
       tool_calls_chain,
       dependencies,
-  ), evaled_iterators = _eval_comprehensions(
-      node.generators,
+  ), evaled_iterators = _eval_comprehension(
+      node,
       (node.elt,),
       namespace,
       tool_calls_chain,
       dependencies,
       eval_args,
-      (),
   )
   match evaled_comprehension_res:
     case result.Error():
@@ -1829,14 +1987,13 @@ def _eval_set_comp(
       namespace,
       tool_calls_chain,
       dependencies,
-  ), evaled_iterators = _eval_comprehensions(
-      node.generators,
+  ), evaled_iterators = _eval_comprehension(
+      node,
       (node.elt,),
       namespace,
       tool_calls_chain,
       dependencies,
       eval_args,
-      (),
   )
   match evaled_comprehension_res:
     case result.Error():
@@ -1886,14 +2043,13 @@ def _eval_dict_comp(
       namespace,
       tool_calls_chain,
       dependencies,
-  ), evaled_iterators = _eval_comprehensions(
-      node.generators,
+  ), evaled_iterators = _eval_comprehension(
+      node,
       (node.key, node.value),
       namespace,
       tool_calls_chain,
       dependencies,
       eval_args,
-      (),
   )
   match evaled_comprehension_res:
     case result.Error():
@@ -2116,6 +2272,34 @@ def is_bound(m: Callable[..., Any]) -> bool:
   return hasattr(m, "__self__")
 
 
+_SEQUENCE_TYPES = (
+    camel_value.CaMeLList,
+    camel_value.CaMeLTuple,
+    camel_value.CaMeLStr,
+)
+
+
+def _result_size(
+    op: ast.Add | ast.Mult,
+    left: camel_value.Value[Any],
+    right: camel_value.Value[Any],
+) -> int | None:
+  """Returns the length of the concatenation or repetition of sequences."""
+  if isinstance(op, ast.Add):
+    if isinstance(left, _SEQUENCE_TYPES) and isinstance(
+        right, _SEQUENCE_TYPES
+    ):
+      return len(left.python_value) + len(right.python_value)
+    return None
+  if isinstance(left, camel_value.CaMeLInt):
+    left, right = right, left
+  if isinstance(left, _SEQUENCE_TYPES) and isinstance(
+      right, camel_value.CaMeLInt
+  ):
+    return len(left.python_value) * max(right.python_value, 0)
+  return None
+
+
 def _eval_bin_op_inner(
     op: ast.BinOp | ast.AugAssign,
     left: camel_value.Value[Any],
@@ -2178,6 +2362,15 @@ def _eval_bin_op_inner(
 
   method_name, protocol, r_protocol = op_map[type(op.op)]
 
+  if isinstance(op.op, ast.Add | ast.Mult):
+    # Check the size of the sequence before it is allocated.
+    size = _result_size(op.op, left, right)
+    if size is not None:
+      try:
+        budget_lib.check_container_size(size)
+      except budget_lib.BudgetExceededError as e:
+        return result.Error(CaMeLException(e, (op,), (left, right)))
+
   # Check for operator methods
   if isinstance(left, camel_value.CaMeLClassInstance):
     operator_method_name = f"__{method_name}__"  # Operator method name
@@ -2804,20 +2997,119 @@ def _eval_stmt_list(
   # passed to ast.parse. In which case it's fine if it's not None. It's not
   # possible to have empty bodies for for and if/else bodies.
   val = camel_value.CaMeLNone(camel_capabilities.Capabilities.default(), ())
-  for stmt in stmts:
-    val_res, namespace, tool_calls_chain, dependencies = camel_eval(
-        stmt, namespace, tool_calls_chain, dependencies, eval_args
-    )
-    match val_res:
-      case result.Error():
-        return EvalResult(val_res, namespace, tool_calls_chain, dependencies)
-      case result.Ok(v):
-        val = v
-      case _:
-        raise ValueError("Invalid eval result type")
+  scope = (
+      call_scheduler.PrefetchScope() if eval_args.parallel_tool_calls else None
+  )
+  try:
+    for stmt in stmts:
+      async_bridge.check_cancelled()
+      if scope is not None:
+        _prefetch_calls(
+            call_scheduler.plan_statement(
+                stmt,
+                namespace,
+                eval_args.security_policy_engine.no_side_effect_tools,
+            ),
+            scope,
+            namespace,
+            dependencies,
+            eval_args,
+        )
+      val_res, namespace, tool_calls_chain, dependencies = camel_eval(
+          stmt, namespace, tool_calls_chain, dependencies, eval_args
+      )
+      match val_res:
+        case result.Error():
+          return EvalResult(val_res, namespace, tool_calls_chain, dependencies)
+        case result.Ok(v):
+          val = v
+        case _:
+          raise ValueError("Invalid eval result type")
+  finally:
+    if scope is not None:
+      scope.close()
   return EvalResult(result.Ok(val), namespace, tool_calls_chain, dependencies)
 
 
+def _prefetchable_call(
+    operands: camel_value.Value[Any],
+    eval_args: EvalArgs,
+) -> (
+    tuple[
+        camel_value.CaMeLCallable[Any],
+        camel_value.CaMeLTuple,
+        camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value[Any]],
+    ]
+    | None
+):
+  """Returns the function and arguments of a call to make ahead of time.
+
+  Args:
+      operands: The `(function, args, kwargs)` tuple of a call.
+      eval_args: The evaluation arguments.
+
+  Returns:
+      The function and its arguments, or `None` if the function is not a tool
+      without side effects, if its output is memoized, or if it isn't known
+      ahead of time that the security policies allow the call.
+  """
+  function, args, kwargs = operands.python_value
+  if (
+      not isinstance(function, camel_value.CaMeLFunction)
+      or function.receiver() is not None
+      or function.name().raw
+      not in eval_args.security_policy_engine.no_side_effect_tools
+  ):
+    return None
+  memoized_args = _memoized_args(function, args, kwargs, eval_args)
+  if memoized_args is not None and eval_args.tool_memo.contains(
+      function.name().raw, memoized_args
+  ):
+    return None
+  # The policies are checked again when evaluation reaches the call, with the
+  # dependencies at that point, so only start the calls that check will allow
+  # whatever these are.
+  if not security_policy.always_allows(
+      eval_args.security_policy_engine, function.name().raw
+  ):
+    return None
+  return function, args, kwargs
+
+
+def _prefetch_calls(
+    nodes: Sequence[ast.Call],
+    scope: call_scheduler.PrefetchScope,
+    namespace: camel_value.Namespace,
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> None:
+  """Starts the calls in `nodes`, evaluating their arguments in `namespace`.
+
+  Args:
+      nodes: The calls, as returned by `call_scheduler.plan_statement`.
+      scope: The scope of the calls.
+      namespace: The current namespace.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+  """
+  for node in nodes:
+    try:
+      operands_res = camel_eval(
+          call_scheduler.operands((node,)),
+          namespace,
+          (),
+          dependencies,
+          eval_args,
+      ).result
+    except Exception:  # pylint: disable=broad-except. # evaluated again in program order
+      operands_res = None
+    if isinstance(operands_res, result.Ok):
+      (operands,) = operands_res.value.python_value
+      scope.prefetch(node, _prefetchable_call(operands, eval_args))
+    else:
+      scope.prefetch(node, None)
+
+
 def _eval_args(
     args: list[ast.expr],
     fn: camel_value.Value[Any],
@@ -3017,6 +3309,55 @@ def _eval_keywords(
   )
 
 
+def _memoized_args(
+    function: camel_value.Value[Any],
+    args: camel_value.CaMeLTuple,
+    kwargs: camel_value.CaMeLDict[camel_value.CaMeLStr, camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> dict[str, Any] | None:
+  """Returns the raw arguments by keyword of a call to memoize, if it is one.
+
+  Calls to tools without side effects are memoized in `eval_args.tool_memo`,
+  if set. Calls to other tools invalidate the memo.
+
+  Args:
+      function: The function called.
+      args: The positional arguments of the call.
+      kwargs: The keyword arguments of the call.
+      eval_args: The evaluation arguments.
+
+  Returns:
+      The raw arguments by keyword, or `None` if the call is not memoized.
+  """
+  if (
+      eval_args.tool_memo is None
+      or not isinstance(function, camel_value.CaMeLFunction)
+      or function.receiver() is not None
+      or function.name().raw
+      not in eval_args.security_policy_engine.no_side_effect_tools
+  ):
+    return None
+  return {
+      k: v.raw
+      for k, v in function.make_args_by_keyword_preserve_values(
+          args, kwargs
+      ).items()
+  }
+
+
+def _call_frame_name(function: camel_value.Value[Any]) -> str:
+  """Returns the name of the profile frame of a call to `function`."""
+  name = function.name().raw
+  if isinstance(function, camel_value.CaMeLClass):
+    return f"class:{name}"
+  if isinstance(function, camel_value.CaMeLBuiltin):
+    receiver = function.receiver()
+    if receiver is not None:
+      return f"method:{receiver.raw_type}.{name}"
+    return f"builtin:{name}"
+  return f"tool:{name}"
+
+
 def _eval_call(
     node: ast.Call,
     namespace: camel_value.Namespace,
@@ -3103,13 +3444,14 @@ def _eval_call(
 
   try:
     # make sure policy evaluation is constant time to prevent side-channels
-    policy_check_result = eval_args.security_policy_engine.check_policy(
-        evaled_fn.name().raw,
-        evaled_fn.make_args_by_keyword_preserve_values(
-            evaled_args, evaled_kwargs
-        ),
-        dependencies,
-    )
+    with profiler_lib.frame(f"policy:{evaled_fn.name().raw}"):
+      policy_check_result = eval_args.security_policy_engine.check_policy(
+          evaled_fn.name().raw,
+          evaled_fn.make_args_by_keyword_preserve_values(
+              evaled_args, evaled_kwargs
+          ),
+          dependencies,
+      )
   except Exception as e:  # pylint: disable=broad-except. # sometimes exceptions can be thrown when checking policies
     return EvalResult(
         result.Error(CaMeLException(e, (node,), (evaled_fn,))),
@@ -3138,10 +3480,53 @@ def _eval_call(
         *evaled_kwargs.python_value.values(),
     ]
 
+  async_bridge.check_cancelled()
   try:
-    ret_res, args_by_keyword = evaled_fn.call(
-        evaled_args, evaled_kwargs, namespace
+    prefetched_output = call_scheduler.take(
+        node, evaled_fn, evaled_args, evaled_kwargs
+    )
+    memoized_args = _memoized_args(
+        evaled_fn, evaled_args, evaled_kwargs, eval_args
     )
+    if (
+        eval_args.tool_memo is not None
+        and memoized_args is None
+        and isinstance(evaled_fn, camel_value.CaMeLFunction)
+    ):
+      # The tool may have side effects which change the outputs of the
+      # memoized calls (even if it fails).
+      eval_args.tool_memo.invalidate()
+    with profiler_lib.frame(_call_frame_name(evaled_fn)):
+      if memoized_args is not None:
+        found, raw_output = eval_args.tool_memo.get(
+            evaled_fn.name().raw, memoized_args
+        )
+        if not found:
+          if prefetched_output is not None:
+            raw_output = prefetched_output.result()
+          else:
+            # The output is memoized before it is wrapped (and maybe mutated
+            # by the program).
+            raw_output = evaled_fn.call_detached(
+                evaled_args.raw,
+                evaled_kwargs.raw,
+                evaled_args.raw,
+                evaled_kwargs.raw,
+            )
+          eval_args.tool_memo.put(
+              evaled_fn.name().raw, memoized_args, raw_output
+          )
+        ret_res, args_by_keyword = evaled_fn.complete_call(
+            raw_output, evaled_args, evaled_kwargs, namespace
+        )
+      elif prefetched_output is None:
+        ret_res, args_by_keyword = evaled_fn.call(
+            evaled_args, evaled_kwargs, namespace
+        )
+      else:
+        ret_res, args_by_keyword = evaled_fn.complete_call(
+            prefetched_output.result(), evaled_args, evaled_kwargs, namespace
+        )
   except Exception as e:  # pylint: disable=broad-except  # catch all exceptions to be able to return them to the P-LLM
     if isinstance(e, library.NotEnoughInformationError):
       return EvalResult(
@@ -3150,7 +3535,7 @@ def _eval_call(
                   e,
                   (node,),
                   (evaled_args, evaled_kwargs),
-                  camel_capabilities.Capabilities(
+                  camel_capabilities.Capabilities.canonical(
                       sources_set=frozenset(
                           {sources.Tool(evaled_fn.name().raw)}
                       ),
@@ -3184,7 +3569,7 @@ def _eval_call(
                 exception,
                 (node,),
                 (evaled_fn, evaled_args, evaled_kwargs),
-                camel_capabilities.Capabilities(
+                camel_capabilities.Capabilities.canonical(
                     sources_set=frozenset({sources.Tool(evaled_fn.name().raw)}),
                     readers_set=readers.Public(),
                 ),
@@ -3208,11 +3593,13 @@ def _eval_call(
   else:
     object_type = None
 
+  with profiler_lib.frame("raw"):
+    output = ret_res.raw
   tool_call = function_types.FunctionCall(
       function=evaled_fn.name().raw,
       object_type=object_type,
       args=args_by_keyword,
-      output=ret_res.raw,
+      output=output,
       is_builtin=isinstance(
           evaled_fn, camel_value.CaMeLBuiltin | camel_value.CaMeLClass
       ),
@@ -3221,7 +3608,7 @@ def _eval_call(
   return EvalResult(
       result.Ok(ret_res),
       namespace,
-      [*tool_calls_chain, tool_call],
+      function_types.FunctionCallLog.of(tool_calls_chain).append(tool_call),
       dependencies,
   )
 
@@ -3610,6 +3997,115 @@ def camel_eval(
     eval_args: EvalArgs,
 ) -> EvalResult:
   """Interprets the given AST enforcing security policies."""
+  if eval_args.profile:
+    return _eval_profiled(
+        node, namespace, tool_calls_chain, dependencies, eval_args
+    )
+  if eval_args.budget is not None:
+    return _eval_metered(
+        node, namespace, tool_calls_chain, dependencies, eval_args
+    )
+  if eval_args.backend is EvalBackend.COMPILED:
+    return _get_compiled(node)(
+        namespace, tool_calls_chain, dependencies, eval_args
+    )
+  return _eval_node(node, namespace, tool_calls_chain, dependencies, eval_args)
+
+
+def _eval_profiled(
+    node: ast.AST,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  """Interprets the given AST in a frame of the profile of the evaluation."""
+  profile = profiler_lib.current()
+  if profile is not None:
+    profile.enter(type(node).__name__)
+  try:
+    if eval_args.budget is not None:
+      return _eval_metered(
+          node, namespace, tool_calls_chain, dependencies, eval_args
+      )
+    if eval_args.backend is EvalBackend.COMPILED:
+      return _get_compiled(node)(
+          namespace, tool_calls_chain, dependencies, eval_args
+      )
+    return _eval_node(
+        node, namespace, tool_calls_chain, dependencies, eval_args
+    )
+  finally:
+    if profile is not None:
+      profile.exit()
+
+
+_CONTAINER_NODES = frozenset({
+    ast.List,
+    ast.Tuple,
+    ast.Set,
+    ast.Dict,
+    ast.ListComp,
+    ast.SetComp,
+    ast.DictComp,
+})
+"""Nodes creating a container, whose size is checked against the budget."""
+
+
+def _eval_metered(
+    node: ast.AST,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  """Interprets the given AST, charging it to the budget of the evaluation."""
+  meter = budget_lib.current()
+  if meter is None:
+    # This is the outermost evaluation: it starts the meter.
+    with budget_lib.metered(eval_args.budget):  # type: ignore
+      return _eval_metered(
+          node, namespace, tool_calls_chain, dependencies, eval_args
+      )
+  try:
+    meter.step()
+  except budget_lib.BudgetExceededError as e:
+    return EvalResult(
+        result.Error(CaMeLException(e, (node,), ())),  # type: ignore
+        namespace,
+        tool_calls_chain,
+        dependencies,
+    )
+  if eval_args.backend is EvalBackend.COMPILED:
+    eval_result = _get_compiled(node)(
+        namespace, tool_calls_chain, dependencies, eval_args
+    )
+  else:
+    eval_result = _eval_node(
+        node, namespace, tool_calls_chain, dependencies, eval_args
+    )
+  if type(node) in _CONTAINER_NODES and isinstance(
+      eval_result.result, result.Ok
+  ):
+    value = eval_result.result.value
+    try:
+      meter.check_container_size(len(value.python_value))
+    except budget_lib.BudgetExceededError as e:
+      return EvalResult(
+          result.Error(CaMeLException(e, (node,), (value,))),  # type: ignore
+          *eval_result[1:],
+      )
+  return eval_result
+
+
+def _eval_node(
+    node: ast.AST,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+) -> EvalResult:
+  """Interprets the given AST by dispatching on the type of its root."""
   match node:
     # Literals
     case ast.Constant():
@@ -3947,8 +4443,9 @@ def camel_eval(
               dependencies,
           )
         if alias.asname is not None:
-          namespace.variables[alias.asname] = namespace.variables[alias.name]
-          del namespace.variables[alias.name]
+          namespace = namespace.remove_variables([alias.name]).add_variables(
+              {alias.asname: namespace.variables[alias.name]}
+          )
       return EvalResult(
           result.Ok(
               camel_value.CaMeLNone(camel_capabilities.Capabilities.camel(), ())
@@ -3963,6 +4460,158 @@ def camel_eval(
       )
 
 
+_CompiledNode: TypeAlias = Callable[
+    [
+        camel_value.Namespace,
+        Sequence[function_types.FunctionCall[Any]],
+        Iterable[camel_value.Value[Any]],
+        EvalArgs,
+    ],
+    EvalResult,
+]
+"""A node compiled to a closure taking the arguments of `camel_eval` but the
+node itself."""
+
+_COMPILED_ATTR = "_camel_compiled"
+"""The attribute of the AST nodes holding their compiled closure."""
+
+_EVAL_FUNCTIONS: dict[type[ast.AST], Callable[..., EvalResult]] = {
+    ast.Constant: _eval_constant,
+    ast.FormattedValue: _eval_formatted_value,
+    ast.JoinedStr: _eval_joined_str,
+    ast.List: _eval_list,
+    ast.Tuple: _eval_tuple,
+    ast.Set: _eval_set,
+    ast.Dict: _eval_dict,
+    ast.Name: _eval_name_load,
+    ast.Attribute: _eval_attribute_load,
+    ast.Subscript: _eval_subscript_load,
+    ast.Assign: _eval_assign,
+    ast.AnnAssign: _eval_ann_assign,
+    ast.AugAssign: _eval_aug_assign,
+    ast.ListComp: _eval_list_comp,
+    ast.SetComp: _eval_set_comp,
+    ast.DictComp: _eval_dict_comp,
+    ast.Expr: _eval_expr,
+    ast.NamedExpr: _eval_named_expr,
+    ast.UnaryOp: _eval_unary_op,
+    ast.BinOp: _eval_bin_op,
+    ast.BoolOp: _eval_bool_op,
+    ast.Compare: _eval_compare,
+    ast.If: _eval_if,
+    ast.IfExp: _eval_if_exp,
+    ast.For: _eval_for,
+    ast.Call: _eval_call,
+    ast.Module: _eval_module,
+    ast.ClassDef: _eval_class_def,
+    ast.FunctionDef: _eval_function_def,
+    ast.Raise: _eval_raise,
+}
+"""The functions evaluating each type of node, as dispatched by `_eval_node`.
+The other types of nodes are compiled to a call to `_eval_node`."""
+
+
+def _compile_constant(node: ast.Constant) -> _CompiledNode:
+  # Constants are assumed to come from the user prompt and public.
+  default_metadata = camel_capabilities.Capabilities.default()
+  match node.value:
+    case None:
+      make_value, args = camel_value.CaMeLNone, ()
+    case str():
+      make_value, args = camel_value.CaMeLStr.from_raw, (node.value,)
+    case bool():
+      make_value = (
+          camel_value.CaMeLTrue if node.value else camel_value.CaMeLFalse
+      )
+      args = ()
+    case int():
+      make_value, args = camel_value.CaMeLInt, (node.value,)
+    case float():
+      make_value, args = camel_value.CaMeLFloat, (node.value,)
+    case _:
+      return functools.partial(_eval_constant, node)
+
+  def eval_constant(
+      namespace: camel_value.Namespace,
+      tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+      dependencies: Iterable[camel_value.Value[Any]],
+      eval_args: EvalArgs,  # pylint: disable=unused-argument
+  ) -> EvalResult:
+    # A new value is created at each evaluation, as with `_eval_constant`.
+    v = make_value(*args, default_metadata, ())
+    return EvalResult(result.Ok(v), namespace, tool_calls_chain, dependencies)
+
+  return eval_constant
+
+
+def _compile_name(node: ast.Name) -> _CompiledNode:
+  name = node.id
+
+  def eval_name(
+      namespace: camel_value.Namespace,
+      tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+      dependencies: Iterable[camel_value.Value[Any]],
+      eval_args: EvalArgs,
+  ) -> EvalResult:
+    var = namespace.get(name)
+    if var is None:
+      return _eval_name_load(
+          node, namespace, tool_calls_chain, dependencies, eval_args
+      )
+    return EvalResult(result.Ok(var), namespace, tool_calls_chain, dependencies)
+
+  return eval_name
+
+
+def _compile(node: ast.AST) -> _CompiledNode:
+  """Compiles `node` to a closure evaluating it.
+
+  The closure calls the same evaluation function as `_eval_node` would, with
+  the node already bound. The simplest nodes (constants, names, and
+  expression statements) are compiled to closures which don't go through
+  these functions.
+
+  Args:
+      node: The AST node to compile.
+
+  Returns:
+      The closure evaluating the node.
+  """
+  match node:
+    case ast.Constant():
+      return _compile_constant(node)
+    case ast.Name():
+      return _compile_name(node)
+    case ast.Expr():
+      # The value of an expression statement is the value of its expression.
+      return _get_compiled(node.value)
+  eval_function = _EVAL_FUNCTIONS.get(type(node), _eval_node)
+  return functools.partial(eval_function, node)
+
+
+def _get_compiled(node: ast.AST) -> _CompiledNode:
+  compiled = getattr(node, _COMPILED_ATTR, None)
+  if compiled is None:
+    compiled = _compile(node)
+    setattr(node, _COMPILED_ATTR, compiled)
+  return compiled
+
+
+def compile_program(tree: ast.AST) -> None:
+  """Compiles all the statements and expressions in `tree` ahead of time.
+
+  Evaluating `tree` with the `COMPILED` backend then never dispatches on the
+  type of a node. Nodes which are not compiled ahead of time are compiled
+  when they are first evaluated.
+
+  Args:
+      tree: The AST to compile.
+  """
+  for node in ast.walk(tree):
+    if isinstance(node, (ast.mod, ast.stmt, ast.expr)):
+      _get_compiled(node)
+
+
 class InvalidOutputError(Exception):
   ...
 
@@ -4009,6 +4658,7 @@ def parse_and_interpret_code(
     tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
     dependencies: Iterable[camel_value.Value[Any]],
     eval_args: EvalArgs,
+    program_cache: program_cache_lib.ProgramCache | None = None,
 ) -> EvalResult:
   """Parses and interprets the given code enforcing security policies.
 
@@ -4018,10 +4668,26 @@ def parse_and_interpret_code(
       tool_calls_chain: The current chain of tool calls.
       dependencies: The current dependencies.
       eval_args: The evaluation arguments.
+      program_cache: The cache to get the parsed code from, if any.
 
   Returns:
-      The result of the evaluation.
+      The result of the evaluation. If `eval_args.profile` is set, it is a
+      `ProfiledEvalResult`. If `eval_args.preflight` is set and the code has
+      issues, it is an error with a `preflight.PreflightError`, and nothing
+      is evaluated.
   """
+  if eval_args.profile and profiler_lib.current() is None:
+    with profiler_lib.profiled() as profile:
+      eval_result = parse_and_interpret_code(
+          code,
+          namespace,
+          tool_calls_chain,
+          dependencies,
+          eval_args,
+          program_cache,
+      )
+    return ProfiledEvalResult(eval_result, profile)
+  tool_calls_chain = function_types.FunctionCallLog.of(tool_calls_chain)
   try:
     code = extract_code_block(code)
   except InvalidOutputError as e:
@@ -4038,7 +4704,11 @@ def parse_and_interpret_code(
         dependencies,
     )
   try:
-    parsed_code = ast.parse(code)
+    with profiler_lib.frame("parse"):
+      if program_cache is not None:
+        parsed_code = program_cache.parse(code)
+      else:
+        parsed_code = ast.parse(code)
   except SyntaxError as e:
     error_nodes: tuple[ExceptionASTNodes, ...] = (
         ast.expr(
@@ -4052,8 +4722,107 @@ def parse_and_interpret_code(
         tool_calls_chain,
         dependencies,
     )
+  if eval_args.preflight:
+    with profiler_lib.frame("preflight"):
+      issues = preflight_lib.analyze(
+          parsed_code, namespace, eval_args.security_policy_engine
+      )
+    if issues:
+      preflight_error = preflight_lib.PreflightError(issues)
+      if isinstance(
+          issues[0].exception, security_policy.SecurityPolicyDeniedError
+      ):
+        # The evaluation would be denied first, which is raised as well.
+        raise security_policy.SecurityPolicyDeniedError(str(preflight_error))
+      return EvalResult(
+          result.Error(
+              CaMeLException(
+                  preflight_error, tuple(i.node for i in issues), ()
+              )
+          ),
+          namespace,
+          tool_calls_chain,
+          dependencies,
+      )
+  if eval_args.backend is EvalBackend.COMPILED:
+    compile_program(parsed_code)
   return EvalResult(
       *camel_eval(
           parsed_code, namespace, tool_calls_chain, dependencies, eval_args
       )
   )
+
+
+async def camel_eval_async(
+    node: ast.AST,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+    executor: concurrent.futures.Executor | None = None,
+) -> EvalResult:
+  """Interprets the given AST enforcing security policies, asynchronously.
+
+  The evaluation runs in a worker thread so that it doesn't block the running
+  event loop, and the awaitables returned by tools (e.g., by coroutine
+  functions) are awaited on that loop.
+
+  Args:
+      node: The AST to interpret.
+      namespace: The current namespace.
+      tool_calls_chain: The current chain of tool calls.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+      executor: The executor providing the worker thread. Defaults to the
+        default executor of the loop.
+
+  Returns:
+      The result of the evaluation.
+  """
+  return await async_bridge.run_in_thread(
+      camel_eval,
+      node,
+      namespace,
+      tool_calls_chain,
+      dependencies,
+      eval_args,
+      executor=executor,
+  )
+
+
+async def parse_and_interpret_code_async(
+    code: str,
+    namespace: camel_value.Namespace,
+    tool_calls_chain: Sequence[function_types.FunctionCall[Any]],
+    dependencies: Iterable[camel_value.Value[Any]],
+    eval_args: EvalArgs,
+    program_cache: program_cache_lib.ProgramCache | None = None,
+    executor: concurrent.futures.Executor | None = None,
+) -> EvalResult:
+  """Parses and interprets the given code, asynchronously.
+
+  See `camel_eval_async` for how the evaluation runs.
+
+  Args:
+      code: The code to parse and interpret.
+      namespace: The current namespace.
+      tool_calls_chain: The current chain of tool calls.
+      dependencies: The current dependencies.
+      eval_args: The evaluation arguments.
+      program_cache: The cache to get the parsed code from, if any.
+      executor: The executor providing the worker thread. Defaults to the
+        default executor of the loop.
+
+  Returns:
+      The result of the evaluation.
+  """
+  return await async_bridge.run_in_thread(
+      parse_and_interpret_code,
+      code,
+      namespace,
+      tool_calls_chain,
+      dependencies,
+      eval_args,
+      program_cache,
+      executor=executor,
+  )
@@ -27,6 +27,7 @@ import pydantic
 import pydantic.fields as pydantic_fields
 
 from ..capabilities import capabilities
+from . import budget
 from . import camel_value
 
 
@@ -64,13 +65,15 @@ def camel_range(
 ) -> list[int]:
   match (stop, step):
     case None, None:
-      return list(range(start))
+      r = range(start)
     case (_, None):
-      return list(range(start, stop))
+      r = range(start, stop)
     case (None, _):
       raise TypeError("'NoneType' object cannot be interpreted as an integer")
     case (_, _):
-      return list(range(start, stop, step))
+      r = range(start, stop, step)
+  budget.check_allocation(len(r))
+  return list(r)
 
 
 # pylint: disable=unused-argument
@@ -91,8 +94,8 @@ def camel_print(
 
 BUILT_IN_FUNCTIONS: dict[str, camel_value.CaMeLBuiltin] = {
     "abs": camel_value.make_builtin("abs", abs),
-    "any": camel_value.make_builtin("any", any),
-    "all": camel_value.make_builtin("all", all),
+    "any": camel_value.make_builtin("any", any, pure=True),
+    "all": camel_value.make_builtin("all", all, pure=True),
     "bool": camel_value.make_builtin("bool", camel_bool),
     "dir": camel_value.make_builtin("dir", camel_dir),
     "divmod": camel_value.make_builtin("divmod", divmod),
@@ -101,23 +104,23 @@ BUILT_IN_FUNCTIONS: dict[str, camel_value.CaMeLBuiltin] = {
     "float": camel_value.make_builtin("float", float),
     "hash": camel_value.make_builtin("hash", hash),
     "int": camel_value.make_builtin("int", int),
-    "len": camel_value.make_builtin("len", len),
+    "len": camel_value.make_builtin("len", len, pure=True),
     "list": camel_value.make_builtin("list", list),
-    "max": camel_value.make_builtin("max", max),  # type: ignore  # unclear what's wrong here
-    "min": camel_value.make_builtin("min", min),  # type: ignore  # unclear what's wrong here
+    "max": camel_value.make_builtin("max", max, pure=True),  # type: ignore  # unclear what's wrong here
+    "min": camel_value.make_builtin("min", min, pure=True),  # type: ignore  # unclear what's wrong here
     "print": camel_value.make_builtin("print", camel_print),
     "range": camel_value.make_builtin("range", camel_range),
     "repr": camel_value.make_builtin("repr", repr),
     # We don't want lazy objects, so `reversed` must return a list of tuples
     "reversed": camel_value.make_builtin("reversed", camel_reversed),
     "set": camel_value.make_builtin("set", set),
-    "sorted": camel_value.make_builtin("sorted", sorted),
+    "sorted": camel_value.make_builtin("sorted", sorted, pure=True),
     "str": camel_value.make_builtin("str", str),
     "tuple": camel_value.make_builtin("tuple", tuple),
     "type": camel_value.make_builtin("type", lambda x: type(x).__name__),
     # We don't want lazy objects, so `zip` must return a list of tuples
     "zip": camel_value.make_builtin("zip", camel_zip),
-    "sum": camel_value.make_builtin("sum", sum),
+    "sum": camel_value.make_builtin("sum", sum, pure=True),
 }
 """Built-in functions supported in Starlark (plus or minus some extra).
 
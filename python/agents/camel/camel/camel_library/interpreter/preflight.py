@@ -0,0 +1,437 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Static analysis of P-LLM programs before they are evaluated.
+
+When `EvalArgs.preflight` is set, `parse_and_interpret_code` analyzes the
+parsed program before evaluating any of it, and reports all the issues found
+at once, instead of evaluating the program up to the first one (possibly after
+expensive tool and Q-LLM calls). The issues are:
+
+- nodes which the interpreter doesn't support (e.g., `while` loops, lambdas,
+  or imports of names which are not in the namespace), with the messages of
+  the interpreter;
+- names which are not in the namespace and are not assigned anywhere in the
+  program (e.g., Python built-ins which are not available to programs);
+- calls, evaluated whenever the program runs to its end, to tools with side
+  effects that no security policy matches, or whose policy is pure (see
+  `security_policy.pure_policy`) and denies the call with constant arguments.
+
+The first two are reported wherever they are, as programs using them are
+wrong even if the evaluation wouldn't reach them. Anything which depends on
+the values computed by the program is left to the interpreter. The security
+policies are only checked for engines which use the `check_policy` of
+`SecurityPolicyEngine`. If the first issue is a denied call,
+`parse_and_interpret_code` raises a `SecurityPolicyDeniedError`, as the
+evaluation would.
+"""
+
+import ast
+import builtins
+from collections.abc import Sequence
+import dataclasses
+from typing import Any
+
+from .. import security_policy
+from ..capabilities import capabilities as camel_capabilities
+from . import camel_value
+
+_UNSUPPORTED_NODES: dict[type[ast.AST], str] = {
+    ast.Slice: "Slices are not supported.",
+    ast.GeneratorExp: (
+        "Generator expressions are not supported. Use a list comprehension"
+        " instead if possible."
+    ),
+    ast.While: "While statements are not supported. Use a for loop instead.",
+    ast.Break: "Break statements are not supported.",
+    ast.Continue: "Continue statements are not supported.",
+    ast.Match: "Match statements are not supported.",
+    ast.Lambda: (
+        "Defining lambda functions is not supported. If you are operating on a"
+        " list, consider using a list comprehension or a for loop."
+    ),
+    ast.FunctionDef: "Function definitions are not supported",
+    ast.Return: "Return statements are not supported.",
+    ast.Yield: "Yield statements are not supported.",
+    ast.YieldFrom: "Yield from statements are not supported.",
+    ast.Try: (
+        "Try blocks are are not supported. DO not try to catch exceptions."
+    ),
+    ast.Assert: "Assert statements are not supported.",
+    ast.Delete: "Delete statements are not supported.",
+    ast.With: "Context managers are not supported.",
+    ast.AsyncFor: "Async is not supported.",
+    ast.AsyncWith: "Async is not supported.",
+    ast.AsyncFunctionDef: "Async is not supported.",
+    ast.Await: "Async is not supported.",
+    ast.Global: "Global statements are not supported.",
+    ast.Nonlocal: "Nonlocal statements are not supported.",
+    ast.Import: (
+        "You can't import modules. Instead, use what you have been provided as"
+        " described in the system prompt, which you can assume has already"
+        " been imported."
+    ),
+}
+"""The messages of the nodes the interpreter rejects whatever their children,
+as in `interpreter._eval_node`."""
+
+_SUPPORTED_CONSTANT_TYPES = (type(None), str, bool, int, float)
+
+_CONDITIONAL_NODES = (ast.ListComp, ast.SetComp, ast.DictComp)
+"""Nodes whose children are not all evaluated when the program runs to its
+end (besides `if` and `for` statements, conditional expressions and boolean
+operators, whose first child is)."""
+
+
+@dataclasses.dataclass(frozen=True)
+class Issue:
+  """An issue found in a program."""
+
+  node: ast.expr | ast.stmt
+  """The node the issue is about."""
+  exception: Exception
+  """The exception evaluating the node would fail with."""
+
+  def __str__(self) -> str:
+    return (
+        f"Line {self.node.lineno}: {type(self.exception).__name__}:"
+        f" {self.exception}"
+    )
+
+
+class PreflightError(Exception):
+  """The issues found in a program before evaluating it."""
+
+  def __init__(self, issues: Sequence[Issue]) -> None:
+    self.issues = tuple(issues)
+    super().__init__(
+        f"The code was not run, as it has {len(self.issues)} error(s):\n"
+        + "\n".join(map(str, self.issues))
+    )
+
+
+def analyze(
+    tree: ast.Module,
+    namespace: camel_value.Namespace,
+    security_policy_engine: security_policy.SecurityPolicyEngine,
+) -> list[Issue]:
+  """Returns the issues found in a program, in source order.
+
+  Args:
+    tree: The parsed program.
+    namespace: The namespace the program is going to be evaluated in.
+    security_policy_engine: The engine the calls are going to be checked with.
+
+  Returns:
+    The issues which make the evaluation of the program fail.
+  """
+  analyzer = _Analyzer(tree, namespace, security_policy_engine)
+  analyzer.visit(tree, unconditional=True)
+  return sorted(
+      analyzer.issues, key=lambda i: (i.node.lineno, i.node.col_offset)
+  )
+
+
+def _has_dataclass_decorator(node: ast.ClassDef) -> bool:
+  """Returns whether `node` is only decorated with `@dataclass`.
+
+  As in `interpreter._check_decorators`, which can't be imported here.
+
+  Args:
+    node: The class definition.
+
+  Returns:
+    Whether the only decorator is `@dataclass` or `@dataclasses.dataclass`.
+  """
+  match node.decorator_list:
+    case [ast.Name(id="dataclass")]:
+      return True
+    case [ast.Attribute(attr="dataclass", value=ast.Name(id="dataclasses"))]:
+      return True
+  return False
+
+
+def _assigned_names(tree: ast.AST) -> frozenset[str]:
+  """Returns the names the program assigns, wherever they are assigned."""
+  names = set()
+  for node in ast.walk(tree):
+    match node:
+      case ast.Name(ctx=ast.Store()):
+        names.add(node.id)
+      case ast.ClassDef():
+        names.add(node.name)
+      case ast.ImportFrom():
+        names.update(alias.asname or alias.name for alias in node.names)
+  return frozenset(names)
+
+
+def _constant_value(node: ast.expr) -> camel_value.Value[Any] | None:
+  """Returns the value of a constant as evaluated by the interpreter."""
+  if not isinstance(node, ast.Constant):
+    return None
+  # Constants are assumed to come from the user prompt and public.
+  default_metadata = camel_capabilities.Capabilities.default()
+  match node.value:
+    case None:
+      return camel_value.CaMeLNone(default_metadata, ())
+    case str():
+      return camel_value.CaMeLStr.from_raw(node.value, default_metadata, ())
+    case bool():
+      return (
+          camel_value.CaMeLTrue(default_metadata, ())
+          if node.value
+          else camel_value.CaMeLFalse(default_metadata, ())
+      )
+    case int():
+      return camel_value.CaMeLInt(node.value, default_metadata, ())
+    case float():
+      return camel_value.CaMeLFloat(node.value, default_metadata, ())
+  return None
+
+
+class _Analyzer:
+  """Collects the issues of a program."""
+
+  def __init__(
+      self,
+      tree: ast.Module,
+      namespace: camel_value.Namespace,
+      security_policy_engine: security_policy.SecurityPolicyEngine,
+  ) -> None:
+    self.namespace = namespace
+    self.assigned_names = _assigned_names(tree)
+    self.security_policy_engine = security_policy_engine
+    self.issues: list[Issue] = []
+
+  def report(self, node: ast.expr | ast.stmt, exception: Exception) -> None:
+    self.issues.append(Issue(node, exception))
+
+  def visit(self, node: ast.AST, unconditional: bool) -> None:
+    """Checks `node` and its children.
+
+    Args:
+      node: The node to check.
+      unconditional: Whether the node is evaluated whenever the program runs
+        to its end.
+    """
+    message = _UNSUPPORTED_NODES.get(type(node))
+    if message is not None:
+      # The interpreter doesn't evaluate the children.
+      self.report(node, SyntaxError(message))  # type: ignore
+      return
+    match node:
+      case ast.Name(ctx=ast.Load()):
+        self.check_name(node)
+      case ast.Constant() if not isinstance(
+          node.value, _SUPPORTED_CONSTANT_TYPES
+      ):
+        self.report(
+            node,
+            NotImplementedError(
+                f"unsupported constant type {type(node.value).__name__}"
+            ),
+        )
+      case ast.Compare() if len(node.comparators) != 1:
+        self.report(node, SyntaxError("chained comparisons are not supported"))
+      case ast.Starred(ctx=ast.Store()):
+        self.report(
+            node, SyntaxError("starred expressions are not supported.")
+        )
+      case ast.For() if node.orelse:
+        self.report(
+            node,
+            SyntaxError(
+                "orelse blocks in for loops are not supported because break"
+                " is not supported."
+            ),
+        )
+      case ast.ImportFrom():
+        self.check_import(node)
+      case ast.ClassDef():
+        self.check_class_def(node)
+        for base in node.bases:
+          self.visit(base, unconditional)
+        return
+      case ast.AnnAssign():
+        # Annotations are types, not evaluated as expressions.
+        for child in (node.target, node.value):
+          if child is not None:
+            self.visit(child, unconditional)
+        return
+      case ast.Call():
+        if unconditional:
+          self.check_call(node)
+    self.visit_children(node, unconditional)
+
+  def visit_children(self, node: ast.AST, unconditional: bool) -> None:
+    match node:
+      case ast.If(test=first) | ast.IfExp(test=first) | ast.For(iter=first):
+        pass
+      case ast.BoolOp(values=[first, *_]):
+        pass
+      case _:
+        children_unconditional = unconditional and not isinstance(
+            node, _CONDITIONAL_NODES
+        )
+        for child in ast.iter_child_nodes(node):
+          self.visit(child, children_unconditional)
+        return
+    for child in ast.iter_child_nodes(node):
+      self.visit(child, unconditional and child is first)
+
+  def check_name(self, node: ast.Name) -> None:
+    if node.id in self.namespace.variables or node.id in self.assigned_names:
+      return
+    message = f"name '{node.id}' is not defined"
+    if hasattr(builtins, node.id):
+      message += f" (the Python built-in '{node.id}' is not available)"
+    self.report(node, NameError(message))
+
+  def check_import(self, node: ast.ImportFrom) -> None:
+    for alias in node.names:
+      if alias.name not in self.namespace.variables:
+        self.report(
+            node,
+            SyntaxError(
+                f"You can't import {alias.name}. Instead, use what you have"
+                " been provided as described in the system prompt, which you"
+                " can assume has already been imported."
+            ),
+        )
+        return
+
+  def check_class_def(self, node: ast.ClassDef) -> None:
+    if node.name in self.namespace.variables:
+      self.report(
+          node,
+          TypeError(
+              "You are trying to re-define the already existing class"
+              f" {node.name}. Use directly {node.name} without defining it"
+              " again."
+          ),
+      )
+      return
+    if (
+        not _has_dataclass_decorator(node)
+        and self.inherits_only_from(node, "BaseModel") is False
+    ):
+      self.report(
+          node,
+          SyntaxError("all class definitions must inherit from BaseModel."),
+      )
+      return
+    for field in node.body:
+      if not isinstance(field, ast.AnnAssign):
+        self.report(
+            field,
+            NotImplementedError(
+                "only field definitions are supported in class definitions."
+            ),
+        )
+        return
+      if not isinstance(field.target, ast.Name):
+        self.report(
+            field,
+            SyntaxError(
+                "cannot assign an attribute or a subscript in class"
+                " definitions.",
+            ),
+        )
+        return
+
+  def inherits_only_from(self, node: ast.ClassDef, name: str) -> bool | None:
+    """Returns whether the bases of `node` are all classes named `name`.
+
+    Args:
+      node: The class definition.
+      name: The name of the class.
+
+    Returns:
+      Whether the bases are as in `interpreter._check_bases`, or `None` if it
+      depends on the values computed by the program.
+    """
+    names = set()
+    for base in node.bases:
+      if not isinstance(base, ast.Name) or base.id in self.assigned_names:
+        return None
+      base_class = self.namespace.get(base.id)
+      if not isinstance(base_class, camel_value.CaMeLClass):
+        return None
+      names.add(base_class.raw.__name__)
+    return names == {name}
+
+  def check_call(self, node: ast.Call) -> None:
+    """Checks the security policy of a call to a tool, if it is certain."""
+    if (
+        not isinstance(node.func, ast.Name)
+        or node.func.id in self.assigned_names
+    ):
+      return
+    function = self.namespace.get(node.func.id)
+    engine = self.security_policy_engine
+    if (
+        not isinstance(function, camel_value.CaMeLFunction)
+        or function.receiver() is not None
+        or getattr(type(engine), "check_policy", None)
+        is not security_policy.SecurityPolicyEngine.check_policy
+    ):
+      return
+    compiled = security_policy.compile_policies(engine)
+    tool_name = function.name().raw
+    if tool_name in compiled.no_side_effect_tools:
+      return
+    policy = compiled.policy_for(tool_name)
+    if policy is None:
+      reason = "No security policy matched for tool. Defaulting to denial."
+    else:
+      kwargs = self.constant_arguments(node, function)
+      if kwargs is None or not security_policy.is_pure_policy(policy):
+        return
+      try:
+        policy_result = policy(tool_name, kwargs)
+      except Exception:  # pylint: disable=broad-except. # left to the interpreter
+        return
+      if not isinstance(policy_result, security_policy.Denied):
+        return
+      reason = policy_result.reason
+    self.report(
+        node,
+        security_policy.SecurityPolicyDeniedError(
+            f"Execution of tool '{tool_name}' denied: {reason}"
+        ),
+    )
+
+  def constant_arguments(
+      self, node: ast.Call, function: camel_value.CaMeLFunction[Any]
+  ) -> dict[str, camel_value.Value[Any]] | None:
+    """Returns the arguments of a call by keyword, if they are constants."""
+    args = [_constant_value(arg) for arg in node.args]
+    kwargs = {
+        keyword.arg: _constant_value(keyword.value)
+        for keyword in node.keywords
+    }
+    if any(v is None for v in (*args, *kwargs, *kwargs.values())):
+      return None
+    default_capabilities = camel_capabilities.Capabilities.default()
+    return function.make_args_by_keyword_preserve_values(
+        camel_value.CaMeLTuple(args, default_capabilities, ()),
+        camel_value.CaMeLDict(
+            {
+                camel_value.CaMeLStr.from_raw(k, default_capabilities, ()): v
+                for k, v in kwargs.items()
+            },
+            default_capabilities,
+            (),
+        ),
+    )
@@ -0,0 +1,250 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Profiling of the evaluations of the interpreter.
+
+When `EvalArgs.profile` is set, `parse_and_interpret_code` records a `Profile`
+of the evaluation, with a frame for each evaluated AST node (named after its
+type, e.g., `ListComp`), and, within them, frames for:
+
+- the security policy checks (`policy:<function>`),
+- the calls to tools (`tool:<name>`), built-ins (`builtin:<name>`), methods
+  (`method:<type>.<name>`, e.g., of `SUPPORTED_BUILT_IN_METHODS`) and classes
+  (`class:<name>`),
+- the conversions of the arguments of calls to Python values (`raw`), and of
+  their outputs to CaMeL values (`value_from_raw`).
+
+Each frame records its wall-clock time and the net number of objects tracked
+by the garbage collector (e.g., CaMeL values and containers) allocated during
+it. The profile can be summarized by frame name, or exported as collapsed
+stacks, the input format of flame graph tools (e.g., `flamegraph.pl` or
+speedscope).
+"""
+
+import contextlib
+import contextvars
+import dataclasses
+import gc
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+
+_collected_allocations = 0
+"""The allocations counted by the garbage collector before its collections."""
+
+
+def _on_gc(phase: str, info: dict[str, Any]) -> None:  # pylint: disable=unused-argument
+  global _collected_allocations
+  if phase == "start":
+    # Collections reset the count of the youngest generation.
+    _collected_allocations += gc.get_count()[0]
+
+
+_gc_callback_lock = threading.Lock()
+
+
+def _install_gc_callback() -> None:
+  with _gc_callback_lock:
+    if _on_gc not in gc.callbacks:
+      gc.callbacks.append(_on_gc)
+
+
+def _allocations() -> int:
+  """Returns the net number of objects tracked by the GC allocated so far."""
+  return _collected_allocations + gc.get_count()[0]
+
+
+@dataclasses.dataclass
+class FrameStats:
+  """The statistics of the frames with the same name."""
+
+  count: int = 0
+  """The number of frames."""
+  total_ns: int = 0
+  """The time spent in the frames, including their children, in nanoseconds.
+  Recursive frames are only counted once."""
+  self_ns: int = 0
+  """The time spent in the frames, excluding their children, in
+  nanoseconds."""
+  allocations: int = 0
+  """The net number of objects allocated in the frames, excluding their
+  children."""
+
+
+class _Frame:
+  __slots__ = ("path", "start_ns", "start_allocations", "children_ns",
+               "children_allocations")
+
+  def __init__(self, path: tuple[str, ...]) -> None:
+    self.path = path
+    self.children_ns = 0
+    self.children_allocations = 0
+    self.start_allocations = _allocations()
+    self.start_ns = time.perf_counter_ns()
+
+
+class Profile:
+  """The profile of an evaluation, possibly spanning several threads."""
+
+  def __init__(self) -> None:
+    _install_gc_callback()
+    self._local = threading.local()
+    self._lock = threading.Lock()
+    self._stats: dict[str, FrameStats] = {}
+    self._stacks: dict[tuple[str, ...], list[int]] = {}
+
+  def _stack(self) -> list[_Frame]:
+    stack = getattr(self._local, "stack", None)
+    if stack is None:
+      stack = self._local.stack = []
+    return stack
+
+  def enter(self, name: str) -> None:
+    """Starts a frame in the current thread."""
+    stack = self._stack()
+    stack.append(_Frame((*stack[-1].path, name) if stack else (name,)))
+
+  def exit(self) -> None:
+    """Ends the last frame started in the current thread."""
+    end_ns = time.perf_counter_ns()
+    end_allocations = _allocations()
+    stack = self._stack()
+    frame = stack.pop()
+    elapsed_ns = end_ns - frame.start_ns
+    allocations = end_allocations - frame.start_allocations
+    self_ns = elapsed_ns - frame.children_ns
+    self_allocations = allocations - frame.children_allocations
+    if stack:
+      stack[-1].children_ns += elapsed_ns
+      stack[-1].children_allocations += allocations
+    name = frame.path[-1]
+    recursive = name in frame.path[:-1]
+    with self._lock:
+      stats = self._stats.get(name)
+      if stats is None:
+        stats = self._stats[name] = FrameStats()
+      stats.count += 1
+      if not recursive:
+        stats.total_ns += elapsed_ns
+      stats.self_ns += self_ns
+      stats.allocations += self_allocations
+      weights = self._stacks.get(frame.path)
+      if weights is None:
+        weights = self._stacks[frame.path] = [0, 0]
+      weights[0] += self_ns
+      weights[1] += self_allocations
+
+  @contextlib.contextmanager
+  def frame(self, name: str) -> Iterator[None]:
+    self.enter(name)
+    try:
+      yield
+    finally:
+      self.exit()
+
+  @property
+  def stats(self) -> Mapping[str, FrameStats]:
+    """The statistics of the frames, by name."""
+    with self._lock:
+      return {
+          name: dataclasses.replace(stats)
+          for name, stats in self._stats.items()
+      }
+
+  def collapsed_stacks(self, weight: str = "time") -> str:
+    """Returns the profile as collapsed stacks, for flame graph tools.
+
+    Args:
+        weight: What the width of the frames stands for: `"time"`, in
+          microseconds, or `"allocations"`.
+
+    Returns:
+        One line per stack of frames, with the frames separated by `;` and
+        followed by the weight of the last frame, excluding its children.
+    """
+    if weight not in ("time", "allocations"):
+      raise ValueError(f"Unknown weight {weight!r}.")
+    with self._lock:
+      stacks = list(self._stacks.items())
+    lines = []
+    for path, (self_ns, self_allocations) in sorted(stacks):
+      value = self_ns // 1000 if weight == "time" else self_allocations
+      if value > 0:
+        lines.append(f"{';'.join(path)} {value}")
+    return "".join(f"{line}\n" for line in lines)
+
+  def write_flamegraph(self, path: str, weight: str = "time") -> None:
+    """Writes the collapsed stacks (see `collapsed_stacks`) to `path`."""
+    with open(path, "w", encoding="utf-8") as f:
+      f.write(self.collapsed_stacks(weight))
+
+  def summary(self, limit: int = 20) -> str:
+    """Returns a table of the frames with the most time of their own."""
+    stats = sorted(
+        self.stats.items(), key=lambda item: item[1].self_ns, reverse=True
+    )
+    lines = [
+        f"{'frame':<40} {'count':>8} {'total ms':>10} {'self ms':>10}"
+        f" {'allocs':>10}"
+    ]
+    for name, s in stats[:limit]:
+      lines.append(
+          f"{name[:40]:<40} {s.count:>8} {s.total_ns / 1e6:>10.2f}"
+          f" {s.self_ns / 1e6:>10.2f} {s.allocations:>10}"
+      )
+    return "\n".join(lines)
+
+
+_profile: contextvars.ContextVar[Profile | None] = contextvars.ContextVar(
+    "_profile", default=None
+)
+"""The profile of the evaluation running in the current context."""
+
+
+def current() -> Profile | None:
+  """Returns the profile of the running evaluation, if it is profiled."""
+  return _profile.get()
+
+
+@contextlib.contextmanager
+def profiled() -> Iterator[Profile]:
+  """Profiles the evaluations in the block.
+
+  Yields:
+      The profile the frames are recorded in (the one of the outer block, if
+      any).
+  """
+  profile = _profile.get()
+  if profile is not None:
+    yield profile
+    return
+  profile = Profile()
+  token = _profile.set(profile)
+  try:
+    yield profile
+  finally:
+    _profile.reset(token)
+
+
+_NO_FRAME = contextlib.nullcontext()
+
+
+def frame(name: str) -> contextlib.AbstractContextManager[None]:
+  """Returns a context recording a frame, if the evaluation is profiled."""
+  profile = _profile.get()
+  if profile is None:
+    return _NO_FRAME
+  return profile.frame(name)
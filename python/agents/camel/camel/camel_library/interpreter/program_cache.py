@@ -0,0 +1,102 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""LRU cache of the programs parsed from P-LLM code blocks.
+
+The P-LLM loop is retried when the code it generates fails (e.g., because a
+security policy denied a tool call), and the same code is often generated
+again. Caching the parsed modules avoids parsing it at each retry.
+
+Cached modules are evaluated again, possibly by several sessions at once. The
+interpreter doesn't change the structure of the AST, but it stores annotations
+on its nodes: the closures of the compiled backend, and the analyses of
+`call_scheduler`. These are deterministic per node (or keyed by the other
+nodes they are derived from), so concurrent evaluations compute equivalent
+annotations, and overwriting one with another is harmless.
+"""
+
+import ast
+import collections
+import hashlib
+import threading
+from typing import NamedTuple
+
+
+class CacheInfo(NamedTuple):
+  """Statistics of a `ProgramCache`, as `functools.lru_cache`'s."""
+
+  hits: int
+  misses: int
+  maxsize: int
+  currsize: int
+
+
+class ProgramCache:
+  """LRU cache of parsed modules, keyed by the hash of their code.
+
+  A cache can be shared by the executions of concurrent sessions, in several
+  threads.
+  """
+
+  def __init__(self, maxsize: int = 128) -> None:
+    self._maxsize = maxsize
+    self._modules: collections.OrderedDict[bytes, ast.Module] = (
+        collections.OrderedDict()
+    )
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+
+  def parse(self, code: str) -> ast.Module:
+    """Returns the module parsed from `code`, parsing it only on cache misses.
+
+    Args:
+        code: The code to parse.
+
+    Returns:
+        The parsed module.
+
+    Raises:
+        SyntaxError: if `code` can't be parsed. Such code is not cached.
+    """
+    key = hashlib.sha256(code.encode()).digest()
+    with self._lock:
+      module = self._modules.get(key)
+      if module is not None:
+        self._hits += 1
+        self._modules.move_to_end(key)
+        return module
+      self._misses += 1
+    # Parsed outside of the lock. If another thread parses the same code
+    # meanwhile, the module parsed last is kept.
+    module = ast.parse(code)
+    with self._lock:
+      self._modules[key] = module
+      self._modules.move_to_end(key)
+      if len(self._modules) > self._maxsize:
+        self._modules.popitem(last=False)
+    return module
+
+  def cache_info(self) -> CacheInfo:
+    with self._lock:
+      return CacheInfo(
+          self._hits, self._misses, self._maxsize, len(self._modules)
+      )
+
+  def clear(self) -> None:
+    """Empties the cache and resets its statistics."""
+    with self._lock:
+      self._modules.clear()
+      self._hits = 0
+      self._misses = 0
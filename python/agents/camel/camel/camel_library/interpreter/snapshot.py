@@ -0,0 +1,337 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Snapshots of interpreter namespaces.
+
+A snapshot contains the variables of a namespace that differ from a base
+namespace (e.g., the built-ins and the tools), with their capabilities and the
+graph of their dependencies, so that a namespace can be saved by a process and
+restored by another one (or restored several times, e.g., to retry from the
+same state).
+
+Snapshots are compressed pickles, so each object (e.g., a value several
+variables depend on, or capabilities shared by many values) is stored once, and
+references to it are indices in the pickle's table of objects. The values of the base
+namespace, and the Python callables they wrap (e.g., tools, which may be
+closures), are not stored, but referenced by name, and resolved in the base
+namespace when restoring. The same goes for the built-in methods. Classes
+defined by the P-LLM code, which can't be imported, are stored by their
+fields.
+
+Unpickling can run arbitrary code, so snapshots are signed with an HMAC of a
+key given by the caller, which must be kept off the storage of the snapshots
+(e.g., in the configuration of the processes restoring them): `loads` checks
+the signature before unpickling anything, so whoever can write to the storage
+but doesn't have the key can't make the interpreter run code.
+"""
+
+import dataclasses
+import hashlib
+import hmac
+import io
+import pickle
+import sys
+import types
+import zlib
+from typing import Any
+
+import pydantic
+
+from . import camel_value
+
+_PROTOCOL = 5
+
+_MAGIC = b"CaMeL\x02"
+"""Prefix of the snapshots, with the version of the format."""
+
+_DIGEST = hashlib.sha256
+_SIGNATURE_SIZE = _DIGEST().digest_size
+
+_COMPRESSION_LEVEL = 1
+"""The zlib compression level of the pickles, favoring speed."""
+
+
+class SnapshotError(Exception):
+  """The namespace can't be saved, or the snapshot can't be restored."""
+
+
+def _references(base: camel_value.Namespace) -> dict[int, tuple[Any, ...]]:
+  """Returns the references to the objects of `base`, by identity."""
+  references: dict[int, tuple[Any, ...]] = {}
+
+  def add(obj: Any, reference: tuple[Any, ...]) -> None:
+    references.setdefault(id(obj), reference)
+
+  add(base.variables, ("namespace",))
+  for name, value in base.variables.items():
+    add(value, ("variable", name))
+    if isinstance(value, camel_value.CaMeLCallable):
+      add(value.python_value, ("variable_raw", name))
+    if isinstance(value, camel_value.CaMeLClass):
+      for method_name, method in value.methods.items():
+        add(method, ("class_method", name, method_name))
+        add(method.python_value, ("class_method_raw", name, method_name))
+  for type_name, methods in camel_value.SUPPORTED_BUILT_IN_METHODS.items():
+    for method_name, method in methods.items():
+      add(method, ("method", type_name, method_name))
+      add(method.python_value, ("method_raw", type_name, method_name))
+  return references
+
+
+def _resolve(
+    base: camel_value.Namespace, reference: tuple[Any, ...]
+) -> Any:
+  """Returns the object of `base` referenced by `reference`."""
+  match reference:
+    case ("namespace",):
+      return base.variables
+    case ("variable", name):
+      return base.variables[name]
+    case ("variable_raw", name):
+      return base.variables[name].python_value
+    case ("class_method", name, method_name):
+      return base.variables[name].methods[method_name]
+    case ("class_method_raw", name, method_name):
+      return base.variables[name].methods[method_name].python_value
+    case ("method", type_name, method_name):
+      return camel_value.SUPPORTED_BUILT_IN_METHODS[type_name][method_name]
+    case ("method_raw", type_name, method_name):
+      return camel_value.SUPPORTED_BUILT_IN_METHODS[type_name][
+          method_name
+      ].python_value
+    case _:
+      raise SnapshotError(f"Invalid reference {reference!r}.")
+
+
+def _is_importable(cls: type[Any]) -> bool:
+  obj: Any = sys.modules.get(cls.__module__)
+  for name in cls.__qualname__.split("."):
+    obj = getattr(obj, name, None)
+  return obj is cls
+
+
+def _class_definition(cls: type[Any]) -> tuple[Any, ...] | None:
+  """Returns how to create again a class defined by P-LLM code."""
+  if issubclass(cls, pydantic.BaseModel):
+    fields = tuple(
+        (name, field.annotation) for name, field in cls.model_fields.items()
+    )
+    return ("model", cls.__module__, cls.__name__, fields)
+  if dataclasses.is_dataclass(cls):
+    fields = tuple((f.name, f.type) for f in dataclasses.fields(cls))
+    bases = tuple(
+        base
+        for base in cls.__bases__
+        if base is not object and not dataclasses.is_dataclass(base)
+    )
+    return ("dataclass", cls.__module__, cls.__name__, fields, bases)
+  return None
+
+
+def _define_class(definition: tuple[Any, ...]) -> type[Any]:
+  """Creates the class defined by `definition`, as the interpreter does."""
+  match definition:
+    case ("model", module, name, fields):
+      return pydantic.create_model(
+          name,
+          __module__=module,
+          **{k: (v, pydantic.Field()) for k, v in fields},
+      )
+    case ("dataclass", module, name, fields, bases):
+      return pydantic.dataclasses.dataclass(
+          dataclasses.make_dataclass(name, fields, bases=bases, module=module)
+      )
+    case _:
+      raise SnapshotError(f"Invalid class definition {definition!r}.")
+
+
+_PLAIN_TYPES = frozenset(
+    {str, int, float, bool, bytes, tuple, list, dict, set, frozenset}
+)
+"""Types of the objects that are never referenced."""
+
+
+class _Unset:
+  """Stands for the slots that are not set."""
+
+
+def _new_value(cls: type[camel_value.Value[Any]]) -> camel_value.Value[Any]:
+  return object.__new__(cls)
+
+
+def _set_slots(value: camel_value.Value[Any], slots: tuple[Any, ...]) -> None:
+  for name, slot in zip(
+      camel_value._instance_slots(type(value)),  # pylint: disable=protected-access
+      slots,
+  ):
+    if slot is not _Unset:
+      setattr(value, name, slot)
+
+
+class _Pickler(pickle.Pickler):
+  """Pickler referencing the objects of the base namespace."""
+
+  def __init__(self, file: io.BytesIO, base: camel_value.Namespace) -> None:
+    super().__init__(file, protocol=_PROTOCOL)
+    self._references = _references(base)
+    self._value_types: dict[type[Any], bool] = {}
+    self._importable_classes: set[type[Any]] = set()
+
+  def persistent_id(self, obj: Any) -> Any:
+    # Called for every object (before looking it up in the memo), so the
+    # common cases must be fast.
+    if type(obj) in _PLAIN_TYPES:
+      return None
+    reference = self._references.get(id(obj))
+    if reference is not None:
+      return reference
+    if isinstance(obj, types.MethodType):
+      # E.g., built-in methods bound to the raw value of their receiver.
+      function_reference = self._references.get(id(obj.__func__))
+      if function_reference is not None:
+        return ("bound", function_reference, obj.__self__)
+    elif isinstance(obj, type) and obj not in self._importable_classes:
+      definition = None if _is_importable(obj) else _class_definition(obj)
+      if definition is None:
+        self._importable_classes.add(obj)
+        return None
+      # The ID makes sure the class is created once per snapshot. The
+      # reference is stored so that it is only pickled once too.
+      reference = ("class", id(obj), definition)
+      self._references[id(obj)] = reference
+      return reference
+    return None
+
+  def reducer_override(self, obj: Any) -> Any:
+    # Values are stored as their slots, without the names of the slots. The
+    # slots are set after the value is created, as they can refer to it.
+    obj_type = type(obj)
+    is_value = self._value_types.get(obj_type)
+    if is_value is None:
+      # `Value` is a protocol, so `isinstance` checks are slow.
+      is_value = isinstance(obj, camel_value.Value) and not isinstance(
+          obj, type
+      )
+      self._value_types[obj_type] = is_value
+    if not is_value:
+      return NotImplemented
+    slots = tuple(
+        getattr(obj, name, _Unset)
+        for name in camel_value._instance_slots(type(obj))  # pylint: disable=protected-access
+    )
+    return _new_value, (type(obj),), slots, None, None, _set_slots
+
+
+class _Unpickler(pickle.Unpickler):
+  """Unpickler resolving the references to the base namespace."""
+
+  def __init__(self, file: io.BytesIO, base: camel_value.Namespace) -> None:
+    super().__init__(file)
+    self._base = base
+    self._classes: dict[int, type[Any]] = {}
+
+  def persistent_load(self, pid: Any) -> Any:
+    match pid:
+      case ("bound", function_reference, receiver):
+        return types.MethodType(
+            _resolve(self._base, function_reference), receiver
+        )
+      case ("class", class_id, definition):
+        if class_id not in self._classes:
+          self._classes[class_id] = _define_class(definition)
+        return self._classes[class_id]
+      case _:
+        return _resolve(self._base, pid)
+
+
+def _sign(payload: bytes, key: bytes) -> bytes:
+  if not key:
+    raise SnapshotError("Snapshots must be signed with a non-empty key.")
+  return hmac.new(key, _MAGIC + payload, _DIGEST).digest()
+
+
+def dumps(
+    namespace: camel_value.Namespace, base: camel_value.Namespace, key: bytes
+) -> bytes:
+  """Returns a snapshot of the variables of `namespace` that are not in `base`.
+
+  Args:
+    namespace: The namespace to save.
+    base: The namespace `namespace` was derived from (e.g., with the built-ins
+      and the tools). Its values are referenced by name.
+    key: The secret key the snapshot is signed with.
+
+  Returns:
+    The snapshot.
+
+  Raises:
+    SnapshotError: If a value can't be saved.
+  """
+  changed = {
+      name: value
+      for name, value in namespace.variables.items()
+      if base.variables.get(name) is not value
+  }
+  removed = [name for name in base.variables if name not in namespace.variables]
+  file = io.BytesIO()
+  try:
+    _Pickler(file, base).dump((changed, removed))
+  except (pickle.PicklingError, TypeError, AttributeError) as e:
+    raise SnapshotError(f"The namespace can't be saved: {e}") from e
+  payload = zlib.compress(file.getvalue(), _COMPRESSION_LEVEL)
+  return _MAGIC + _sign(payload, key) + payload
+
+
+def loads(
+    data: bytes, base: camel_value.Namespace, key: bytes
+) -> camel_value.Namespace:
+  """Restores a namespace saved by `dumps`.
+
+  Args:
+    data: The snapshot.
+    base: A namespace with the same variables as the base namespace the
+      snapshot was made with (e.g., created in the same way by another
+      process).
+    key: The key the snapshot was signed with.
+
+  Returns:
+    A new namespace with the variables of the snapshot. The restored values
+    are independent of the ones that were saved, so the same snapshot can be
+    restored several times.
+
+  Raises:
+    SnapshotError: If the snapshot can't be restored, or if it was not signed
+      with `key` (in which case nothing is unpickled).
+  """
+  if not data.startswith(_MAGIC):
+    raise SnapshotError("The data is not a snapshot, or has another version.")
+  signature = data[len(_MAGIC) : len(_MAGIC) + _SIGNATURE_SIZE]
+  payload = data[len(_MAGIC) + _SIGNATURE_SIZE :]
+  if not hmac.compare_digest(signature, _sign(payload, key)):
+    raise SnapshotError(
+        "The snapshot was not signed with the key, or was modified."
+    )
+  try:
+    changed, removed = _Unpickler(
+        io.BytesIO(zlib.decompress(payload)), base
+    ).load()
+  except (
+      pickle.UnpicklingError,
+      zlib.error,
+      KeyError,
+      AttributeError,
+      EOFError,
+  ) as e:
+    raise SnapshotError(f"The snapshot can't be restored: {e}") from e
+  return base.remove_variables(removed).add_variables(changed)
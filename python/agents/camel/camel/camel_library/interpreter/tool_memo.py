@@ -0,0 +1,136 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memo of the calls to tools without side effects, shared by evaluations.
+
+When the code generated by the P-LLM fails halfway, the P-LLM loop is retried,
+and the new code usually makes the same calls to tools without side effects
+(i.e., in the `no_side_effect_tools` of the security policy engine) with the
+same arguments. When `EvalArgs.tool_memo` is set, the raw outputs of these
+calls are stored in it, and later calls with the same tool name and raw
+arguments (e.g., in the next retry of the same turn) reuse them instead of
+calling the tool again.
+
+Only the call of the Python function is skipped: the call is checked against
+the security policies and recorded in the tool calls chain as usual, and the
+output is wrapped with the arguments of the new call, so that it has the
+capabilities and dependencies it would have if the tool was called again.
+
+Calling any other tool (which may have side effects, e.g., sending an email or
+deleting a file) invalidates the memo, so that the later calls, in the same
+evaluation or in the next retries, see the changes.
+"""
+
+import collections
+from collections.abc import Mapping
+import copy
+import threading
+from typing import Any
+
+from . import program_cache
+
+CacheInfo = program_cache.CacheInfo
+
+_Key = tuple[str, str]
+
+
+def _key(tool_name: str, args: Mapping[str, Any]) -> _Key:
+  # Raw arguments can be unhashable (e.g., lists), so they are keyed by their
+  # representation, and compared when found.
+  return tool_name, repr(sorted(args.items()))
+
+
+class ToolMemo:
+  """LRU memo of the raw outputs of tool calls, by tool name and arguments.
+
+  A memo is meant to be shared by the evaluations of one turn of a
+  conversation: the tools are called again in the next turns, when their
+  outputs may have changed (e.g., new emails).
+  """
+
+  def __init__(self, maxsize: int = 256) -> None:
+    self._maxsize = maxsize
+    self._outputs: collections.OrderedDict[
+        _Key, tuple[dict[str, Any], Any]
+    ] = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+
+  def get(
+      self, tool_name: str, args: Mapping[str, Any]
+  ) -> tuple[bool, Any]:
+    """Returns the output of an earlier call with the same arguments, if any.
+
+    Args:
+        tool_name: The name of the tool.
+        args: The raw arguments of the call, by keyword (as recorded in
+          `FunctionCall.args`).
+
+    Returns:
+        Whether the call was found, and a copy of its raw output if so, which
+        the caller can mutate.
+    """
+    key = _key(tool_name, args)
+    with self._lock:
+      entry = self._outputs.get(key)
+      if entry is None or entry[0] != args:
+        self._misses += 1
+        return False, None
+      self._hits += 1
+      self._outputs.move_to_end(key)
+    return True, copy.deepcopy(entry[1])
+
+  def contains(self, tool_name: str, args: Mapping[str, Any]) -> bool:
+    """Returns whether `get` would find the call, without counting a hit."""
+    with self._lock:
+      entry = self._outputs.get(_key(tool_name, args))
+      return entry is not None and entry[0] == args
+
+  def put(self, tool_name: str, args: Mapping[str, Any], output: Any) -> None:
+    """Stores the raw output of a call.
+
+    Args:
+        tool_name: The name of the tool.
+        args: The raw arguments of the call, by keyword.
+        output: The raw output of the call. It is copied, so that mutating the
+          values wrapping it doesn't change the output of later calls.
+    """
+    if not self._maxsize:
+      return
+    key = _key(tool_name, args)
+    entry = (copy.deepcopy(dict(args)), copy.deepcopy(output))
+    with self._lock:
+      self._outputs[key] = entry
+      self._outputs.move_to_end(key)
+      if len(self._outputs) > self._maxsize:
+        self._outputs.popitem(last=False)
+
+  def cache_info(self) -> CacheInfo:
+    with self._lock:
+      return CacheInfo(
+          self._hits, self._misses, self._maxsize, len(self._outputs)
+      )
+
+  def invalidate(self) -> None:
+    """Forgets the outputs, as a tool with side effects may change them."""
+    with self._lock:
+      self._outputs.clear()
+
+  def clear(self) -> None:
+    """Empties the memo and resets its statistics."""
+    with self._lock:
+      self._outputs.clear()
+      self._hits = 0
+      self._misses = 0
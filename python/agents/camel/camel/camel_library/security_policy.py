@@ -14,14 +14,22 @@
 
 """Security policies for tools."""
 
+import collections
 import collections.abc
 import dataclasses
 import fnmatch
+import os
+import threading
 import typing
+from typing import Any
+import weakref
 
 from .capabilities import readers
 from .capabilities import utils as capabilities_utils
 from .interpreter import camel_value
+from .interpreter import program_cache
+
+CacheInfo = program_cache.CacheInfo
 
 
 @dataclasses.dataclass(frozen=True)
@@ -52,6 +60,37 @@ class SecurityPolicy(typing.Protocol):
     ...
 
 
+_PURE_POLICY_ATTR = "_camel_pure_policy"
+
+_SecurityPolicyT = typing.TypeVar("_SecurityPolicyT", bound=typing.Callable)
+
+
+def pure_policy(policy: _SecurityPolicyT) -> _SecurityPolicyT:
+  """Declares that the decisions of `policy` can be cached.
+
+  A policy is pure if its result only depends on the tool name and on the
+  arguments (including their capabilities and dependencies), and not, e.g., on
+  the time or on some state of the engine. The decisions of pure policies are
+  reused for calls with the same tool name and argument values, as long as the
+  values have not been mutated since.
+
+  Can be used as a decorator, including on methods.
+
+  Args:
+    policy: The policy.
+
+  Returns:
+    `policy`, marked as pure.
+  """
+  setattr(policy, _PURE_POLICY_ATTR, True)
+  return policy
+
+
+def is_pure_policy(policy: SecurityPolicy) -> bool:
+  """Returns whether `policy` was declared pure with `pure_policy`."""
+  return getattr(policy, _PURE_POLICY_ATTR, False)
+
+
 NO_SIDE_EFFECT_TOOLS = frozenset({
     # Query AI assistant function
     "query_ai_assistant",
@@ -87,12 +126,216 @@ def base_security_policy(
 class SecurityPolicyDeniedError(Exception):
   ...
 
+
+_DecisionKey = tuple[str, tuple[tuple[str, int], ...]]
+
+
+@dataclasses.dataclass(frozen=True)
+class _Decision:
+  values: tuple[weakref.ref[Any], ...]
+  epoch: int | None
+  """The mutation epoch the decision was made at, or `None` if the arguments
+  can't change."""
+  result: SecurityPolicyResult
+
+
+class CompiledPolicies:
+  """Dispatch table of the policies of an engine.
+
+  Resolving the policy of a tool tries each `(pattern, policy)` pair in order,
+  so it is only done once per tool name: names without wildcards are indexed
+  when compiling, and the result for each tool name is stored. The decisions of
+  pure policies (see `pure_policy`) are cached by tool name and identity of the
+  arguments.
+  """
+
+  def __init__(
+      self,
+      policies: collections.abc.Sequence[tuple[str, SecurityPolicy]],
+      no_side_effect_tools: collections.abc.Collection[str],
+      decision_cache_size: int = 1024,
+  ) -> None:
+    """Compiles the policies.
+
+    Args:
+        policies: The `(pattern, policy)` pairs, in order of priority. Patterns
+          are matched as with `fnmatch.fnmatch`.
+        no_side_effect_tools: The names of the tools without side effects.
+        decision_cache_size: The maximum number of cached decisions. `0`
+          disables the cache.
+    """
+    self.policies = tuple(policies)
+    self.no_side_effect_tools = frozenset(no_side_effect_tools)
+    self._exact: dict[str, int] = {}
+    self._patterns: list[tuple[int, str]] = []
+    for index, (pattern, _) in enumerate(self.policies):
+      pattern = os.path.normcase(pattern)
+      if any(c in pattern for c in "*?["):
+        self._patterns.append((index, pattern))
+      else:
+        self._exact.setdefault(pattern, index)
+    self._resolved: dict[str, SecurityPolicy | None] = {}
+    self._decision_cache_size = decision_cache_size
+    self._decisions: collections.OrderedDict[_DecisionKey, _Decision] = (
+        collections.OrderedDict()
+    )
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+
+  def compiled_from(
+      self,
+      policies: collections.abc.Sequence[tuple[str, SecurityPolicy]],
+      no_side_effect_tools: collections.abc.Collection[str],
+  ) -> bool:
+    """Returns whether the table was compiled from the given contents.
+
+    The contents are compared, in O(#policies): `compile_policies` only calls
+    this when the engine's collections are not the immutable copies the table
+    was compiled from.
+
+    Args:
+        policies: The policies of the engine.
+        no_side_effect_tools: The names of the tools without side effects.
+
+    Returns:
+        Whether the table is up to date.
+    """
+    return (
+        tuple(policies) == self.policies
+        and frozenset(no_side_effect_tools) == self.no_side_effect_tools
+    )
+
+  def policy_for(self, tool_name: str) -> SecurityPolicy | None:
+    """Returns the first policy whose pattern matches `tool_name`, if any."""
+    try:
+      return self._resolved[tool_name]
+    except KeyError:
+      pass
+    name = os.path.normcase(tool_name)
+    match_index = self._exact.get(name, len(self.policies))
+    for index, pattern in self._patterns:
+      if index >= match_index:
+        break
+      if fnmatch.fnmatchcase(name, pattern):
+        match_index = index
+        break
+    policy = (
+        self.policies[match_index][1]
+        if match_index < len(self.policies)
+        else None
+    )
+    self._resolved[tool_name] = policy
+    return policy
+
+  def check(
+      self,
+      policy: SecurityPolicy,
+      tool_name: str,
+      kwargs: collections.abc.Mapping[str, camel_value.Value],
+  ) -> SecurityPolicyResult:
+    """Runs `policy`, or returns its cached decision if it is pure.
+
+    Args:
+        policy: The policy of the tool, as returned by `policy_for`.
+        tool_name: The name of the tool being called.
+        kwargs: The arguments to the tool.
+
+    Returns:
+        The result of the security policy check.
+    """
+    if not self._decision_cache_size or not is_pure_policy(policy):
+      return policy(tool_name, kwargs)
+    key = (tool_name, tuple((name, id(v)) for name, v in kwargs.items()))
+    epoch = camel_value.mutation_epoch()
+    with self._lock:
+      decision = self._decisions.get(key)
+      if (
+          decision is not None
+          and decision.epoch in (None, epoch)
+          and all(
+              ref() is v for ref, v in zip(decision.values, kwargs.values())
+          )
+      ):
+        self._decisions.move_to_end(key)
+        self._hits += 1
+        return decision.result
+      self._misses += 1
+    policy_result = policy(tool_name, kwargs)
+    try:
+      values = tuple(weakref.ref(v) for v in kwargs.values())
+    except TypeError:
+      return policy_result  # Values that can't be weakly referenced.
+    can_change = any(map(capabilities_utils.can_change, kwargs.values()))
+    with self._lock:
+      self._decisions[key] = _Decision(
+          values, epoch if can_change else None, policy_result
+      )
+      self._decisions.move_to_end(key)
+      if len(self._decisions) > self._decision_cache_size:
+        self._decisions.popitem(last=False)
+    return policy_result
+
+  def cache_info(self) -> CacheInfo:
+    """Returns the statistics of the decision cache."""
+    with self._lock:
+      return CacheInfo(
+          self._hits,
+          self._misses,
+          self._decision_cache_size,
+          len(self._decisions),
+      )
+
+
+_COMPILED_POLICIES_ATTR = "_camel_compiled_policies"
+
+
+def compile_policies(engine: "SecurityPolicyEngine") -> CompiledPolicies:
+  """Returns the dispatch table of the policies of `engine`.
+
+  The table is compiled on first use and stored on the engine, whose
+  `policies` and `no_side_effect_tools` are replaced by the tuple and the
+  frozenset the table is compiled from. Hence, they can't be modified in place
+  afterwards, only replaced, and checking that the table is up to date is
+  O(1). It is compiled again when they are replaced by other contents.
+
+  Args:
+    engine: The security policy engine.
+
+  Returns:
+    The compiled policies of `engine`.
+  """
+  compiled = getattr(engine, _COMPILED_POLICIES_ATTR, None)
+  policies, no_side_effect_tools = engine.policies, engine.no_side_effect_tools
+  if (
+      compiled is not None
+      and policies is compiled.policies
+      and no_side_effect_tools is compiled.no_side_effect_tools
+  ):
+    return compiled
+  if compiled is None or not compiled.compiled_from(
+      policies, no_side_effect_tools
+  ):
+    compiled = CompiledPolicies(policies, no_side_effect_tools)
+    setattr(engine, _COMPILED_POLICIES_ATTR, compiled)
+  try:
+    engine.policies = compiled.policies
+    engine.no_side_effect_tools = compiled.no_side_effect_tools
+  except AttributeError:
+    pass  # E.g., properties, which are compared by contents at each check.
+  return compiled
+
+
 @typing.runtime_checkable
 class SecurityPolicyEngine(typing.Protocol):
   """Protocol for a Security policy engine."""
 
-  policies: list[tuple[str, SecurityPolicy]]
-  no_side_effect_tools: set[str]
+  policies: collections.abc.Sequence[tuple[str, SecurityPolicy]]
+  """The `(pattern, policy)` pairs, in order of priority. Replaced by a tuple
+  when the policies are first checked (see `compile_policies`)."""
+  no_side_effect_tools: collections.abc.Collection[str]
+  """The names of the tools without side effects. Replaced by a frozenset when
+  the policies are first checked."""
 
   def check_policy(
       self,
@@ -102,8 +345,8 @@ class SecurityPolicyEngine(typing.Protocol):
   ) -> SecurityPolicyResult:
     """Checks if the tool is allowed to be executed with the given data.
 
-    Policies in `POLICIES` are evaluated in order. If any evaluates to
-    Allowed(), then the tool is executed.
+    The first policy in `policies` whose pattern matches the tool name is
+    evaluated. If it evaluates to Allowed(), then the tool is executed.
 
     Args:
         tool_name: The name of the tool being called.
@@ -113,7 +356,8 @@ class SecurityPolicyEngine(typing.Protocol):
     Returns:
         The result of the security policy check.
     """
-    if tool_name in self.no_side_effect_tools:
+    compiled = compile_policies(self)
+    if tool_name in compiled.no_side_effect_tools:
       return Allowed()
     non_public_variables = [
         d.raw for d in dependencies if not capabilities_utils.is_public(d)
@@ -123,10 +367,12 @@ class SecurityPolicyEngine(typing.Protocol):
           f"{tool_name} is state-changing and depends on private values"
           f" {non_public_variables}."
       )
-    for policy_name, policy in self.policies:
-      if fnmatch.fnmatch(tool_name, policy_name):
-        return policy(tool_name, kwargs)
-    return Denied("No security policy matched for tool. Defaulting to denial.")
+    policy = compiled.policy_for(tool_name)
+    if policy is None:
+      return Denied(
+          "No security policy matched for tool. Defaulting to denial."
+      )
+    return compiled.check(policy, tool_name, kwargs)
 
 
 class NoSecurityPolicyEngine(SecurityPolicyEngine):
@@ -143,3 +389,28 @@ class NoSecurityPolicyEngine(SecurityPolicyEngine):
       dependencies: collections.abc.Iterable[camel_value.Value],
   ) -> SecurityPolicyResult:
     return Allowed()
+
+
+def always_allows(engine: SecurityPolicyEngine, tool_name: str) -> bool:
+  """Returns whether `engine` allows all calls to `tool_name`.
+
+  This is only known for the engines which don't override `check_policy`, for
+  the tools without side effects, and for `NoSecurityPolicyEngine`. Other
+  engines may decide depending on the arguments, the dependencies, or their
+  own state at the time of the call.
+
+  Args:
+      engine: The security policy engine.
+      tool_name: The name of the tool.
+
+  Returns:
+      Whether all calls to the tool are allowed, whatever their arguments and
+      dependencies.
+  """
+  check_policy = type(engine).check_policy
+  if check_policy is NoSecurityPolicyEngine.check_policy:
+    return True
+  return (
+      check_policy is SecurityPolicyEngine.check_policy
+      and tool_name in compile_policies(engine).no_side_effect_tools
+  )
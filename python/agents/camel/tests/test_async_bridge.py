@@ -0,0 +1,155 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the bridge between the interpreter and asynchronous tools."""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import library
+import pytest
+
+
+class _Tools:
+  """Tools recording their calls."""
+
+  def __init__(self) -> None:
+    self.calls = []
+    self.cancelled = []
+
+  async def fetch(self, url: str) -> str:
+    """Waits for a page which never comes."""
+    self.calls.append(f"fetch {url}")
+    try:
+      await asyncio.sleep(60)
+    except asyncio.CancelledError:
+      self.cancelled.append(url)
+      raise
+    return url
+
+  def tick(self, i: int) -> int:
+    """Blocks the worker thread for a while."""
+    self.calls.append(f"tick {i}")
+    time.sleep(0.01)
+    return i
+
+  def namespace(self) -> camel_value.Namespace:
+    return library.make_builtins_namespace({
+        f.__name__: camel_value.CaMeLFunction(
+            f.__name__, f, capabilities.Capabilities.camel(), ()
+        )
+        for f in (self.fetch, self.tick)
+    })
+
+
+async def _run_cancelled(tools: _Tools, code: str, timeout: float) -> None:
+  """Runs `code`, cancels it after `timeout`, and waits for the worker."""
+  executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+  try:
+    with pytest.raises(TimeoutError):
+      await asyncio.wait_for(
+          interpreter.parse_and_interpret_code_async(
+              f"```python\n{code}\n```",
+              tools.namespace(),
+              [],
+              (),
+              interpreter.EvalArgs(
+                  security_policy.NoSecurityPolicyEngine(),
+                  interpreter.DependenciesPropagationMode.NORMAL,
+              ),
+              executor=executor,
+          ),
+          timeout,
+      )
+  finally:
+    # Waits for the worker thread to stop, on another thread so that the
+    # loop can cancel the awaited tools meanwhile.
+    await asyncio.to_thread(executor.shutdown)
+
+
+def test_cancellation_cancels_the_awaited_tool_and_stops_the_evaluation():
+  tools = _Tools()
+
+  asyncio.run(
+      _run_cancelled(tools, 'page = fetch("a")\ntick(0)\nfetch("b")', 0.2)
+  )
+
+  assert tools.calls == ["fetch a"]
+  assert tools.cancelled == ["a"]
+
+
+def test_cancellation_stops_the_evaluation_between_statements():
+  tools = _Tools()
+
+  asyncio.run(
+      _run_cancelled(tools, "for i in range(1000):\n    tick(i)", 0.1)
+  )
+  calls = len(tools.calls)
+  time.sleep(0.1)
+
+  assert calls < 1000
+  assert len(tools.calls) == calls
+
+
+class _LoopTools:
+  """A tool recording the loops it is awaited on."""
+
+  def __init__(self) -> None:
+    self.loops = []
+
+  async def fetch(self, url: str) -> str:
+    self.loops.append(asyncio.get_running_loop())
+    return url
+
+  def namespace(self) -> camel_value.Namespace:
+    return library.make_builtins_namespace({
+        "fetch": camel_value.CaMeLFunction(
+            "fetch", self.fetch, capabilities.Capabilities.camel(), ()
+        )
+    })
+
+
+def _run(tools: _LoopTools, code: str) -> interpreter.EvalResult:
+  return interpreter.parse_and_interpret_code(
+      f"```python\n{code}\n```",
+      tools.namespace(),
+      [],
+      (),
+      interpreter.EvalArgs(
+          security_policy.NoSecurityPolicyEngine(),
+          interpreter.DependenciesPropagationMode.NORMAL,
+      ),
+  )
+
+
+def test_synchronous_evaluations_share_one_helper_loop():
+  tools = _LoopTools()
+  _run(tools, 'a = fetch("a")\nb = fetch("b")')
+  threads = threading.active_count()
+
+  async def run_from_loop() -> None:
+    _run(tools, 'c = fetch("c")')
+
+  asyncio.run(run_from_loop())
+  _run(tools, 'd = fetch("d")')
+
+  assert len(tools.loops) == 4
+  assert len(set(tools.loops)) == 1
+  assert threading.active_count() == threads
@@ -0,0 +1,133 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the tool calls started ahead of program order."""
+
+from collections.abc import Iterable, Mapping
+import threading
+from typing import Any
+
+from benchmarks import workspace
+from camel.camel_library import result
+from camel.camel_library import security_policy
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+import pytest
+
+
+class _Workspace(workspace.Workspace):
+  """A workspace recording the searches, which can wait for each other."""
+
+  def __init__(self, barrier: threading.Barrier | None = None) -> None:
+    super().__init__(10)
+    self.queries = []
+    self._barrier = barrier
+
+  def search_emails(self, query: str) -> list[workspace.Email]:
+    """Returns the emails whose subject or body contains `query`."""
+    self.queries.append(query)
+    if self._barrier is not None:
+      self._barrier.wait()
+    return super().search_emails(query)
+
+
+class _OneSearchEngine(workspace.SecurityPolicyEngine):
+  """Denies the searches after the first one."""
+
+  def __init__(self, tools: _Workspace) -> None:
+    super().__init__()
+    self._tools = tools
+
+  def check_policy(
+      self,
+      tool_name: str,
+      kwargs: Mapping[str, camel_value.Value[Any]],
+      dependencies: Iterable[camel_value.Value[Any]],
+  ) -> security_policy.SecurityPolicyResult:
+    if tool_name == "search_emails" and self._tools.queries:
+      return security_policy.Denied("Only one search is allowed.")
+    return super().check_policy(tool_name, kwargs, dependencies)
+
+
+def _run(
+    code: str,
+    tools: _Workspace,
+    engine: security_policy.SecurityPolicyEngine | None = None,
+) -> interpreter.EvalResult:
+  return interpreter.parse_and_interpret_code(
+      f"```python\n{code}\n```",
+      tools.namespace(),
+      [],
+      (),
+      interpreter.EvalArgs(
+          engine or workspace.SecurityPolicyEngine(),
+          interpreter.DependenciesPropagationMode.NORMAL,
+          parallel_tool_calls=True,
+      ),
+  )
+
+
+@pytest.mark.parametrize(
+    "failing_statement", ["y = undefined_name", 'raise ValueError("boom")']
+)
+def test_no_call_is_made_after_a_failing_statement(failing_statement):
+  tools = _Workspace()
+
+  eval_result = _run(
+      f"""\
+x = 1
+{failing_statement}
+emails = search_emails("Project")
+subjects = [search_emails(s) for s in ["a", "b"]]
+""",
+      tools,
+  )
+
+  assert isinstance(eval_result.result, result.Error)
+  assert not tools.queries
+
+
+def test_calls_of_a_comprehension_run_concurrently():
+  # Each search waits for the two others, so the comprehension only completes
+  # if the three searches run at once.
+  tools = _Workspace(threading.Barrier(3, timeout=10))
+
+  eval_result = _run(
+      'results = [search_emails(q) for q in ["Project 1", "Project 2", "x"]]',
+      tools,
+  )
+
+  assert isinstance(eval_result.result, result.Ok)
+  assert sorted(tools.queries) == ["Project 1", "Project 2", "x"]
+  assert [len(r) for r in eval_result.namespace.variables["results"].raw] == [
+      2,
+      2,
+      0,
+  ]
+
+
+def test_calls_are_not_started_if_the_engine_overrides_check_policy():
+  tools = _Workspace()
+
+  with pytest.raises(security_policy.SecurityPolicyDeniedError):
+    _run(
+        """\
+first = search_emails("Project 1")
+second = search_emails("Project 2")
+""",
+        tools,
+        _OneSearchEngine(tools),
+    )
+
+  assert tools.queries == ["Project 1"]
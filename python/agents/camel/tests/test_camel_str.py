@@ -0,0 +1,145 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the provenance of the characters of strings."""
+
+from camel.camel_library import result
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.capabilities import readers
+from camel.camel_library.capabilities import sources
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import library
+import pydantic
+import pytest
+
+_CAMEL = capabilities.Capabilities.camel()
+
+
+def _str(string: str, tool_name: str) -> camel_value.CaMeLStr:
+  return camel_value.CaMeLStr.from_raw(
+      string,
+      capabilities.Capabilities.canonical(
+          frozenset({sources.Tool(tool_name)}), readers.Public()
+      ),
+      (),
+  )
+
+
+def _provenance(string: camel_value.CaMeLStr) -> str:
+  """Returns the first letter of the source of each character of `string`."""
+  letters = []
+  for char in string.iterate_python():
+    (source,) = char.capabilities.sources_set
+    match source:
+      case sources.Tool(tool_name=name):
+        letters.append(name[0])
+      case sources.SourceEnum():
+        letters.append(source.name[0].lower())
+  return "".join(letters)
+
+
+def _call(
+    method: str, receiver: camel_value.CaMeLStr, *args: camel_value.Value
+) -> camel_value.Value:
+  # As in the interpreter, the receiver is passed as first argument.
+  output, _ = receiver.attr(method).call(
+      camel_value.CaMeLTuple((receiver, *args), _CAMEL, ()),
+      camel_value.CaMeLDict({}, _CAMEL, ()),
+      camel_value.Namespace(),
+  )
+  return output
+
+
+def test_join_keeps_the_provenance_of_the_separator_and_the_strings():
+  strings = camel_value.CaMeLList(
+      [_str("ab", "a"), _str("", "b"), _str("cd", "c")], _CAMEL, ()
+  )
+
+  joined = _call("join", _str(", ", "s"), strings)
+
+  assert joined.raw == "ab, , cd"
+  assert _provenance(joined) == "aasssscc"
+
+
+def test_join_of_a_string_keeps_the_provenance_of_its_characters():
+  joined = _call("join", _str("-", "s"), _str("xy", "a").add(_str("z", "b")))
+
+  assert joined.raw == "x-y-z"
+  assert _provenance(joined) == "asasb"
+
+
+@pytest.mark.parametrize(
+    "old, count, expected_string, expected_provenance",
+    [
+        ("o", -1, "hellOO wOOrld", "aaaannabnnbbb"),
+        ("o", 1, "hellOO world", "aaaannabbbbb"),
+        ("lo w", -1, "helOOorld", "aaannbbbb"),
+        ("", 2, "OOhOOello world", "nnannaaaaabbbbb"),
+        ("x", -1, "hello world", "aaaaaabbbbb"),
+    ],
+)
+def test_replace_keeps_the_provenance_of_the_string_and_the_replacement(
+    old, count, expected_string, expected_provenance
+):
+  string = _str("hello ", "a").add(_str("world", "b"))
+  args = (_str(old, "o"), _str("OO", "n"))
+  if count >= 0:
+    args += (camel_value.CaMeLInt(count, _CAMEL, ()),)
+
+  replaced = _call("replace", string, *args)
+
+  assert replaced.raw == expected_string
+  assert _provenance(replaced) == expected_provenance
+
+
+class Email(pydantic.BaseModel):
+  subject: str
+
+
+def search_emails(query: str) -> list[Email]:
+  return [Email(subject=f"{query} {i} update {i}") for i in range(2)]
+
+
+def test_join_and_replace_in_programs():
+  namespace = library.make_builtins_namespace({
+      "search_emails": camel_value.CaMeLFunction(
+          "search_emails", search_emails, _CAMEL, ()
+      ),
+      "Email": camel_value.CaMeLClass("Email", Email, _CAMEL, (), {}),
+  })
+
+  eval_result = interpreter.parse_and_interpret_code(
+      """```python
+emails = search_emails("Project")
+joined = " / ".join([e.subject for e in emails])
+replaced = joined.replace(" update ", "#", 1)
+```""",
+      namespace,
+      [],
+      (),
+      interpreter.EvalArgs(
+          security_policy.NoSecurityPolicyEngine(),
+          interpreter.DependenciesPropagationMode.NORMAL,
+      ),
+  )
+
+  assert isinstance(eval_result.result, result.Ok)
+  variables = eval_result.namespace.variables
+  # The fields of the emails come from CaMeL, the constants from the user.
+  assert variables["joined"].raw == "Project 0 update 0 / Project 1 update 1"
+  assert _provenance(variables["joined"]) == "c" * 18 + "uuu" + "c" * 18
+  assert variables["replaced"].raw == "Project 0#0 / Project 1 update 1"
+  assert _provenance(variables["replaced"]) == "c" * 9 + "uc" + "uuu" + "c" * 18
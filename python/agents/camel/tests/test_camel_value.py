@@ -0,0 +1,102 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the conversion of tools' outputs to CaMeL values."""
+
+from camel.camel_library import result
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.capabilities import utils as capabilities_utils
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import library
+import pydantic
+
+_OWNER = "me@example.com"
+
+
+class Email(pydantic.BaseModel):
+  subject: str
+  recipients: list[str]
+
+
+class _Inbox:
+  """An inbox whose tools return and mutate the same email object."""
+
+  def __init__(self) -> None:
+    self.email = Email(subject="Hi", recipients=[_OWNER])
+
+  def get_email(self) -> Email:
+    return self.email
+
+  def forward_email(self, to: str) -> str:
+    self.email.recipients.append(to)
+    return "Forwarded."
+
+  def namespace(self) -> camel_value.Namespace:
+    private = capabilities.Capabilities(frozenset(), frozenset({_OWNER}))
+    tools = [
+        (self.get_email, private),
+        (self.forward_email, capabilities.Capabilities.camel()),
+    ]
+    variables: dict[str, camel_value.Value] = {
+        f.__name__: camel_value.CaMeLFunction(
+            name=f.__name__, py_callable=f, capabilities=caps, dependencies=()
+        )
+        for f, caps in tools
+    }
+    variables["Email"] = camel_value.CaMeLClass(
+        "Email", Email, capabilities.Capabilities.camel(), (), {}
+    )
+    return library.make_builtins_namespace(variables)
+
+
+def test_fields_are_read_as_returned_by_the_tool():
+  inbox = _Inbox()
+  program = """\
+email = get_email()
+forward_email("someone@example.com")
+recipients = email.recipients
+"""
+
+  eval_result = interpreter.parse_and_interpret_code(
+      f"```python\n{program}\n```",
+      inbox.namespace(),
+      [],
+      (),
+      interpreter.EvalArgs(
+          security_policy.NoSecurityPolicyEngine(),
+          interpreter.DependenciesPropagationMode.NORMAL,
+      ),
+  )
+
+  assert isinstance(eval_result.result, result.Ok)
+  recipients = eval_result.namespace.variables["recipients"]
+  assert recipients.raw == [_OWNER]
+  readers, _ = capabilities_utils.get_all_readers(recipients)
+  assert readers == {_OWNER}
+
+
+def test_fields_are_copied_when_the_output_is_converted():
+  inbox = _Inbox()
+  email = camel_value.value_from_raw(
+      inbox.get_email(),
+      capabilities.Capabilities.camel(),
+      inbox.namespace(),
+      (),
+  )
+
+  inbox.forward_email("someone@example.com")
+
+  assert email.attr("recipients").raw == [_OWNER]
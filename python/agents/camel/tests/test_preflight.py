@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the static analysis of programs before they are evaluated."""
+
+from benchmarks import workspace
+from camel.camel_library import result
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import preflight
+import pytest
+
+
+def _eval(program: str, preflight_enabled: bool) -> interpreter.EvalResult:
+  eval_args = interpreter.EvalArgs(
+      workspace.SecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+      preflight=preflight_enabled,
+  )
+  return interpreter.parse_and_interpret_code(
+      f"```python\n{program}\n```",
+      workspace.Workspace(5).namespace(),
+      [],
+      (),
+      eval_args,
+  )
+
+
+def _error(program: str, preflight_enabled: bool) -> Exception:
+  eval_result = _eval(program, preflight_enabled)
+  match eval_result.result:
+    case result.Error(error):
+      return error.exception
+  raise AssertionError(f"The program succeeded: {eval_result.result}")
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        # The bases are checked before the fields.
+        "class Summary:\n    count = 3",
+        "class Summary(Email):\n    count: int",
+        "class Summary(BaseModel, Email):\n    count: int",
+    ],
+)
+def test_class_definition_issue_is_the_runtime_error(program):
+  runtime_error = _error(program, preflight_enabled=False)
+  preflight_error = _error(program, preflight_enabled=True)
+
+  assert isinstance(preflight_error, preflight.PreflightError)
+  [issue] = preflight_error.issues
+  assert type(issue.exception) is type(runtime_error)
+  assert str(issue.exception) == str(runtime_error)
+
+
+def test_bases_assigned_by_the_program_are_left_to_the_interpreter():
+  program = "Base = BaseModel\nclass Summary(Base):\n    count: int"
+
+  eval_result = _eval(program, preflight_enabled=True)
+
+  assert isinstance(eval_result.result, result.Ok)
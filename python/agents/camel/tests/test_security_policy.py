@@ -0,0 +1,180 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the compiled security policies."""
+
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.capabilities import dependency_graph
+from camel.camel_library.interpreter import camel_value
+import pytest
+
+
+def _allow(tool_name, kwargs):
+  del tool_name, kwargs  # Unused.
+  return security_policy.Allowed()
+
+
+def _deny(tool_name, kwargs):
+  del kwargs  # Unused.
+  return security_policy.Denied(f"{tool_name} is denied.")
+
+
+class _Engine(security_policy.SecurityPolicyEngine):
+
+  def __init__(self, policies, no_side_effect_tools):
+    self.policies = policies
+    self.no_side_effect_tools = no_side_effect_tools
+
+
+def test_policies_are_frozen_when_compiled():
+  engine = _Engine([("send_*", _allow), ("*", _allow)], ["read_email"])
+  assert engine.check_policy("send_email", {}, ()) == security_policy.Allowed()
+
+  with pytest.raises(TypeError):
+    engine.policies[0] = ("send_*", _deny)
+  with pytest.raises(AttributeError):
+    engine.no_side_effect_tools.add("send_email")
+  assert security_policy.compile_policies(engine).compiled_from(
+      engine.policies, engine.no_side_effect_tools
+  )
+
+
+def test_replaced_policy_is_used():
+  engine = _Engine([("send_*", _allow), ("*", _allow)], [])
+  assert engine.check_policy("send_email", {}, ()) == security_policy.Allowed()
+
+  engine.policies = [("send_*", _deny), *engine.policies[1:]]
+
+  assert isinstance(
+      engine.check_policy("send_email", {}, ()), security_policy.Denied
+  )
+
+
+def test_replaced_tool_is_no_longer_exempt():
+  for tools in (["send_email"], {"send_email"}):
+    engine = _Engine([("*", _deny)], tools)
+    assert (
+        engine.check_policy("send_email", {}, ()) == security_policy.Allowed()
+    )
+
+    engine.no_side_effect_tools = type(tools)(["read_email"])
+
+    assert isinstance(
+        engine.check_policy("send_email", {}, ()), security_policy.Denied
+    )
+    assert (
+        engine.check_policy("read_email", {}, ()) == security_policy.Allowed()
+    )
+
+
+def test_policies_of_properties_are_compared_by_contents():
+
+  class Engine(security_policy.SecurityPolicyEngine):
+
+    def __init__(self):
+      self._policies = [("*", _allow)]
+
+    @property
+    def policies(self):
+      return self._policies
+
+    @property
+    def no_side_effect_tools(self):
+      return []
+
+  engine = Engine()
+  assert engine.check_policy("send_email", {}, ()) == security_policy.Allowed()
+
+  engine.policies[0] = ("*", _deny)
+
+  assert isinstance(
+      engine.check_policy("send_email", {}, ()), security_policy.Denied
+  )
+
+
+def test_decisions_of_pure_policies_are_cached():
+  calls = []
+
+  @security_policy.pure_policy
+  def policy(tool_name, kwargs):
+    calls.append(tool_name)
+    return security_policy.Allowed()
+
+  engine = _Engine([("*", policy)], [])
+  for _ in range(3):
+    engine.check_policy("send_email", {}, ())
+
+  assert calls == ["send_email"]
+
+
+def test_decisions_about_values_of_lists_are_checked_after_mutations():
+  calls = []
+
+  @security_policy.pure_policy
+  def policy(tool_name, kwargs):
+    calls.append(tool_name)
+    return security_policy.Allowed()
+
+  camel = capabilities.Capabilities.camel()
+  items = camel_value.CaMeLList([], camel, ())
+  # A string depending on the list, through an immutable value.
+  body = camel_value.CaMeLStr.from_raw(
+      "body", camel, (camel_value.CaMeLStr.from_raw("x", camel, (items,)),)
+  )
+  engine = _Engine([("*", policy)], [])
+  engine.check_policy("send_email", {"body": body}, ())
+  engine.check_policy("send_email", {"body": body}, ())
+  camel_value.record_mutation(items)
+  engine.check_policy("send_email", {"body": body}, ())
+
+  assert calls == ["send_email", "send_email"]
+
+
+def test_can_change_agrees_with_resolve():
+  camel = capabilities.Capabilities.camel()
+  constant = camel_value.CaMeLStr.from_raw("c", camel, ())
+  items = camel_value.CaMeLList([constant], camel, ())
+  values = [
+      constant,
+      camel_value.CaMeLStr.from_raw("d", camel, (constant,)),
+      camel_value.CaMeLStr.from_raw("e", camel, (items,)),
+  ]
+
+  for value in values:
+    assert dependency_graph.DependencyGraph().can_change(value) == (
+        dependency_graph.DependencyGraph().resolve(value).epoch is not None
+    )
+
+
+def test_only_tools_without_side_effects_are_always_allowed():
+  engine = _Engine([("*", _allow)], ["read_email"])
+
+  assert security_policy.always_allows(engine, "read_email")
+  assert not security_policy.always_allows(engine, "send_email")
+  assert security_policy.always_allows(
+      security_policy.NoSecurityPolicyEngine(), "send_email"
+  )
+
+
+def test_overridden_check_policy_is_never_known_to_allow():
+
+  class Engine(_Engine):
+
+    def check_policy(self, tool_name, kwargs, dependencies):
+      return security_policy.Allowed()
+
+  assert not security_policy.always_allows(
+      Engine([], ["read_email"]), "read_email"
+  )
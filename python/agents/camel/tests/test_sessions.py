@@ -0,0 +1,58 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of concurrent sessions sharing one interpreter service."""
+
+import asyncio
+import sys
+import threading
+
+from benchmarks import sessions
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.interpreter import camel_value
+
+
+def test_concurrent_sessions_are_isolated():
+  # Raises if a session sees the values of another one, or if an email the
+  # policy must deny is sent.
+  throughput = asyncio.run(sessions.run_load(16, 4, latency=0.001))
+  assert throughput > 0
+
+
+def test_concurrent_mutations_are_all_counted():
+  values = [
+      camel_value.CaMeLList([], capabilities.Capabilities.camel(), ())
+      for _ in range(8)
+  ]
+  mutations = 20_000
+  start = camel_value.mutation_epoch()
+
+  def mutate(value: camel_value.Value) -> None:
+    for _ in range(mutations):
+      camel_value.record_mutation(value)
+
+  threads = [threading.Thread(target=mutate, args=(v,)) for v in values]
+  switch_interval = sys.getswitchinterval()
+  sys.setswitchinterval(1e-6)  # Switch threads as often as possible.
+  try:
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+  finally:
+    sys.setswitchinterval(switch_interval)
+
+  assert camel_value.mutation_epoch() == start + len(values) * mutations
+  for value in values:
+    assert camel_value.last_mutation(id(value.python_value)) > start
@@ -0,0 +1,100 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the snapshots of interpreter namespaces."""
+
+import pickle
+import zlib
+
+from benchmarks import workspace
+from camel.camel_agent import session_namespaces
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import snapshot
+import pytest
+
+_KEY = b"k" * 32
+_CODE = """```python
+emails = search_emails("Project")
+subjects = [e.subject for e in emails]
+```"""
+
+_unpickled = []
+
+
+def _record_unpickling() -> None:
+  _unpickled.append(True)
+
+
+class _Exploit:
+
+  def __reduce__(self):
+    return _record_unpickling, ()
+
+
+def _namespace(base):
+  return interpreter.parse_and_interpret_code(
+      _CODE,
+      base,
+      [],
+      (),
+      interpreter.EvalArgs(
+          workspace.SecurityPolicyEngine(),
+          interpreter.DependenciesPropagationMode.NORMAL,
+      ),
+  ).namespace
+
+
+def test_round_trip():
+  base = workspace.Workspace(5).namespace()
+  namespace = _namespace(base)
+
+  restored = snapshot.loads(snapshot.dumps(namespace, base, _KEY), base, _KEY)
+
+  subjects = restored.variables["subjects"]
+  assert subjects.raw == namespace.variables["subjects"].raw
+  assert subjects.capabilities == namespace.variables["subjects"].capabilities
+
+
+def test_other_key_is_rejected():
+  base = workspace.Workspace(5).namespace()
+  data = snapshot.dumps(_namespace(base), base, _KEY)
+
+  with pytest.raises(snapshot.SnapshotError):
+    snapshot.loads(data, base, b"other key")
+
+
+def test_forged_snapshot_is_not_unpickled():
+  base = workspace.Workspace(5).namespace()
+  data = snapshot.dumps(_namespace(base), base, _KEY)
+  # Whoever can write to the store, but doesn't have the key, replaces the
+  # pickle and keeps the signature.
+  payload = zlib.compress(pickle.dumps((_Exploit(), [])))
+  forged = data[: len(snapshot._MAGIC) + snapshot._SIGNATURE_SIZE] + payload
+
+  with pytest.raises(snapshot.SnapshotError):
+    snapshot.loads(forged, base, _KEY)
+  assert not _unpickled
+
+
+def test_evicted_sessions_are_restored_with_the_key():
+  base = workspace.Workspace(5).namespace()
+  store = session_namespaces.InMemorySnapshotStore()
+  namespaces = session_namespaces.SessionNamespaces(base, 1, store, _KEY)
+  namespaces.put("a", _namespace(base))
+  namespaces.put("b", base)  # Evicts "a".
+  assert store.get("a") is not None
+
+  restored = namespaces.get("a")
+
+  assert "subjects" in restored.variables
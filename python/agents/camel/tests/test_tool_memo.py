@@ -0,0 +1,110 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the memo of the calls to tools without side effects."""
+
+from camel.camel_library import result
+from camel.camel_library import security_policy
+from camel.camel_library.capabilities import capabilities
+from camel.camel_library.interpreter import camel_value
+from camel.camel_library.interpreter import interpreter
+from camel.camel_library.interpreter import library
+from camel.camel_library.interpreter import tool_memo
+
+
+class _Files:
+  """A file store, with a tool reading it and one appending to it."""
+
+  def __init__(self) -> None:
+    self.content = "a"
+    self.reads = 0
+
+  def read_file(self) -> str:
+    self.reads += 1
+    return self.content
+
+  def append_to_file(self, text: str) -> str:
+    self.content += text
+    return "Appended."
+
+  def namespace(self) -> camel_value.Namespace:
+    return library.make_builtins_namespace({
+        f.__name__: camel_value.CaMeLFunction(
+            name=f.__name__,
+            py_callable=f,
+            capabilities=capabilities.Capabilities.camel(),
+            dependencies=(),
+        )
+        for f in (self.read_file, self.append_to_file)
+    })
+
+
+class _SecurityPolicyEngine(security_policy.SecurityPolicyEngine):
+
+  def __init__(self) -> None:
+    self.policies = [("*", self.allow)]
+    self.no_side_effect_tools = ["read_file"]
+
+  def allow(self, tool_name, kwargs):
+    del tool_name, kwargs  # Unused.
+    return security_policy.Allowed()
+
+
+def _run(
+    program: str, files: _Files, memo: tool_memo.ToolMemo
+) -> interpreter.EvalResult:
+  eval_args = interpreter.EvalArgs(
+      _SecurityPolicyEngine(),
+      interpreter.DependenciesPropagationMode.NORMAL,
+      tool_memo=memo,
+  )
+  return interpreter.parse_and_interpret_code(
+      f"```python\n{program}\n```", files.namespace(), [], (), eval_args
+  )
+
+
+def test_calls_are_memoized_across_retries():
+  files = _Files()
+  memo = tool_memo.ToolMemo()
+
+  _run("x = read_file()\nraise ValueError(x)", files, memo)
+  eval_result = _run("x = read_file()", files, memo)
+
+  assert isinstance(eval_result.result, result.Ok)
+  assert eval_result.namespace.variables["x"].raw == "a"
+  assert files.reads == 1
+
+
+def test_side_effects_invalidate_the_memo_within_a_program():
+  files = _Files()
+  memo = tool_memo.ToolMemo()
+
+  eval_result = _run(
+      'x = read_file()\nappend_to_file("b")\ny = read_file()', files, memo
+  )
+
+  assert eval_result.namespace.variables["x"].raw == "a"
+  assert eval_result.namespace.variables["y"].raw == "ab"
+
+
+def test_side_effects_invalidate_the_memo_across_retries():
+  files = _Files()
+  memo = tool_memo.ToolMemo()
+
+  _run(
+      'x = read_file()\nappend_to_file("b")\nraise ValueError(x)', files, memo
+  )
+  eval_result = _run("y = read_file()", files, memo)
+
+  assert eval_result.namespace.variables["y"].raw == "ab"